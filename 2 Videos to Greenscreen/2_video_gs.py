@@ -1,8 +1,9 @@
+import math
 import os  # Modul zum Arbeiten mit dem Betriebssystem, z.B. zum Überprüfen von Dateipfaden
 import sys
 import numpy as np  # Bibliothek für numerische Berechnungen, insbesondere für Arrays
 import cv2  # Bibliothek für die Bild- und Videobearbeitung
-from typing import List, Union  # Hilft bei der Angabe von Datentypen in Funktionssignaturen
+from typing import Iterator, List, Optional, Union  # Hilft bei der Angabe von Datentypen in Funktionssignaturen
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QFileDialog, QLabel, QMessageBox
 from PyQt5.QtCore import Qt
 
@@ -29,30 +30,47 @@ def create_greenscreen_masks(image: np.ndarray, num_greenscreens: int = 2) -> Li
     
     return masks
 
+# Bildrate, falls das Video keine angibt
+DEFAULT_FPS = 30.0
+
+# Funktion zum Lesen eines Videos mit der Bildrate des Ausgabevideos
+# Der Quellframe wird über den Zeitstempel des Ausgabeframes bestimmt; übersprungene Frames werden nur mit grab()
+# weitergeschaltet, bei einer höheren Ausgaberate wird der letzte Frame wiederholt
+def resample_frames(cap: cv2.VideoCapture, output_fps: float) -> Iterator[np.ndarray]:
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    position = -1
+    frame = None
+    output_index = 0
+    while True:
+        target = int(math.floor(output_index * source_fps / output_fps + 1e-6))
+        if target > position:
+            while position < target:
+                if not cap.grab():
+                    return
+                position += 1
+            ret, frame = cap.retrieve()
+            if not ret:
+                return
+        yield frame
+        output_index += 1
+
 # Funktion zum Ersetzen des Greenscreens durch ein Hintergrundvideo
-def replace_greenscreens_with_videos(original_img: np.ndarray, video_paths: List[str], masks: List[np.ndarray], output_video_path: str) -> None:
+# output_fps legt die Bildrate des Ausgabevideos fest (Standard: die des ersten Hintergrundvideos)
+def replace_greenscreens_with_videos(original_img: np.ndarray, video_paths: List[str], masks: List[np.ndarray], output_video_path: str,
+                                     output_fps: Optional[float] = None) -> None:
     if len(video_paths) != len(masks):
         raise ValueError("Die Anzahl der Videos muss mit der Anzahl der Greenscreen-Bereiche übereinstimmen. Prüfe ob es ein Greenscreen Bild ist!.")
-    
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video_path, fourcc, 30, (original_img.shape[1], original_img.shape[0]))
 
     caps = [cv2.VideoCapture(video_path) for video_path in video_paths]
     if not all(cap.isOpened() for cap in caps):
         raise ValueError("Es ist fehlgeschlagen, eine oder mehrere Videodateien zu öffnen.")
-    
-    while True:
-        frames = []
-        for cap in caps:
-            ret, frame = cap.read()
-            if not ret:
-                frames.append(None)
-            else:
-                frames.append(frame)
 
-        if any(frame is None for frame in frames):
-            break
-        
+    fps = output_fps or caps[0].get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_video_path, fourcc, fps, (original_img.shape[1], original_img.shape[0]))
+    
+    # Alle Videos werden auf die Ausgabebildrate umgerechnet; das kürzeste Video bestimmt die Länge
+    for frames in zip(*(resample_frames(cap, fps) for cap in caps)):
         result = original_img.copy()
         for mask, frame in zip(masks, frames):
             x, y, w, h = cv2.boundingRect(mask)
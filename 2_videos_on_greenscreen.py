@@ -1,79 +1,12 @@
 import os  # Modul zum Arbeiten mit dem Betriebssystem, z.B. zum Überprüfen von Dateipfaden
 import sys  # Modul zum Zugriff auf Systemfunktionen wie Argumente und Exit
-import numpy as np  # Bibliothek für numerische Berechnungen, insbesondere für Arrays
 import cv2  # Bibliothek für die Bild- und Videobearbeitung
-from typing import List, Union  # Hilft bei der Angabe von Datentypen in Funktionssignaturen
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QFileDialog, QLabel, QMessageBox
 from PyQt5.QtCore import Qt
 
-# Funktion zur Erstellung einer Maske für den Greenscreen-Bereich im Bild
-def create_greenscreen_masks(image: np.ndarray, num_greenscreens: int = 2) -> List[np.ndarray]:
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)  # Konvertiere das Bild von BGR zu HSV Farbraum
-    lower_green = np.array([35, 100, 100])  # Definiere die untere Grenze für den Grünfarbton
-    upper_green = np.array([85, 255, 255])  # Definiere die obere Grenze für den Grünfarbton
-    mask = cv2.inRange(hsv, lower_green, upper_green)  # Erstelle eine Maske, die nur den grünen Bereich enthält
-    
-    kernel = np.ones((5, 5), np.uint8)  # Erstelle einen Kernel zur Rauschunterdrückung
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)  # Schließe kleine Löcher in der Maske
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)  # Entferne kleine weiße Punkte aus der Maske
-    
-    num_labels, labels_im = cv2.connectedComponents(mask)  # Finde alle verbundenen Komponenten in der Maske
-    
-    # Finde die größten verbundenen Komponenten
-    component_sizes = [(label, np.sum(labels_im == label)) for label in range(1, num_labels)]
-    largest_components = sorted(component_sizes, key=lambda x: x[1], reverse=True)[:num_greenscreens]
-
-    masks = []
-    for label, _ in largest_components:
-        component_mask = np.uint8(labels_im == label) * 255  # Erstelle eine Maske für die größte Komponente
-        masks.append(component_mask)
-    
-    return masks  # Rückgabe der Masken für die größten Greenscreen-Bereiche
-
-# Funktion zum Ersetzen des Greenscreens durch ein Hintergrundvideo
-def replace_greenscreens_with_videos(original_img: np.ndarray, video_paths: List[str], masks: List[np.ndarray], output_video_path: str) -> None:
-    if len(video_paths) != len(masks):  # Überprüfe, ob die Anzahl der Videos mit der Anzahl der Greenscreen-Bereiche übereinstimmt
-        raise ValueError("Die Anzahl der Videos muss mit der Anzahl der Greenscreen-Bereiche übereinstimmen.")
-    
-    # Initialisiere den Video-Writer
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video_path, fourcc, 30, (original_img.shape[1], original_img.shape[0]))
-
-    # Öffne die Video-Dateien
-    caps = [cv2.VideoCapture(video_path) for video_path in video_paths]
-    if not all(cap.isOpened() for cap in caps):
-        raise ValueError("Es ist fehlgeschlagen, eine oder mehrere Videodateien zu öffnen.")
-    
-    while True:
-        frames = []
-        for cap in caps:
-            ret, frame = cap.read()  # Lese einen Frame aus dem Video
-            if not ret:
-                frames.append(None)  # Wenn das Lesen fehlschlägt, füge None hinzu
-            else:
-                frames.append(frame)  # Füge den gelesenen Frame hinzu
-
-        if any(frame is None for frame in frames):  # Breche ab, wenn ein Frame nicht gelesen werden konnte
-            break
-        
-        result = original_img.copy()  # Erstelle eine Kopie des Originalbildes
-        for mask, frame in zip(masks, frames):
-            x, y, w, h = cv2.boundingRect(mask)  # Bestimme die Begrenzungsbox der Maske
-            background_img_resized = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)  # Passe die Größe des Hintergrundbildes an
-            mask_cropped = mask[y:y+h, x:x+w]  # Schneide die Maske zu
-            mask_inv = cv2.bitwise_not(mask_cropped)  # Invertiere die Maske
-
-            for c in range(3):  # Übertrage die Kanäle des Bildes
-                result[y:y+h, x:x+w, c] = (
-                    background_img_resized[:, :, c] * (mask_cropped / 255.0) + 
-                    result[y:y+h, x:x+w, c] * (mask_inv / 255.0)
-                )
-
-        out.write(result)  # Schreibe das Ergebnis in das Ausgabevideo
-    
-    for cap in caps:  # Schließe die Video-Dateien
-        cap.release()
-    out.release()  # Schließe die Ausgabe
+# Funktionen zum Erstellen der Masken und Ersetzen der Greenscreen-Bereiche (ohne GUI-Abhängigkeiten)
+from multi_video_compositing import create_greenscreen_masks, replace_greenscreens_with_videos
+from mask_cache import MaskCache  # Gemeinsamer Festplatten-Cache für Greenscreen-Masken
 
 # Klasse für die GUI-Anwendung
 class GreenScreenApp(QWidget):
@@ -165,7 +98,7 @@ class GreenScreenApp(QWidget):
                 raise ValueError(f"Fehler beim Laden des Originalbildes aus '{original_image_path}'.")
             
             # Erstelle Masken für die Greenscreen-Bereiche
-            masks = create_greenscreen_masks(original_img, num_greenscreens=len(video_paths))
+            masks = create_greenscreen_masks(original_img, num_greenscreens=len(video_paths), cache=MaskCache.default())
             # Ersetze die Greenscreen-Bereiche durch die Videos
             replace_greenscreens_with_videos(original_img, video_paths, masks, output_video_path)
             
@@ -0,0 +1,82 @@
+"""
+bench_cli_startup.py
+
+Misst die Startzeit von greenscreen.py für --help und die reinen OpenCV-Befehle und prüft, welche schweren
+Bibliotheken dabei importiert werden.
+
+Jeder Aufruf läuft in einem eigenen Prozess; angegeben wird der Median der Wandzeit. Zum Vergleich wird der Start
+eines leeren Python-Interpreters gemessen. Die Importe werden mit "python -X importtime" ermittelt.
+
+Benutzung (im Projektverzeichnis):
+    python benchmarks/bench_cli_startup.py --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(REPO_DIR, 'greenscreen.py')
+
+# Bibliotheken, die beim Start nicht geladen werden sollen, sofern der Befehl sie nicht braucht
+HEAVY_MODULES = ('tensorflow', 'keras', 'PyQt5', 'moviepy', 'cv2', 'PIL')
+
+# Gemessene Aufrufe: Beschreibung -> Argumente
+CASES = {
+    'python -c pass': None,
+    'greenscreen --help': ['--help'],
+    'greenscreen insert-image --help': ['insert-image', '--help'],
+    'greenscreen insert-video --help': ['insert-video', '--help'],
+    'greenscreen multi-video --help': ['multi-video', '--help'],
+    'greenscreen analyze-masks --help': ['analyze-masks', '--help'],
+    'greenscreen convert --help': ['convert', '--help'],
+}
+
+
+def command_for(args: Optional[List[str]]) -> List[str]:
+    return [sys.executable, '-c', 'pass'] if args is None else [sys.executable, CLI] + args
+
+
+# Funktion zum Messen der Wandzeit eines Aufrufs
+def measure(command: List[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, cwd=REPO_DIR)
+    return time.perf_counter() - start
+
+
+# Funktion zum Ermitteln der geladenen schweren Bibliotheken und ihrer kumulierten Importzeit
+def heavy_imports(command: List[str]) -> List[str]:
+    importtime_command = [command[0], '-X', 'importtime'] + command[1:]
+    stderr = subprocess.run(importtime_command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                            cwd=REPO_DIR).stderr
+    found = []
+    for line in stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        parts = line.split('|')
+        if len(parts) != 3:
+            continue
+        package = parts[2].strip()
+        if package in HEAVY_MODULES:
+            found.append(f'{package} ({int(parts[1].strip()) / 1e6:.2f} s)')
+    return found
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Startzeit der Kommandozeile messen.')
+    parser.add_argument('--runs', type=int, default=5, help='Anzahl der Messungen pro Aufruf')
+    args = parser.parse_args(argv)
+
+    print(f"{'Aufruf':<36}{'Median [s]':>12}   Schwere Importe")
+    for name, case_args in CASES.items():
+        command = command_for(case_args)
+        median = statistics.median(measure(command) for _ in range(args.runs))
+        imports = ', '.join(heavy_imports(command)) or '-'
+        print(f"{name:<36}{median:>12.3f}   {imports}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+bench_model_loading.py
+
+Vergleicht die Ladezeit von load_model('images.keras') mit dem Verzeichnisformat aus fast_model_io.py.
+
+Jede Messung läuft in einem eigenen Prozess, damit kein bereits geladenes Modell wiederverwendet wird. Gemessen
+werden die Ladezeit und die Zeit bis zur ersten Vorhersage, jeweils ohne den Import von TensorFlow. Ab dem zweiten
+Durchlauf liegen die Dateien im Seitencache des Betriebssystems; der erste Durchlauf zeigt den Kaltstart.
+
+Benutzung (im Projektverzeichnis):
+    python benchmarks/bench_model_loading.py --model images.keras --runs 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Code, der im Kindprozess ausgeführt wird: Modell laden und eine erste Vorhersage machen
+CHILD_CODE = '''
+import json, sys, time
+sys.path.insert(0, {repo_dir!r})
+import numpy as np
+import tensorflow as tf
+from fast_model_io import load_any_model
+start = time.perf_counter()
+model = load_any_model({model_path!r})
+loaded = time.perf_counter()
+height, width = model.input_shape[1:3]
+model(np.zeros((1, height, width, 3), np.float32), training=False)
+first = time.perf_counter()
+print(json.dumps({{'load': loaded - start, 'first_prediction': first - start}}))
+'''
+
+
+# Funktion zum Messen eines Ladevorgangs in einem frischen Prozess
+def measure(model_path: str) -> Dict[str, float]:
+    code = CHILD_CODE.format(repo_dir=REPO_DIR, model_path=model_path)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Ladezeit von .keras und Verzeichnisformat vergleichen.')
+    parser.add_argument('--model', default='images.keras', help='Modell im .keras-Format')
+    parser.add_argument('--fast-model', default=None, help='Modell im Verzeichnisformat (wird bei Bedarf erzeugt)')
+    parser.add_argument('--runs', type=int, default=3, help='Anzahl der Messungen pro Format')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    sys.path.insert(0, REPO_DIR)
+    from fast_model_io import convert_model, fast_model_path
+
+    fast_path = args.fast_model or fast_model_path(args.model)
+    if not os.path.isdir(fast_path):
+        print(f'Erzeuge {fast_path} ...')
+        convert_model(args.model, fast_path)
+
+    print(f"{'Format':<28}{'Laden [s]':>12}{'Erste Vorhersage [s]':>23}{'Kaltstart [s]':>16}")
+    for name, path in ((f"load_model('{os.path.basename(args.model)}')", args.model),
+                       (os.path.basename(fast_path), fast_path)):
+        results = [measure(path) for _ in range(args.runs)]
+        load = statistics.median(result['load'] for result in results)
+        first = statistics.median(result['first_prediction'] for result in results)
+        print(f"{name:<28}{load:>12.2f}{first:>23.2f}{results[0]['first_prediction']:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+bench_roi_decoding.py
+
+Vergleicht das Lesen eines Hintergrundvideos in ROI-Größe mit den beiden Lesern aus video_readers.py:
+
+- opencv: cv2.VideoCapture dekodiert in voller Auflösung, danach cv2.resize (INTER_AREA)
+- ffmpeg: ffmpeg dekodiert und skaliert mit dem scale-Filter und liefert nur ROI-große Frames über eine Pipe
+
+Gemessen werden Wandzeit, Frames pro Sekunde und die CPU-Zeit, einschließlich der des ffmpeg-Kindprozesses.
+Zusätzlich wird die mittlere Abweichung der Frames beider Leser angegeben (Grauwerte 0-255), da die Skalierer von
+OpenCV und ffmpeg nicht bitgleich rechnen.
+
+Benutzung (im Projektverzeichnis):
+    python benchmarks/bench_roi_decoding.py musikvideo.mp4 --sizes 320x180 640x360 --max-frames 300
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Funktion zum Messen eines Lesers: alle Frames (bis max_frames) in ROI-Größe lesen
+def measure(backend: str, video_path: str, size: Tuple[int, int], max_frames: Optional[int]) -> Dict[str, float]:
+    from video_readers import open_video_reader
+
+    usage_before = (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+    start = time.perf_counter()
+    reader = open_video_reader(video_path, size, backend)
+    frames = 0
+    checksum = None
+    while max_frames is None or frames < max_frames:
+        ret, frame = reader.read()
+        if not ret:
+            break
+        checksum = frame.astype('float64') if checksum is None else checksum + frame
+        frames += 1
+    reader.release()
+    elapsed = time.perf_counter() - start
+    usage_after = (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+
+    # CPU-Zeit des Kindprozesses wird erst nach dessen Ende (release) in RUSAGE_CHILDREN gezählt
+    cpu = sum(after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime
+              for before, after in zip(usage_before, usage_after))
+    return {'frames': frames, 'time': elapsed, 'cpu': cpu, 'mean_frame': checksum / max(frames, 1)}
+
+
+# Funktion zum Auswerten einer Größenangabe wie 320x180
+def parse_size(value: str) -> Tuple[int, int]:
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Dekodieren in ROI-Größe: OpenCV + resize gegen ffmpeg-Pipe.')
+    parser.add_argument('video', nargs='?', default='musikvideo.mp4', help='Hintergrundvideo')
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=[(320, 180), (640, 360)], help='ROI-Größen, z.B. 320x180')
+    parser.add_argument('--max-frames', type=int, default=None, help='Maximale Anzahl gelesener Frames')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    sys.path.insert(0, REPO_DIR)
+    from video_readers import find_ffmpeg
+
+    if find_ffmpeg() is None:
+        print('ffmpeg nicht gefunden; bitte installieren oder GREENSCREEN_FFMPEG setzen.')
+        return
+
+    print(f"{'ROI':<12}{'Leser':<9}{'Frames':>8}{'Zeit [s]':>10}{'FPS':>9}{'CPU [s]':>10}{'Abweichung':>12}")
+    for size in args.sizes:
+        results = {backend: measure(backend, args.video, size, args.max_frames) for backend in ('opencv', 'ffmpeg')}
+        difference = abs(results['opencv']['mean_frame'] - results['ffmpeg']['mean_frame']).mean()
+        for backend, result in results.items():
+            label = f'{size[0]}x{size[1]}'
+            deviation = f'{difference:.2f}' if backend == 'ffmpeg' else '-'
+            print(f"{label:<12}{backend:<9}{result['frames']:>8}{result['time']:>10.2f}"
+                  f"{result['frames'] / result['time']:>9.1f}{result['cpu']:>10.2f}{deviation:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+color_prefilter.py
+
+Schnelle Vorstufe vor dem CNN: Farbstatistiken auf einem verkleinerten Bild entscheiden eindeutige Fälle sofort,
+nur unklare Bilder gehen an das Modell (Kaskade).
+
+Pro Bild werden auf höchstens 64 Pixel Kantenlänge berechnet:
+- green_ratio: Anteil der Pixel im grünen HSV-Band (dieselben Grenzen wie in den Einfügeskripten)
+- blob_ratio: Anteil der größten zusammenhängenden grünen Fläche
+
+Regeln: green_ratio <= reject_below -> Klasse 0 (nicht greenscreen fähig), blob_ratio >= accept_above -> Klasse 1
+(greenscreen fähig), sonst CNN. Der Validierungsanteil des Datensatzes (gleiche Aufteilung wie resolution_sweep.py)
+wird noch einmal pro Klasse geteilt: Auf dem Kalibrierungsteil werden die beiden Schwellen so gewählt, dass die ohne
+CNN entschiedenen Bilder mindestens --min-precision korrekt sind; der Auswertungsteil (--evaluation-split) wird dafür
+nicht verwendet. Nur auf ihm vergleicht der Bericht die Kaskade mit dem CNN allein: Anzahl übersprungener Bilder,
+Genauigkeit gegenüber den Labels und Übereinstimmung mit dem CNN.
+
+images.keras wird von model_create_and_training.py mit allen Bildern der Klassenordner trainiert. Die Genauigkeit
+des CNN auf dem Auswertungsteil ist dann eine Trainingsgenauigkeit und fällt zu hoch aus; der Bericht weist darauf
+hin. Für eine unverzerrte CNN-Genauigkeit muss das Modell ohne diese Bilder trainiert sein (z.B. resolution_sweep.py).
+
+Benutzung:
+    python color_prefilter.py --min-precision 0.99 --output color_prefilter.json
+    python prediction_testing.py bilder/*.jpg --prefilter color_prefilter.json
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from mask_cache import LOWER_GREEN, UPPER_GREEN  # Grünes HSV-Band der Einfügeskripte
+
+# Kantenlänge des verkleinerten Bildes für die Statistiken
+STATS_SIZE = 64
+
+# Standardpfad der kalibrierten Schwellen
+DEFAULT_PREFILTER_PATH = 'color_prefilter.json'
+
+# Klassen der Kaskade (Reihenfolge wie in model_create_and_training.folders)
+REJECT_CLASS = 0
+ACCEPT_CLASS = 1
+
+
+# Funktion zum Berechnen der Farbstatistiken eines Bildes
+# JPEGs werden schon beim Dekodieren auf ein Achtel verkleinert (IMREAD_REDUCED_COLOR_8), das spart den Großteil der Zeit
+def color_statistics(path: str, size: int = STATS_SIZE) -> Tuple[float, float]:
+    image = cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_8)
+    if image is None:
+        raise ValueError(f"Failed to load image from '{path}'.")
+    scale = size / max(image.shape[:2])
+    if scale < 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    mask = cv2.inRange(cv2.cvtColor(image, cv2.COLOR_BGR2HSV), np.array(LOWER_GREEN), np.array(UPPER_GREEN))
+    total = mask.shape[0] * mask.shape[1]
+    num_labels, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+    largest = int(stats[1:, cv2.CC_STAT_AREA].max()) if num_labels > 1 else 0
+    return np.count_nonzero(mask) / total, largest / total
+
+
+# Funktion zum Entscheiden eines Bildes anhand der Schwellen; None bedeutet: an das CNN weitergeben
+def decide(statistics: Tuple[float, float], thresholds: Dict[str, float]) -> Optional[int]:
+    green_ratio, blob_ratio = statistics
+    reject = green_ratio <= thresholds['reject_below']
+    accept = blob_ratio >= thresholds['accept_above']
+    if reject == accept:
+        return None  # weder eindeutig noch (bei widersprüchlichen Schwellen) beides
+    return REJECT_CLASS if reject else ACCEPT_CLASS
+
+
+# Funktion zum Wählen einer Schwelle: der weiteste Bereich, in dem mindestens min_precision der Bilder zur Klasse gehört
+# below=True sucht "Wert <= Schwelle", sonst "Wert >= Schwelle"; ohne geeigneten Bereich wird nie entschieden
+def choose_threshold(values: List[float], labels: List[int], target: int, min_precision: float,
+                     min_support: int, below: bool) -> float:
+    order = np.argsort(values) if below else np.argsort(values)[::-1]
+    best = -1.0 if below else 2.0
+    correct = 0
+    for count, index in enumerate(order, start=1):
+        correct += labels[index] == target
+        # Nur an Stellen, an denen der nächste Wert verschieden ist, kann die Schwelle liegen
+        if count < len(order) and values[order[count]] == values[index]:
+            continue
+        if count >= min_support and correct / count >= min_precision:
+            best = float(values[index])
+    return best
+
+
+# Funktion zum Kalibrieren der Schwellen auf Bildern mit bekannten Labels
+def calibrate(paths: List[str], labels: List[int], min_precision: float = 0.99, min_support: int = 5) -> Dict[str, float]:
+    statistics = [color_statistics(path) for path in paths]
+    green_ratios = [green for green, _ in statistics]
+    blob_ratios = [blob for _, blob in statistics]
+    return {
+        'reject_below': choose_threshold(green_ratios, labels, REJECT_CLASS, min_precision, min_support, below=True),
+        'accept_above': choose_threshold(blob_ratios, labels, ACCEPT_CLASS, min_precision, min_support, below=False),
+        'min_precision': min_precision,
+        'stats_size': STATS_SIZE,
+    }
+
+
+def load_thresholds(path: str) -> Dict[str, float]:
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+# Funktion zum Bewerten der Kaskade gegenüber dem CNN allein
+def evaluate_cascade(paths: List[str], labels: List[int], thresholds: Dict[str, float], model_path: str) -> Dict:
+    from prediction_testing import infer_probabilities
+
+    start = time.perf_counter()
+    decisions = [decide(color_statistics(path), thresholds) for path in paths]
+    stats_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cnn_classes = [int(np.argmax(p)) for p in infer_probabilities(paths, model_path)]
+    cnn_time = time.perf_counter() - start  # inklusive Laden des Modells
+
+    cascade_classes = [cnn if decision is None else decision for decision, cnn in zip(decisions, cnn_classes)]
+    skipped = sum(decision is not None for decision in decisions)
+    accuracy = lambda predicted: float(np.mean([p == l for p, l in zip(predicted, labels)])) if labels else 0.0
+    return {
+        'images': len(paths),
+        'skipped': skipped,
+        'rejected': sum(decision == REJECT_CLASS for decision in decisions),
+        'accepted': sum(decision == ACCEPT_CLASS for decision in decisions),
+        'cnn_accuracy': accuracy(cnn_classes),
+        'cascade_accuracy': accuracy(cascade_classes),
+        'agreement_with_cnn': float(np.mean([c == n for c, n in zip(cascade_classes, cnn_classes)])) if paths else 0.0,
+        'stats_ms_per_image': stats_time / max(len(paths), 1) * 1000,
+        'cnn_ms_per_image': cnn_time / max(len(paths), 1) * 1000,
+    }
+
+
+def print_report(thresholds: Dict[str, float], report: Dict) -> None:
+    print(f"Schwellen: green_ratio <= {thresholds['reject_below']:.4f} -> Klasse {REJECT_CLASS}, "
+          f"blob_ratio >= {thresholds['accept_above']:.4f} -> Klasse {ACCEPT_CLASS}")
+    print(f"{report['skipped']} von {report['images']} Auswertungsbildern ohne CNN entschieden "
+          f"({report['rejected']} abgelehnt, {report['accepted']} angenommen)")
+    print(f"Genauigkeit: CNN allein {report['cnn_accuracy']:.3f}, Kaskade {report['cascade_accuracy']:.3f}; "
+          f"Übereinstimmung Kaskade/CNN {report['agreement_with_cnn']:.3f}")
+    print(f"Zeit pro Bild: Farbstatistik {report['stats_ms_per_image']:.1f} ms, CNN {report['cnn_ms_per_image']:.1f} ms "
+          f"(inkl. Laden des Modells)")
+    print("Hinweis: Ist das Modell mit allen Bildern der Klassenordner trainiert (model_create_and_training.py), "
+          "ist die Genauigkeit des CNN eine Trainingsgenauigkeit.")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Schwellen der Farbstatistik-Vorstufe auf dem Validierungsanteil kalibrieren.')
+    parser.add_argument('--model', default='images.keras', help='Modell für den Vergleich mit dem CNN allein')
+    parser.add_argument('--min-precision', type=float, default=0.99, help='Mindestanteil korrekter Entscheidungen ohne CNN')
+    parser.add_argument('--min-support', type=int, default=5, help='Mindestanzahl Kalibrierungsbilder pro entschiedenem Bereich')
+    parser.add_argument('--validation-split', type=float, default=0.2, help='Anteil der Validierungsdaten')
+    parser.add_argument('--evaluation-split', type=float, default=0.5,
+                        help='Anteil der Validierungsdaten, der nur für den Bericht zurückgehalten wird')
+    parser.add_argument('--seed', type=int, default=42, help='Seed für die Aufteilung')
+    parser.add_argument('--output', default=DEFAULT_PREFILTER_PATH, help='Datei für die kalibrierten Schwellen')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    from model_create_and_training import folders, list_image_files, split_files
+
+    paths, labels = list_image_files(folders)
+    _, _, val_paths, val_labels = split_files(paths, labels, args.validation_split, args.seed)
+    # Schwellen und Bericht auf getrennten Bildern, damit der Bericht nicht in-sample ist
+    calib_paths, calib_labels, eval_paths, eval_labels = split_files(val_paths, val_labels, args.evaluation_split, args.seed)
+    print(f"Kalibrierung: {len(calib_paths)} Bilder, Auswertung: {len(eval_paths)} Bilder")
+    thresholds = calibrate(calib_paths, calib_labels, args.min_precision, args.min_support)
+    report = evaluate_cascade(eval_paths, eval_labels, thresholds, args.model)
+    report['cnn_accuracy_note'] = 'training accuracy if the model was trained on all folder images'
+    print_report(thresholds, report)
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(dict(thresholds, evaluation=report), file, indent=2)
+    print(f'Schwellen gespeichert unter {args.output}')
+
+
+if __name__ == "__main__":
+    main()
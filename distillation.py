@@ -0,0 +1,247 @@
+"""
+distillation.py
+
+Wissensdestillation: Das trainierte große Modell (Lehrer, z.B. images.keras) bringt einem kompakten Schüler-Modell
+seine Vorhersagen bei.
+
+Der Schüler wird nicht nur auf den harten Labels der Klassenordner trainiert, sondern auf den weichen
+Wahrscheinlichkeiten des Lehrers. Dafür werden die Lehrer-Wahrscheinlichkeiten mit einer Temperatur T geglättet
+(softmax(log p / T)), damit auch die Nebenklassen etwas zum Training beitragen. Zusätzlich können Ordner mit
+unbeschrifteten Bildern angegeben werden: Für sie liefert allein der Lehrer das Trainingsziel.
+
+Verlust pro Bild: alpha * T² * KL(Lehrer_T || Schüler_T) + (1 - alpha) * Kreuzentropie(Label, Schüler), der zweite
+Teil nur für beschriftete Bilder. Der Schüler gibt wie das große Modell Wahrscheinlichkeiten aus und kann direkt in
+prediction_testing.py verwendet werden; seine Eingabeauflösung steht in den Metadaten.
+
+Am Ende werden Lehrer und Schüler verglichen: Übereinstimmung der Klassen, Genauigkeit gegenüber den Labels,
+Parameter, Dateigröße und CPU-Latenz für ein einzelnes Bild. Standardmäßig auf dem Validierungsanteil (gleiche
+Aufteilung wie resolution_sweep.py); den hat der Schüler nicht gesehen, images.keras aus model_create_and_training.py
+aber schon, da es mit allen Bildern der Klassenordner trainiert wird. Die Genauigkeit des Lehrers ist dann eine
+Trainingsgenauigkeit, Bericht und Metadaten weisen darauf hin. Mit --holdout wird stattdessen auf einem eigenen
+Ordner verglichen, der wie base_dir je einen Unterordner pro Klasse enthält (fzn, fzgs) und von keinem der beiden
+Modelle gesehen wurde.
+
+Benutzung:
+    python distillation.py --teacher images.keras --output student.keras --unlabeled unsortiert --epochs 10
+    python distillation.py --teacher images.keras --output student.keras --holdout zurueckgehalten
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from model_create_and_training import (compile_model, configure_threads, dataset_from_files, folders, list_image_files,
+                                       split_files)
+from model_metadata import resolve_image_size, save_metadata
+
+# Dateiendungen, die in Ordnern mit unbeschrifteten Bildern berücksichtigt werden
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+# Funktion zum Erstellen des kompakten Schüler-Modells
+# Statt Flatten + Dense (der Großteil der Parameter des Lehrers) fasst Global Average Pooling die Merkmale zusammen
+def create_student(input_shape: Tuple[int, int, int], num_classes: int):
+    from tensorflow.keras.layers import Conv2D, Dense, GlobalAveragePooling2D, Input, MaxPooling2D
+    from tensorflow.keras.models import Sequential
+
+    return Sequential([
+        Input(shape=input_shape),
+        Conv2D(16, (3, 3), strides=2, activation='relu'),
+        MaxPooling2D((2, 2)),
+        Conv2D(32, (3, 3), activation='relu'),
+        MaxPooling2D((2, 2)),
+        Conv2D(64, (3, 3), activation='relu'),
+        GlobalAveragePooling2D(),
+        Dense(num_classes, activation='softmax'),
+    ])
+
+
+# Funktion zum Glätten von Wahrscheinlichkeiten mit der Temperatur T: softmax(log p / T)
+def soften(probabilities: np.ndarray, temperature: float) -> np.ndarray:
+    logits = np.log(np.clip(probabilities, 1e-7, 1.0)) / temperature
+    logits -= logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+# Funktion zum Erstellen der Verlustfunktion
+# y_true enthält pro Bild [Lehrer_T (C Werte), One-Hot-Label (C Werte), 1 falls beschriftet sonst 0]
+def distillation_loss(num_classes: int, temperature: float, alpha: float):
+    import tensorflow as tf
+
+    def loss(y_true, y_pred):
+        soft_targets = y_true[:, :num_classes]
+        hard_targets = y_true[:, num_classes:2 * num_classes]
+        labelled = y_true[:, 2 * num_classes]
+        log_probabilities = tf.math.log(tf.clip_by_value(y_pred, 1e-7, 1.0))
+        # Der Schüler gibt Wahrscheinlichkeiten aus; log p / T entspricht bis auf eine Konstante den Logits / T
+        soft_student = tf.nn.log_softmax(log_probabilities / temperature, axis=1)
+        soft_teacher = tf.clip_by_value(soft_targets, 1e-7, 1.0)
+        kl = tf.reduce_sum(soft_targets * (tf.math.log(soft_teacher) - soft_student), axis=1)
+        cross_entropy = -tf.reduce_sum(hard_targets * log_probabilities, axis=1)
+        return alpha * temperature ** 2 * kl + (1 - alpha) * labelled * cross_entropy
+
+    return loss
+
+
+# Funktion zum Auflisten der Bilder in Ordnern ohne Labels
+def list_unlabeled_files(directories: List[str]) -> List[str]:
+    paths = []
+    for directory in directories:
+        paths.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                     if name.lower().endswith(IMAGE_EXTENSIONS))
+    return paths
+
+
+# Funktion zum Berechnen der Wahrscheinlichkeiten eines geladenen Modells in Stapeln
+def predict_probabilities(model, paths: List[str], image_size: Tuple[int, int], batch_size: int = 32) -> np.ndarray:
+    from prediction_testing import load_batch
+
+    probabilities = []
+    for start in range(0, len(paths), batch_size):
+        probabilities.append(model.predict(load_batch(paths[start:start + batch_size], image_size), verbose=0))
+    return np.concatenate(probabilities) if probabilities else np.zeros((0, len(folders)), np.float32)
+
+
+# Funktion zum Ermitteln der Dateigröße eines Modells (Datei oder Verzeichnis im Schnellformat)
+def model_size_mb(model_path: str) -> float:
+    from prediction_cache import model_files
+
+    return sum(os.path.getsize(path) for path in model_files(model_path)) / 1e6
+
+
+# Funktion zum Auflisten der zurückgehaltenen Bilder: ein Unterordner pro Klasse mit demselben Namen wie in folders
+def list_holdout_files(holdout_dir: str) -> Tuple[List[str], List[int]]:
+    return list_image_files({name: os.path.join(holdout_dir, os.path.basename(os.path.normpath(folder)))
+                             for name, folder in folders.items()})
+
+
+# Funktion zum Vergleichen von Lehrer und Schüler auf den übergebenen Bildern
+def compare_models(teacher, teacher_path: str, teacher_size: Tuple[int, int], student, student_path: str,
+                   student_size: Tuple[int, int], val_paths: List[str], val_labels: List[int],
+                   batch_size: int) -> Dict[str, Dict[str, float]]:
+    from resolution_sweep import measure_latency
+
+    teacher_classes = np.argmax(predict_probabilities(teacher, val_paths, teacher_size, batch_size), axis=1)
+    student_classes = np.argmax(predict_probabilities(student, val_paths, student_size, batch_size), axis=1)
+    labels = np.asarray(val_labels)
+    report = {}
+    for name, model, path, size, classes in (('teacher', teacher, teacher_path, teacher_size, teacher_classes),
+                                             ('student', student, student_path, student_size, student_classes)):
+        report[name] = {
+            'image_size': size[0],
+            'accuracy': float(np.mean(classes == labels)) if len(labels) else 0.0,
+            'params': int(model.count_params()),
+            'size_mb': model_size_mb(path),
+            'latency_ms': measure_latency(model, size) * 1000,
+        }
+    report['agreement'] = float(np.mean(teacher_classes == student_classes)) if len(labels) else 0.0
+    return report
+
+
+def print_report(report: Dict) -> None:
+    print(f"{'Modell':>8}{'Auflösung':>11}{'Genauigkeit':>13}{'Parameter':>14}{'Größe [MB]':>12}{'Latenz [ms]':>13}")
+    for name, label in (('teacher', 'Lehrer'), ('student', 'Schüler')):
+        result = report[name]
+        print(f"{label:>8}{result['image_size']:>8} px{result['accuracy']:>13.3f}{result['params']:>14,}"
+              f"{result['size_mb']:>12.1f}{result['latency_ms']:>13.1f}")
+    print(f"Übereinstimmung Schüler/Lehrer auf {report['comparison_images']} Bildern ({report['comparison_set']}): "
+          f"{report['agreement']:.3f}")
+    if report.get('teacher_accuracy_note'):
+        print("Hinweis: Ist der Lehrer mit allen Bildern der Klassenordner trainiert (model_create_and_training.py), "
+              "ist seine Genauigkeit eine Trainingsgenauigkeit. Für einen fairen Vergleich --holdout angeben.")
+
+
+# Funktion zum Destillieren: Lehrer laden, Ziele berechnen, Schüler trainieren, speichern und vergleichen
+def distill(teacher_path: str = 'images.keras', output: str = 'student.keras', student_size: int = 128,
+            unlabeled: Optional[List[str]] = None, epochs: int = 10, batch_size: int = 32, temperature: float = 4.0,
+            alpha: float = 0.9, validation_split: float = 0.2, seed: int = 42,
+            holdout: Optional[str] = None) -> Dict:
+    from fast_model_io import load_any_model, select_model_path
+
+    teacher_path = select_model_path(teacher_path)
+    teacher = load_any_model(teacher_path)
+    teacher_size = resolve_image_size(teacher_path, teacher)
+    num_classes = len(folders)
+
+    paths, labels = list_image_files(folders)
+    train_paths, train_labels, val_paths, val_labels = split_files(paths, labels, validation_split, seed)
+    # Ohne zurückgehaltenen Ordner wird auf dem Validierungsanteil verglichen, den der Lehrer meist schon kennt
+    if holdout:
+        compare_paths, compare_labels = list_holdout_files(holdout)
+    else:
+        compare_paths, compare_labels = val_paths, val_labels
+    # Validierungs- und Vergleichsbilder dürfen nicht als unbeschriftete Trainingsbilder hineinrutschen
+    excluded = {os.path.abspath(path) for path in val_paths + train_paths + compare_paths}
+    unlabeled_paths = [path for path in list_unlabeled_files(unlabeled or []) if os.path.abspath(path) not in excluded]
+    print(f"Training: {len(train_paths)} beschriftete und {len(unlabeled_paths)} unbeschriftete Bilder, "
+          f"Validierung: {len(val_paths)} Bilder")
+
+    # Trainingsziele aus den Vorhersagen des Lehrers
+    student_paths = train_paths + unlabeled_paths
+    teacher_probabilities = predict_probabilities(teacher, student_paths, teacher_size, batch_size)
+    hard = np.zeros((len(student_paths), num_classes), np.float32)
+    hard[np.arange(len(train_labels)), train_labels] = 1.0
+    labelled = np.zeros((len(student_paths), 1), np.float32)
+    labelled[:len(train_labels)] = 1.0
+    targets = np.concatenate([soften(teacher_probabilities, temperature), hard, labelled], axis=1).astype(np.float32)
+
+    image_size = (student_size, student_size)
+    data = dataset_from_files(student_paths, targets, image_size=image_size, batch_size=batch_size)
+    student = create_student(image_size + (3,), num_classes)
+    student.compile(optimizer='adam', loss=distillation_loss(num_classes, temperature, alpha))
+    student.fit(data, epochs=epochs, verbose=2)
+    # Mit der Standard-Kompilierung speichern, damit das Modell ohne die eigene Verlustfunktion geladen werden kann
+    compile_model(student)
+    student.save(output)
+
+    report = compare_models(teacher, teacher_path, teacher_size, student, output, image_size,
+                            compare_paths, compare_labels, batch_size)
+    report['comparison_set'] = os.path.abspath(holdout) if holdout else 'validation split'
+    report['comparison_images'] = len(compare_paths)
+    if not holdout:
+        report['teacher_accuracy_note'] = 'training accuracy if the teacher was trained on all folder images'
+    save_metadata(output, image_size=[student_size, student_size],
+                  distillation={'teacher': os.path.abspath(teacher_path), 'temperature': temperature, 'alpha': alpha,
+                                'unlabeled_images': len(unlabeled_paths), 'report': report})
+    return report
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Kompaktes Schüler-Modell aus dem trainierten Modell destillieren.')
+    parser.add_argument('--teacher', default='images.keras', help='Trainiertes großes Modell (Lehrer)')
+    parser.add_argument('--output', default='student.keras', help='Pfad für das Schüler-Modell')
+    parser.add_argument('--student-size', type=int, default=128, help='Eingabeauflösung des Schülers in Pixeln')
+    parser.add_argument('--unlabeled', nargs='*', default=[], help='Ordner mit unbeschrifteten Bildern')
+    parser.add_argument('--epochs', type=int, default=10, help='Trainingsepochen')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batchgröße')
+    parser.add_argument('--temperature', type=float, default=4.0, help='Temperatur für die weichen Lehrer-Wahrscheinlichkeiten')
+    parser.add_argument('--alpha', type=float, default=0.9, help='Gewicht des Destillationsverlusts gegenüber den Labels')
+    parser.add_argument('--validation-split', type=float, default=0.2, help='Anteil der Validierungsdaten')
+    parser.add_argument('--seed', type=int, default=42, help='Seed für die Aufteilung')
+    parser.add_argument('--intra-op-threads', type=int, default=0, help='Threads innerhalb einer TensorFlow-Operation (0 = automatisch)')
+    parser.add_argument('--holdout', default=None,
+                        help='Ordner mit zurückgehaltenen Bildern (Unterordner wie fzn, fzgs) für den Vergleich')
+    parser.add_argument('--report', default=None, help='Vergleich als JSON speichern')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if not 0 <= args.alpha <= 1:
+        raise ValueError(f"Alpha must be in [0, 1], got {args.alpha}.")
+    configure_threads(args.intra_op_threads, 0)
+    report = distill(args.teacher, args.output, args.student_size, args.unlabeled, args.epochs, args.batch_size,
+                     args.temperature, args.alpha, args.validation_split, args.seed, args.holdout)
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    print(f"Schüler-Modell gespeichert unter {args.output}")
+
+
+if __name__ == "__main__":
+    main()
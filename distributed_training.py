@@ -0,0 +1,254 @@
+"""
+distributed_training.py
+
+Datenparalleles Training des Greenscreen-Klassifikators auf mehreren CPU-Workern mit
+tf.distribute.MultiWorkerMirroredStrategy.
+
+Jeder Worker ist ein eigener Prozess. Die Worker finden sich über die Cluster-Beschreibung in der
+Umgebungsvariable TF_CONFIG, z.B. für den ersten von zwei Workern:
+
+    {"cluster": {"worker": ["host1:12345", "host2:12345"]}, "task": {"type": "worker", "index": 0}}
+
+Jeder Worker liest nur seinen eigenen Teil der Bilddateien (jede n-te Datei ab seinem Index); das automatische
+Sharding von tf.distribute ist daher abgeschaltet. Die Gradienten werden nach jedem Schritt über alle Worker
+gemittelt (All-Reduce), sodass alle Worker dasselbe Modell trainieren. Worker 0 (Chief) speichert das Modell
+und schreibt die Messwerte.
+
+Für Tests auf einem Linux-Rechner startet der Befehl "local" die Worker als lokale Prozesse mit Ports auf
+localhost. Mit mehreren Angaben bei --workers wird nacheinander mit 1, 2, 4, ... Workern trainiert und die
+Skalierungseffizienz ausgegeben: Durchsatz mit n Workern / (n x Durchsatz mit einem Worker). Die Kerne des
+Rechners werden dabei gleichmäßig auf die Worker verteilt (--threads-per-worker). Die dabei trainierten Modelle
+landen in einem temporären Verzeichnis und werden danach gelöscht; nur mit --output wird das Modell gespeichert
+(bei mehreren Läufen das des letzten), damit ein Skalierungstest nicht das produktive images.keras überschreibt.
+
+Benutzung:
+    python distributed_training.py local --workers 1 2 4 --epochs 3 --image-size 128
+    TF_CONFIG='{...}' python distributed_training.py worker --epochs 10      # auf jedem Rechner des Clusters
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+# Dateiname, unter dem der Chief seine Messwerte ablegt
+RESULT_FILE = 'distributed_result.json'
+
+
+# Funktion zum Finden freier Ports auf localhost für die lokalen Worker
+def free_ports(count: int) -> List[int]:
+    sockets = []
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('localhost', 0))
+        sockets.append(sock)
+    ports = [sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return ports
+
+
+# Funktion zum Erstellen der TF_CONFIG eines Workers
+def make_tf_config(workers: List[str], index: int) -> str:
+    return json.dumps({'cluster': {'worker': workers}, 'task': {'type': 'worker', 'index': index}})
+
+
+# Funktion zum Training auf einem Worker; TF_CONFIG muss vor dem Aufruf gesetzt sein
+def train_worker(epochs: int = 3, image_size: int = 512, batch_size: int = 32, output: str = 'images.keras',
+                 threads: int = 0, result_path: Optional[str] = None) -> Dict:
+    tf_config = json.loads(os.environ.get('TF_CONFIG', '{}'))
+    num_workers = len(tf_config.get('cluster', {}).get('worker', [])) or 1
+    index = tf_config.get('task', {}).get('index', 0)
+    is_chief = index == 0
+
+    from model_create_and_training import (compile_model, configure_threads, create_model, dataset_from_files, folders,
+                                           list_image_files)
+    from model_metadata import save_metadata
+    import tensorflow as tf
+
+    configure_threads(threads, 0)
+    strategy = tf.distribute.MultiWorkerMirroredStrategy()
+
+    # Eigener Teil der Dateien; jeder Worker dekodiert und augmentiert nur diese Bilder
+    paths, labels = list_image_files(folders)
+    shard_paths, shard_labels = paths[index::num_workers], labels[index::num_workers]
+
+    # Die globale Batchgröße wird von tf.distribute auf die Worker aufgeteilt; die Anzahl der Schritte muss auf
+    # allen Workern gleich sein, daher wird jeder Teil wiederholt und die Schritte aus der Gesamtzahl berechnet
+    global_batch_size = batch_size * num_workers
+    steps_per_epoch = math.ceil(len(paths) / global_batch_size)
+    dataset = dataset_from_files(shard_paths, shard_labels, image_size=(image_size, image_size),
+                                 batch_size=global_batch_size).repeat()
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.OFF
+    dataset = dataset.with_options(options)
+
+    with strategy.scope():
+        model = create_model((image_size, image_size, 3))
+        compile_model(model)
+    loss_fn = tf.keras.losses.SparseCategoricalCrossentropy(reduction='none')
+
+    # Eigene Trainingsschleife mit strategy.run: model.fit baut das Modell unter Keras 3 mit einem strategy.reduce
+    # über den ersten Batch, das MultiWorkerMirroredStrategy außerhalb eines Replikats nicht unterstützt
+    @tf.function
+    def train_step(iterator):
+        def step(images, batch_labels):
+            with tf.GradientTape() as tape:
+                predictions = model(images, training=True)
+                loss = tf.nn.compute_average_loss(loss_fn(batch_labels, predictions), global_batch_size=global_batch_size)
+            gradients = tape.gradient(loss, model.trainable_variables)
+            model.optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+            correct = tf.reduce_sum(tf.cast(tf.equal(tf.argmax(predictions, axis=1, output_type=tf.int32),
+                                                     tf.cast(batch_labels, tf.int32)), tf.float32))
+            return loss, correct, tf.cast(tf.shape(batch_labels)[0], tf.float32)
+
+        results = strategy.run(step, args=next(iterator))
+        return [strategy.reduce(tf.distribute.ReduceOp.SUM, value, axis=None) for value in results]
+
+    iterator = iter(strategy.experimental_distribute_dataset(dataset))
+    epoch_times = []
+    history = {'loss': [], 'accuracy': []}
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        total_loss, total_correct, total_seen = 0.0, 0.0, 0.0
+        for _ in range(steps_per_epoch):
+            loss, correct, seen = train_step(iterator)
+            total_loss += float(loss)
+            total_correct += float(correct)
+            total_seen += float(seen)
+        epoch_times.append(time.perf_counter() - start)
+        history['loss'].append(total_loss / steps_per_epoch)
+        history['accuracy'].append(total_correct / total_seen)
+        if is_chief:
+            print(f"Epoche {epoch + 1}/{epochs}: {epoch_times[-1]:.1f} s, loss {history['loss'][-1]:.4f}, "
+                  f"accuracy {history['accuracy'][-1]:.4f}")
+
+    # Alle Worker müssen speichern (das Speichern synchronisiert die Variablen); nur der Chief ins Ziel
+    if is_chief:
+        model.save(output)
+        save_metadata(output, image_size=[image_size, image_size])
+    else:
+        tmp_dir = tempfile.mkdtemp()
+        model.save(os.path.join(tmp_dir, os.path.basename(output)))
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Die erste Epoche enthält das Tracing und das Füllen des Caches und wird nicht in den Durchsatz eingerechnet
+    measured = epoch_times[1:] or epoch_times
+    result = {
+        'workers': num_workers,
+        'images_per_epoch': steps_per_epoch * global_batch_size,
+        'epoch_times': epoch_times,
+        'images_per_second': steps_per_epoch * global_batch_size / (sum(measured) / len(measured)),
+        'accuracy': history['accuracy'][-1],
+        'shard_sizes': [len(paths[i::num_workers]) for i in range(num_workers)],
+    }
+    if is_chief and result_path:
+        with open(result_path, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+    return result
+
+
+# Funktion zum Starten von num_workers lokalen Worker-Prozessen; gibt die Messwerte des Chiefs zurück
+# Ohne output speichert der Chief das Modell nur im temporären Verzeichnis des Laufs, das danach gelöscht wird
+def run_local(num_workers: int, epochs: int, image_size: int, batch_size: int, output: Optional[str],
+              threads_per_worker: int) -> Dict:
+    workers = [f'localhost:{port}' for port in free_ports(num_workers)]
+    run_dir = tempfile.mkdtemp()
+    result_path = os.path.join(run_dir, RESULT_FILE)
+    output = output or os.path.join(run_dir, 'images.keras')
+    try:
+        processes = []
+        for index in range(num_workers):
+            env = dict(os.environ, TF_CONFIG=make_tf_config(workers, index), TF_CPP_MIN_LOG_LEVEL='2')
+            command = [sys.executable, os.path.abspath(__file__), 'worker', '--epochs', str(epochs),
+                       '--image-size', str(image_size), '--batch-size', str(batch_size), '--output', output,
+                       '--threads', str(threads_per_worker), '--result', result_path]
+            processes.append(subprocess.Popen(command, env=env,
+                                              stdout=None if index == 0 else subprocess.DEVNULL,
+                                              stderr=None if index == 0 else subprocess.DEVNULL))
+
+        # Schlägt ein Worker fehl, warten die anderen beim All-Reduce endlos; sie werden dann beendet
+        failed = False
+        while any(process.poll() is None for process in processes):
+            if any(process.returncode not in (None, 0) for process in processes):
+                failed = True
+                break
+            time.sleep(0.5)
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+        if failed or any(process.returncode != 0 for process in processes):
+            raise RuntimeError(f"Training with {num_workers} workers failed "
+                               f"(exit codes {[p.returncode for p in processes]}).")
+        with open(result_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+# Funktion zum Ausgeben der Skalierungseffizienz
+def print_scaling(results: List[Dict]) -> None:
+    baseline = next((result for result in results if result['workers'] == 1), results[0])
+    per_worker = baseline['images_per_second'] / baseline['workers']
+    print(f"{'Worker':>7}{'Bilder/s':>11}{'Speedup':>10}{'Effizienz':>11}{'Genauigkeit':>13}")
+    for result in results:
+        speedup = result['images_per_second'] / baseline['images_per_second']
+        efficiency = result['images_per_second'] / (per_worker * result['workers'])
+        print(f"{result['workers']:>7}{result['images_per_second']:>11.1f}{speedup:>10.2f}{efficiency:>11.0%}"
+              f"{result['accuracy']:>13.3f}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Datenparalleles Training auf mehreren CPU-Workern.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_training_args(command: argparse.ArgumentParser) -> None:
+        command.add_argument('--epochs', type=int, default=3, help='Anzahl der Trainingsepochen')
+        command.add_argument('--image-size', type=int, default=512, help='Eingabeauflösung in Pixeln (quadratisch)')
+        command.add_argument('--batch-size', type=int, default=32, help='Batchgröße pro Worker')
+
+    local = commands.add_parser('local', help='Worker als lokale Prozesse starten und die Skalierung messen')
+    add_training_args(local)
+    local.add_argument('--output', default=None,
+                       help='Pfad für das trainierte Modell (Standard: nicht speichern; bei mehreren Läufen der letzte)')
+    local.add_argument('--workers', nargs='+', type=int, default=[1, 2], help='Anzahl der Worker, z.B. 1 2 4')
+    local.add_argument('--threads-per-worker', type=int, default=None,
+                       help='Threads pro Worker (Standard: Kerne / größte Workeranzahl)')
+    local.add_argument('--report', default=None, help='Messwerte als JSON speichern')
+
+    worker = commands.add_parser('worker', help='Einen Worker mit der Cluster-Beschreibung aus TF_CONFIG starten')
+    add_training_args(worker)
+    worker.add_argument('--output', default='images.keras', help='Pfad für das trainierte Modell')
+    worker.add_argument('--threads', type=int, default=0, help='Threads innerhalb einer Operation (0 = automatisch)')
+    worker.add_argument('--result', default=None, help='Messwerte des Chiefs als JSON speichern')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if args.command == 'worker':
+        train_worker(args.epochs, args.image_size, args.batch_size, args.output, args.threads, args.result)
+        return
+
+    # Gleiche Threadanzahl pro Worker in allen Läufen, damit die Effizienz nur die Verteilung misst
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // max(args.workers))
+    results = []
+    for num_workers in args.workers:
+        print(f'Training mit {num_workers} Worker(n), je {threads} Threads ...')
+        results.append(run_local(num_workers, args.epochs, args.image_size, args.batch_size, args.output, threads))
+    print_scaling(results)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+fast_model_io.py
+
+Schnell ladbares Verzeichnisformat für trainierte Modelle.
+
+Eine .keras-Datei ist ein ZIP-Archiv, das Architektur, Gewichte und den Optimierer-Zustand enthält. Beim Laden
+werden alle Gewichte entpackt und kopiert, bevor die erste Vorhersage möglich ist. Das Verzeichnisformat trennt
+dagegen Architektur und Metadaten von den rohen Gewichten:
+
+    images.fastmodel/
+        architecture.json   Architektur des Modells (model.to_json())
+        metadata.json       Metadaten (Eingabeauflösung usw.) und Liste der Gewichte
+        weights/0000.npy    ein unkomprimiertes NumPy-Array pro Gewicht
+
+Beim Laden entfällt das Entpacken des ZIP-Archivs: Jedes Gewicht wird direkt aus seiner .npy-Datei gelesen und in
+die Variablen des Modells kopiert. Es wird also weiterhin das ganze Modell beim Laden in den Speicher gelesen,
+nicht erst bei Bedarf. Der Optimierer-Zustand wird nicht gespeichert (bei Adam zwei weitere Kopien aller
+Gewichte), dadurch sind die Dateien deutlich kleiner als images.keras. Der Gewinn beim Laden hängt vom Modell ab;
+benchmarks/bench_model_loading.py misst ihn. Das Format ist für die Vorhersage gedacht, zum Weitertrainieren
+dient weiterhin images.keras.
+
+Benutzung:
+    python fast_model_io.py images.keras images.fastmodel
+"""
+
+import argparse
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from model_metadata import load_metadata
+
+# Dateiname des Verzeichnisformats, das neben images.keras gesucht wird
+FAST_MODEL_SUFFIX = '.fastmodel'
+
+
+# Funktion zum Speichern eines Modells im Verzeichnisformat
+# Es wird zunächst in ein temporäres Verzeichnis geschrieben, das erst am Ende umbenannt wird
+def save_fast_model(model, directory: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+    tmp_dir = f'{directory}.tmp'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(os.path.join(tmp_dir, 'weights'))
+
+    with open(os.path.join(tmp_dir, 'architecture.json'), 'w', encoding='utf-8') as file:
+        file.write(model.to_json())
+
+    weights = []
+    for index, (variable, value) in enumerate(zip(model.weights, model.get_weights())):
+        file_name = f'{index:04d}.npy'
+        np.save(os.path.join(tmp_dir, 'weights', file_name), np.ascontiguousarray(value))
+        weights.append({'name': getattr(variable, 'path', variable.name), 'file': file_name,
+                        'shape': list(value.shape), 'dtype': str(value.dtype)})
+
+    with open(os.path.join(tmp_dir, 'metadata.json'), 'w', encoding='utf-8') as file:
+        json.dump(dict(metadata or {}, weights=weights), file, indent=2, ensure_ascii=False)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp_dir, directory)
+
+
+# Funktion zum Laden eines Modells aus dem Verzeichnisformat
+# Die Gewichte werden vollständig gelesen und in die Variablen des Modells kopiert
+def load_fast_model(directory: str):
+    from tensorflow.keras.models import model_from_json
+
+    with open(os.path.join(directory, 'architecture.json'), 'r', encoding='utf-8') as file:
+        model = model_from_json(file.read())
+    weights = load_metadata(directory)['weights']
+
+    if len(weights) != len(model.weights):
+        raise ValueError(f"'{directory}' contains {len(weights)} weights, the architecture expects {len(model.weights)}.")
+    for variable, entry in zip(model.weights, weights):
+        value = np.load(os.path.join(directory, 'weights', entry['file']))
+        if tuple(value.shape) != tuple(variable.shape):
+            raise ValueError(f"Weight '{entry['name']}' has shape {value.shape}, expected {tuple(variable.shape)}.")
+        variable.assign(value)
+    return model
+
+
+# Funktion zum Umwandeln einer .keras-Datei in das Verzeichnisformat
+# Die Metadaten der .keras-Datei (z.B. die Eingabeauflösung) werden übernommen
+def convert_model(model_path: str, directory: Optional[str] = None) -> str:
+    from tensorflow.keras.models import load_model
+
+    directory = directory or fast_model_path(model_path)
+    model = load_model(model_path)
+    metadata = load_metadata(model_path)
+    metadata.setdefault('image_size', list(model.input_shape[1:3]))
+    save_fast_model(model, directory, metadata)
+    return directory
+
+
+# Funktion zum Ermitteln des Verzeichnisnamens neben einer .keras-Datei (images.keras -> images.fastmodel)
+def fast_model_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + FAST_MODEL_SUFFIX
+
+
+# Funktion zum Auswählen des schnellsten aktuellen Modells
+# Das Verzeichnisformat wird nur verwendet, wenn es nicht älter ist als die .keras-Datei (z.B. nach einem Neutraining)
+def select_model_path(model_path: str) -> str:
+    directory = fast_model_path(model_path)
+    manifest = os.path.join(directory, 'metadata.json')
+    if not os.path.exists(manifest):
+        return model_path
+    if os.path.exists(model_path) and os.path.getmtime(manifest) < os.path.getmtime(model_path):
+        return model_path
+    return directory
+
+
+# Funktion zum Laden eines Modells in beiden Formaten
+def load_any_model(model_path: str):
+    if os.path.isdir(model_path):
+        return load_fast_model(model_path)
+    from tensorflow.keras.models import load_model
+    return load_model(model_path)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Modell in das schnell ladbare Verzeichnisformat umwandeln.')
+    parser.add_argument('model', nargs='?', default='images.keras', help='Quelle im .keras-Format')
+    parser.add_argument('output', nargs='?', default=None, help='Zielverzeichnis (Standard: images.fastmodel)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    directory = convert_model(args.model, args.output)
+    print(f'Modell gespeichert unter {directory}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+feature_cache.py
+
+Festplatten-Cache für die Merkmale des eingefrorenen Faltungsteils (Trunk) des Klassifikators.
+
+Beim inkrementellen Training (model_create_and_training.py --incremental) werden die Merkmale jedes Bildes
+nur einmal berechnet und unter dem SHA-256-Hash des Dateiinhalts gespeichert. Der Cache liegt in einem
+Unterordner pro Trunk-Fingerabdruck: ändern sich die Gewichte des Faltungsteils (z.B. nach einem vollständigen
+Training), werden automatisch neue Merkmale berechnet und die alten nicht mehr verwendet.
+
+Die Merkmale werden als float16 gespeichert, um Speicherplatz zu sparen.
+"""
+
+import hashlib
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+# Funktion zum Berechnen des SHA-256-Hashes einer Datei in Blöcken
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Funktion zum Berechnen eines Fingerabdrucks aus Gewichten und Eingabegröße des Faltungsteils
+def trunk_fingerprint(weights: Iterable[np.ndarray], image_size) -> str:
+    digest = hashlib.sha256(repr(tuple(image_size)).encode('utf-8'))
+    for weight in weights:
+        digest.update(np.ascontiguousarray(weight).tobytes())
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    def __init__(self, cache_dir: str, fingerprint: str):
+        # Ein Unterordner pro Trunk-Fingerabdruck, damit veraltete Merkmale nie wiederverwendet werden
+        self.directory = os.path.join(cache_dir, fingerprint[:16])
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        # Aufteilen auf Unterordner nach den ersten zwei Zeichen, damit einzelne Ordner nicht zu groß werden
+        return os.path.join(self.directory, key[:2], f'{key}.npy')
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        return np.load(path)
+
+    def put(self, key: str, features: np.ndarray) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Zuerst in eine temporäre Datei schreiben und dann umbenennen, damit ein Abbruch keine halben Dateien hinterlässt
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.save(file, features.astype(np.float16))
+        os.replace(tmp_path, path)
@@ -0,0 +1,65 @@
+"""
+greenscreen.py
+
+Gemeinsamer Einstiegspunkt für alle Werkzeuge des Projekts.
+
+Jeder Unterbefehl importiert sein Modul erst beim Aufruf und übergibt ihm die restlichen Argumente.
+`python greenscreen.py --help` lädt daher keine schweren Bibliotheken, und die reinen OpenCV-Befehle laden
+weder TensorFlow noch PyQt5.
+
+Benutzung:
+    python greenscreen.py <Befehl> [Optionen]
+    python greenscreen.py <Befehl> --help
+    python greenscreen.py insert-video bild.jpg video.mp4 ausgabe.mp4 --preview
+"""
+
+import argparse
+import importlib
+import sys
+from typing import List, Optional
+
+# Unterbefehle: Name -> (Modul mit main(argv), Beschreibung)
+COMMANDS = {
+    'convert': ('image_converter_for_model', 'Bilder auf die Eingabegröße des Modells skalieren (Pillow)'),
+    'dedupe': ('phash_index', 'Klassenordner auf Beinahe-Duplikate prüfen (pHash)'),
+    'train': ('model_create_and_training', 'Modell erstellen und trainieren (TensorFlow)'),
+    'sweep': ('resolution_sweep', 'Eingabeauflösungen vergleichen und die beste speichern (TensorFlow)'),
+    'distill': ('distillation', 'Kompaktes Schüler-Modell aus dem trainierten Modell destillieren (TensorFlow)'),
+    'train-distributed': ('distributed_training', 'Datenparalleles Training auf mehreren CPU-Workern (TensorFlow)'),
+    'calibrate-prefilter': ('color_prefilter', 'Schwellen der Farbvorstufe vor dem CNN kalibrieren (OpenCV, TensorFlow)'),
+    'predict': ('prediction_testing', 'Bilder mit dem trainierten Modell klassifizieren (TensorFlow)'),
+    'convert-model': ('fast_model_io', 'Modell in das schnell ladbare Verzeichnisformat umwandeln (TensorFlow)'),
+    'insert-image': ('insert_image_in_greenscreen_using_trained_model', 'Greenscreen durch ein Bild ersetzen (OpenCV)'),
+    'insert-video': ('insert_video_to_greenscreen_using_trained_model', 'Greenscreen durch ein Video ersetzen (OpenCV)'),
+    'multi-video': ('multi_video_compositing', 'Mehrere Greenscreens durch je ein Video ersetzen (OpenCV)'),
+    'live': ('live_compositing', 'Echtzeit-Compositing einer Kamera oder Videoschleife (OpenCV)'),
+    'jobs': ('job_queue', 'Einfügeaufträge aus einem Spool-Verzeichnis mit mehreren Workern abarbeiten'),
+    'merge-audio': ('video_and_audio_toaudiolenght', 'Video und Audio zusammenführen (moviepy)'),
+    'analyze-masks': ('mask_analyse.GreenscreenMaskTester', 'Greenscreen-Erkennung eines Bildordners prüfen (OpenCV)'),
+    'keying-sweep': ('mask_analyse.keying_sweep', 'Keying-Parameter gegen Ground-Truth-Masken bewerten (OpenCV)'),
+}
+
+
+# Funktion zum Erstellen des Parsers; die Optionen der Unterbefehle werten deren Module selbst aus
+def build_parser() -> argparse.ArgumentParser:
+    width = max(len(name) for name in COMMANDS)
+    epilog = 'Befehle:\n' + '\n'.join(f'  {name:<{width}}  {description}' for name, (_, description) in COMMANDS.items())
+    parser = argparse.ArgumentParser(prog='greenscreen', description='Greenscreen-Klassifizierung und -Compositing.',
+                                     epilog=epilog, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=COMMANDS, metavar='Befehl', help='Auszuführender Befehl (siehe unten)')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='Optionen des Befehls (greenscreen <Befehl> --help)')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    module_name, _ = COMMANDS[args.command]
+
+    # Das Modul wird erst jetzt importiert; der Programmname in seiner Hilfe lautet "greenscreen <Befehl>"
+    module = importlib.import_module(module_name)
+    sys.argv[0] = f'greenscreen {args.command}'
+    module.main(args.args)
+
+
+if __name__ == "__main__":
+    main()
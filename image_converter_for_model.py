@@ -1,39 +1,109 @@
 # Importieren des Moduls zur Interaktion mit dem Betriebssystem
 import os
 
+# Importieren des Moduls zum Auswerten der Kommandozeilenargumente
+import argparse
+from typing import List, Optional, Tuple
+
 # Importieren der Image-Klasse aus der Pillow-Bibliothek, die für die Bildverarbeitung verwendet wird
 from PIL import Image
 
-# Pfade zum Eingabe- und Ausgabeordner
+# Importieren des pHash-Index zum Erkennen von Beinahe-Duplikaten
+from phash_index import DEFAULT_MAX_DISTANCE, PHashIndex, perceptual_hash, print_report
+
+# Standardpfade zum Eingabe- und Ausgabeordner
 # 'input_folder' ist der Ordner, der die Originalbilder enthält
 # 'output_folder' ist der Ordner, in den die skalierten Bilder gespeichert werden
 input_folder = r'D:\images\gemischt'
 output_folder = r'C:\Users\ralfk\source\Repos\Bildklassifizierung-CNN\fzn'
 
-# Erstellen des Ausgabeordners, falls er nicht existiert
-os.makedirs(output_folder, exist_ok=True)
-
 # Zielgröße für die Bilder, die auf 512x512 Pixel festgelegt ist
 # Dies entspricht der Bildgröße, die im Modelltraining verwendet wird (im BE.py Code definiert als 'image_size')
 target_size = (512, 512)
 
-# Zähler, um die Bilder fortlaufend zu nummerieren
-counter = 1
-
-# Durchlaufen aller Dateien im Eingabeordner
-for filename in os.listdir(input_folder):
-    # Überprüfen, ob die Datei eine Bilddatei ist, indem die Dateiendung geprüft wird
-    if filename.endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif')):
-        img_path = os.path.join(input_folder, filename)  # Erstellen des vollständigen Pfads zur Bilddatei
-        img = Image.open(img_path)  # Öffnen des Bildes
-        # Skalieren des Bildes auf die Zielgröße unter Verwendung des LANCZOS-Resampling-Filters für hohe Qualität
-        img_resized = img.resize(target_size, Image.LANCZOS)
-        
-        # Erstellen des vollständigen Pfads zur Ausgabe-Bilddatei mit fortlaufender Nummerierung
-        output_path = os.path.join(output_folder, f'{counter}.jpg')
-        img_resized.save(output_path)  # Speichern des skalierten Bildes im Ausgabeordner
-        print(f'Saved resized image to {output_path}')  # Ausgabe einer Bestätigungsmeldung
-        counter += 1  # Erhöhen des Zählers für die nächste Datei
-
-# Ausgabe einer Abschlussmeldung, nachdem alle Bilder verarbeitet wurden
-print('Alle Bilder wurden konvertiert und gespeichert.')
+# Funktion zum Ermitteln der nächsten freien Nummer im Ausgabeordner (nach der höchsten vorhandenen Nummer)
+# Ein weiterer Lauf in denselben Ordner überschreibt so keine Bilder, auf die der pHash-Index noch verweist
+def next_image_number(output_folder: str) -> int:
+    numbers = [int(name[:-4]) for name in os.listdir(output_folder) if name.endswith('.jpg') and name[:-4].isdigit()]
+    return max(numbers, default=0) + 1
+
+# Funktion zum Konvertieren aller Bilder eines Ordners in das Format für das Modell
+# Mit einem pHash-Index werden Beinahe-Duplikate erkannt (auch gegenüber der anderen Klasse, dann als Label-Konflikt):
+# dedupe='flag' meldet sie nur, dedupe='drop' speichert sie nicht. Die Klasse ist standardmäßig der Name des Zielordners.
+# Gibt die Anzahl der gespeicherten Bilder zurück
+def convert_images(input_folder: str, output_folder: str, target_size: Tuple[int, int] = target_size,
+                   index: Optional[PHashIndex] = None, label: Optional[str] = None, dedupe: str = 'flag') -> int:
+    # Erstellen des Ausgabeordners, falls er nicht existiert
+    os.makedirs(output_folder, exist_ok=True)
+    label = label or os.path.basename(os.path.normpath(output_folder))
+    stats = {'images': 0, 'duplicates': 0, 'conflicts': 0, 'removed': 0, 'removed_bytes': 0}
+
+    # Zähler, um die Bilder fortlaufend zu nummerieren (im Anschluss an bereits vorhandene Bilder)
+    first = counter = next_image_number(output_folder)
+
+    # Durchlaufen aller Dateien im Eingabeordner
+    for filename in os.listdir(input_folder):
+        # Überprüfen, ob die Datei eine Bilddatei ist, indem die Dateiendung geprüft wird
+        if filename.endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif')):
+            img_path = os.path.join(input_folder, filename)  # Erstellen des vollständigen Pfads zur Bilddatei
+            img = Image.open(img_path)  # Öffnen des Bildes
+            # Skalieren des Bildes auf die Zielgröße unter Verwendung des LANCZOS-Resampling-Filters für hohe Qualität
+            img_resized = img.resize(target_size, Image.LANCZOS)
+            stats['images'] += 1
+
+            # Beinahe-Duplikate anhand des pHash des skalierten Bildes erkennen
+            if index is not None:
+                value = perceptual_hash(img_resized)
+                matches = index.query(value)
+                if matches:
+                    match_path, match_label, distance = matches[0]
+                    conflict = match_label != label
+                    stats['duplicates'] += 1
+                    stats['conflicts'] += conflict
+                    print(f"{'LABEL-KONFLIKT' if conflict else 'Duplikat'}: {img_path} ~ {match_path} (Abstand {distance})")
+                    if dedupe == 'drop':
+                        stats['removed'] += 1
+                        stats['removed_bytes'] += os.path.getsize(img_path)
+                        continue
+            
+            # Erstellen des vollständigen Pfads zur Ausgabe-Bilddatei mit fortlaufender Nummerierung
+            output_path = os.path.join(output_folder, f'{counter}.jpg')
+            img_resized.save(output_path)  # Speichern des skalierten Bildes im Ausgabeordner
+            print(f'Saved resized image to {output_path}')  # Ausgabe einer Bestätigungsmeldung
+            if index is not None:
+                index.add(value, output_path, label)
+            counter += 1  # Erhöhen des Zählers für die nächste Datei
+
+    # Ausgabe einer Abschlussmeldung, nachdem alle Bilder verarbeitet wurden
+    print('Alle Bilder wurden konvertiert und gespeichert.')
+    if index is not None:
+        print_report(stats)
+        if index.path:
+            index.save()
+    return counter - first
+
+# Funktion zum Auswerten der Kommandozeilenargumente; ohne Argumente werden die Standardpfade verwendet
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Bilder auf die Eingabegröße des Modells skalieren.')
+    parser.add_argument('input_folder', nargs='?', default=input_folder, help='Ordner mit den Originalbildern')
+    parser.add_argument('output_folder', nargs='?', default=output_folder, help='Zielordner (z.B. fzn oder fzgs)')
+    parser.add_argument('--size', type=int, default=target_size[0], help='Zielgröße in Pixeln (quadratisch)')
+    parser.add_argument('--dedupe', choices=['off', 'flag', 'drop'], default='flag',
+                        help='Beinahe-Duplikate nicht prüfen, nur melden oder nicht speichern')
+    parser.add_argument('--index', default=None,
+                        help='pHash-Indexdatei, gemeinsam für alle Klassenordner (Standard: phash_index.json neben dem Zielordner)')
+    parser.add_argument('--max-distance', type=int, default=DEFAULT_MAX_DISTANCE, help='Maximaler Hamming-Abstand (von 64 Bit)')
+    parser.add_argument('--label', default=None, help='Klasse der Bilder (Standard: Name des Zielordners)')
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    index = None
+    if args.dedupe != 'off':
+        index_path = args.index or os.path.join(os.path.dirname(os.path.abspath(args.output_folder)), 'phash_index.json')
+        index = PHashIndex(index_path, max_distance=args.max_distance)
+    convert_images(args.input_folder, args.output_folder, (args.size, args.size),
+                   index=index, label=args.label, dedupe=args.dedupe)
+
+if __name__ == "__main__":
+    main()
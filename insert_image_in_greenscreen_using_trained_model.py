@@ -1,16 +1,32 @@
 import os
+import json
+import time
+import argparse
 import numpy as np
 import cv2
-from typing import Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+from mask_cache import KERNEL_SIZE, LOWER_GREEN, UPPER_GREEN, MaskCache
+
+# Standardwert für den Vorschaumodus: Viertel der Auflösung
+PREVIEW_SCALE = 0.25
+
+# Dateiendungen, die beim Auflisten von Ordnern als Bilder gelten
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+def create_greenscreen_mask(image: np.ndarray, cache: Optional[MaskCache] = None) -> np.ndarray:
+    # Mit Cache wird die Maske für bereits bekannte Bilder nicht neu berechnet
+    if cache is not None:
+        params = {'function': 'largest_component', 'lower': LOWER_GREEN, 'upper': UPPER_GREEN, 'kernel': KERNEL_SIZE}
+        return cache.get_or_compute(image, params, lambda: [create_greenscreen_mask(image)])[0]
 
-def create_greenscreen_mask(image: np.ndarray) -> np.ndarray:
     hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    lower_green = np.array([35, 100, 100])
-    upper_green = np.array([85, 255, 255])
+    lower_green = np.array(LOWER_GREEN)
+    upper_green = np.array(UPPER_GREEN)
     mask = cv2.inRange(hsv, lower_green, upper_green)
     
     # Rauschunterdrückung anwenden
-    kernel = np.ones((5, 5), np.uint8)
+    kernel = np.ones((KERNEL_SIZE, KERNEL_SIZE), np.uint8)
     mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
     mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
     
@@ -30,30 +46,181 @@ def create_greenscreen_mask(image: np.ndarray) -> np.ndarray:
     
     return mask
 
-def replace_greenscreen(original_img: np.ndarray, background_img: np.ndarray, mask: np.ndarray) -> np.ndarray:
+def key_foreground(original_img: np.ndarray, mask: np.ndarray) -> Dict:
+    # Alles, was nur vom Vordergrund abhängt, einmal berechnen: Bounding Box und Gewichte der Maske
     x, y, w, h = cv2.boundingRect(mask)
-    print(f"Greenscreen area - Width: {w} px, Height: {h} px")
-    
+    mask_cropped = mask[y:y+h, x:x+w]
+    return {
+        'image': original_img,
+        'roi': (x, y, w, h),
+        'alpha': (mask_cropped / 255.0)[:, :, np.newaxis],
+        'alpha_inv': (cv2.bitwise_not(mask_cropped) / 255.0)[:, :, np.newaxis],
+    }
+
+def composite_keyed(keyed: Dict, background_img: np.ndarray) -> np.ndarray:
+    x, y, w, h = keyed['roi']
+
     # Hintergrundbild auf die Größe des Greenscreen-Bereichs strecken
     background_img_resized = cv2.resize(background_img, (w, h), interpolation=cv2.INTER_AREA)
 
-    # Erstellung des Ergebnisbildes
-    result = original_img.copy()
-    mask_cropped = mask[y:y+h, x:x+w]
-    mask_inv = cv2.bitwise_not(mask_cropped)
-
-    for c in range(0, 3):
-        result[y:y+h, x:x+w, c] = (
-            background_img_resized[:, :, c] * (mask_cropped / 255.0) + 
-            result[y:y+h, x:x+w, c] * (mask_inv / 255.0)
-        )
+    # Erstellung des Ergebnisbildes, alle drei Farbkanäle auf einmal
+    result = keyed['image'].copy()
+    result[y:y+h, x:x+w] = (
+        background_img_resized * keyed['alpha'] +
+        result[y:y+h, x:x+w] * keyed['alpha_inv']
+    )
 
     return result
 
-def main():
-    original_image_path: Union[str, None] = '128.jpg'  # Updated to the correct file path
-    background_image_path: Union[str, None] = '81.jpg'  # Make sure this path is correct for your setup
-    output_image_path: Union[str, None] = '128g.jpg'
+def replace_greenscreen(original_img: np.ndarray, background_img: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    keyed = key_foreground(original_img, mask)
+    _, _, w, h = keyed['roi']
+    print(f"Greenscreen area - Width: {w} px, Height: {h} px")
+    return composite_keyed(keyed, background_img)
+
+def encode_params(fmt: str, quality: int) -> List[int]:
+    # Kodierungsoptionen für cv2.imwrite/imencode je nach Format
+    if fmt in ('jpg', 'jpeg'):
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if fmt == 'webp':
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    if fmt == 'png':
+        # Für PNG bestimmt die Qualität die Kompressionsstufe: 100 = schnell (0), 0 = klein (9)
+        return [cv2.IMWRITE_PNG_COMPRESSION, round((100 - quality) * 9 / 100)]
+    raise ValueError(f"Unsupported output format '{fmt}'.")
+
+def list_images(paths: List[str]) -> List[str]:
+    # Ordner werden durch die enthaltenen Bilddateien ersetzt
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            images.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            images.append(path)
+    return images
+
+def load_manifest(manifest_path: str) -> List[Tuple[str, str, Optional[str]]]:
+    # Manifest: JSON-Liste von {"foreground": ..., "background": ..., "output": ... (optional)}
+    # Relative Pfade beziehen sich auf den Ordner des Manifests
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        entries = json.load(file)
+    resolve = lambda path: path if path is None else os.path.join(base, path)
+    return [(resolve(e['foreground']), resolve(e['background']), resolve(e.get('output'))) for e in entries]
+
+def load_image(path: str) -> np.ndarray:
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"Failed to load image from '{path}'.")
+    return image
+
+def output_paths(pairs: List[Tuple[str, str, Optional[str]]], output_dir: str, fmt: str) -> List[str]:
+    # Ausgabepfade vor dem Start festlegen, da parallel geschriebene Dateien mit gleichem Namen sich überschreiben
+    # Standardname <Vordergrund>__<Hintergrund>.<fmt>; bei gleichen Dateinamen aus verschiedenen Ordnern
+    # (z.B. a/1.jpg und b/1.jpg) wird _2, _3, ... angehängt. Doppelte Ausgaben im Manifest sind ein Fehler.
+    stem = lambda path: os.path.splitext(os.path.basename(path))[0]
+    key = lambda path: os.path.normcase(os.path.abspath(path))
+    explicit = [output for _, _, output in pairs if output is not None]
+    used = set()
+    for output in explicit:
+        if key(output) in used:
+            raise ValueError(f"Output '{output}' appears more than once in the manifest.")
+        used.add(key(output))
+    outputs = []
+    for fg, bg, output in pairs:
+        if output is None:
+            base = os.path.join(output_dir, f'{stem(fg)}__{stem(bg)}')
+            output, number = f'{base}.{fmt}', 1
+            while key(output) in used:
+                number += 1
+                output = f'{base}_{number}.{fmt}'
+            used.add(key(output))
+        outputs.append(output)
+    return outputs
+
+def batch_composite(pairs: List[Tuple[str, str, Optional[str]]], output_dir: str, workers: int = 4,
+                    fmt: str = 'jpg', quality: int = 95, scale: float = 1.0,
+                    cache: Optional[MaskCache] = None) -> List[str]:
+    # Viele Vordergründe x viele Hintergründe: jeder Vordergrund wird nur einmal gekeyt,
+    # jeder Hintergrund nur einmal geladen; Compositing und Kodierung laufen parallel im Threadpool
+    # (OpenCV gibt den GIL während resize/imencode frei)
+    os.makedirs(output_dir, exist_ok=True)
+    params = encode_params(fmt, quality)
+    foregrounds = sorted({fg for fg, _, _ in pairs})
+    backgrounds = sorted({bg for _, bg, _ in pairs})
+    targets = output_paths(pairs, output_dir, fmt)
+    start = time.perf_counter()
+
+    def key(path: str) -> Dict:
+        original_img = scale_for_preview(load_image(path), scale)
+        return key_foreground(original_img, create_greenscreen_mask(original_img, cache))
+
+    def composite(fg: str, bg: str, output: str) -> str:
+        result = composite_keyed(keyed[fg], background_imgs[bg])
+        ok, encoded = cv2.imencode(os.path.splitext(output)[1] or f'.{fmt}', result, params)
+        if not ok:
+            raise ValueError(f"Failed to encode '{output}'.")
+        encoded.tofile(output)
+        return output
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        keyed = dict(zip(foregrounds, pool.map(key, foregrounds)))
+        background_imgs = dict(zip(backgrounds, pool.map(load_image, backgrounds)))
+        outputs = list(pool.map(composite, [fg for fg, _, _ in pairs], [bg for _, bg, _ in pairs], targets))
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(outputs)} composites from {len(foregrounds)} foregrounds and {len(backgrounds)} backgrounds "
+          f"in {elapsed:.2f} s ({len(outputs) / elapsed:.1f} images/s)")
+    return outputs
+
+def scale_for_preview(image: np.ndarray, scale: float) -> np.ndarray:
+    # Bild für die Vorschau verkleinern; die Maske wird danach auf dem verkleinerten Bild berechnet
+    if scale <= 0 or scale > 1:
+        raise ValueError(f"Preview scale must be in (0, 1], got {scale}.")
+    if scale == 1:
+        return image
+    return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Greenscreen in einem Bild durch ein Hintergrundbild ersetzen.')
+    parser.add_argument('original_image', nargs='?', default='128.jpg', help='Bild mit Greenscreen')
+    parser.add_argument('background_image', nargs='?', default='81.jpg', help='Hintergrundbild')
+    parser.add_argument('output', nargs='?', default=None, help='Ausgabebild (Standard: 128g.jpg)')
+    parser.add_argument('--preview', action='store_true', help=f'Schnelle Entwurfsvorschau (Standard: Skalierung {PREVIEW_SCALE})')
+    parser.add_argument('--scale', type=float, default=None, help='Skalierungsfaktor für das Ausgabebild')
+    parser.add_argument('--no-mask-cache', action='store_true', help='Masken-Cache nicht verwenden')
+    batch = parser.add_argument_group('Stapelverarbeitung')
+    batch.add_argument('--foregrounds', nargs='+', default=None, help='Bilder oder Ordner mit Greenscreen (jeder mit jedem Hintergrund)')
+    batch.add_argument('--backgrounds', nargs='+', default=None, help='Hintergrundbilder oder Ordner')
+    batch.add_argument('--manifest', default=None, help='JSON-Liste von Paaren {"foreground", "background", "output"}')
+    batch.add_argument('--output-dir', default='composites', help='Zielordner der Stapelverarbeitung')
+    batch.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='Anzahl der Threads')
+    batch.add_argument('--format', choices=['jpg', 'png', 'webp'], default='jpg', help='Ausgabeformat')
+    batch.add_argument('--quality', type=int, default=95, help='Kodierungsqualität 0-100 (bei PNG: Kompressionsstufe)')
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    original_image_path: Union[str, None] = args.original_image  # Updated to the correct file path
+    background_image_path: Union[str, None] = args.background_image  # Make sure this path is correct for your setup
+    output_image_path: Union[str, None] = args.output or ('128g_preview.jpg' if args.preview else '128g.jpg')
+    scale = args.scale if args.scale is not None else (PREVIEW_SCALE if args.preview else 1.0)
+    cache = None if args.no_mask_cache else MaskCache.default()
+
+    # Stapelverarbeitung über ein Manifest oder alle Kombinationen aus Vorder- und Hintergründen
+    if args.manifest or args.foregrounds or args.backgrounds:
+        try:
+            if args.manifest:
+                pairs = load_manifest(args.manifest)
+            elif args.foregrounds and args.backgrounds:
+                pairs = [(fg, bg, None) for fg in list_images(args.foregrounds) for bg in list_images(args.backgrounds)]
+            else:
+                raise ValueError("Batch mode needs --manifest or both --foregrounds and --backgrounds.")
+            batch_composite(pairs, args.output_dir, workers=args.workers, fmt=args.format,
+                            quality=args.quality, scale=scale, cache=cache)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+        return
 
     try:
         if not os.path.exists(original_image_path):
@@ -69,7 +236,8 @@ def main():
         if background_img is None:
             raise ValueError(f"Failed to load background image from '{background_image_path}'.")
 
-        mask = create_greenscreen_mask(original_img)
+        original_img = scale_for_preview(original_img, scale)
+        mask = create_greenscreen_mask(original_img, cache)
         
         result = replace_greenscreen(original_img, background_img, mask)
 
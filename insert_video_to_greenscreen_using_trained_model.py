@@ -1,22 +1,36 @@
 import os  # Modul zum Arbeiten mit dem Betriebssystem, z.B. zum Überprüfen von Dateipfaden
+import argparse  # Modul zum Auswerten der Kommandozeilenargumente
 import numpy as np  # Bibliothek für numerische Berechnungen, insbesondere für Arrays
 import cv2  # Bibliothek für die Bild- und Videobearbeitung
-from typing import Union  # Hilft bei der Angabe von Datentypen in Funktionssignaturen
+from typing import List, Optional, Union  # Hilft bei der Angabe von Datentypen in Funktionssignaturen
+from insert_image_in_greenscreen_using_trained_model import PREVIEW_SCALE, scale_for_preview  # Vorschau wie beim Einfügen in ein Bild
+from mask_cache import KERNEL_SIZE, LOWER_GREEN, UPPER_GREEN, MaskCache  # Gemeinsamer Masken-Cache und Keying-Parameter
+from rendition_writer import open_output_writer  # Mehrere Auflösungen aus einem Compositing-Durchlauf
+from shared_memory_render import DEFAULT_SLOTS, replace_greenscreen_with_video_shared  # Mehrprozess-Renderpfad über Shared Memory
+from video_readers import DEFAULT_FPS, DEFAULT_LOOP_CACHE_BYTES, open_looping_reader, open_video_reader, resample_frames  # Hintergrundvideo in ROI-Größe und Zielbildrate lesen
+
+# Standardwert für den Vorschaumodus: nur jeder vierte Frame (Auflösung siehe PREVIEW_SCALE)
+PREVIEW_FRAME_STRIDE = 4
 
 # Funktion zur Erstellung einer Maske für den Greenscreen-Bereich im Bild
-def create_greenscreen_mask(image: np.ndarray) -> np.ndarray:
+# Mit Cache wird die Maske für bereits bekannte Bilder aus dem Masken-Cache gelesen
+def create_greenscreen_mask(image: np.ndarray, cache: Optional[MaskCache] = None) -> np.ndarray:
+    if cache is not None:
+        params = {'function': 'largest_component', 'lower': LOWER_GREEN, 'upper': UPPER_GREEN, 'kernel': KERNEL_SIZE}
+        return cache.get_or_compute(image, params, lambda: [create_greenscreen_mask(image)])[0]
+
     # Bild von BGR (Blau, Grün, Rot) in HSV (Farbton, Sättigung, Helligkeit) umwandeln
     hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
     
     # Untere und obere Grenzen für die Grünfarbe im HSV-Farbraum definieren
-    lower_green = np.array([35, 100, 100])
-    upper_green = np.array([85, 255, 255])
+    lower_green = np.array(LOWER_GREEN)
+    upper_green = np.array(UPPER_GREEN)
     
     # Maske erstellen, die nur die grünen Bereiche des Bildes enthält
     mask = cv2.inRange(hsv, lower_green, upper_green)
     
     # Rauschunterdrückung anwenden, um die Maske zu bereinigen
-    kernel = np.ones((5, 5), np.uint8)
+    kernel = np.ones((KERNEL_SIZE, KERNEL_SIZE), np.uint8)
     mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
     mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
     
@@ -38,27 +52,46 @@ def create_greenscreen_mask(image: np.ndarray) -> np.ndarray:
     return mask
 
 # Funktion zum Ersetzen des Greenscreens durch ein Hintergrundvideo
-def replace_greenscreen_with_video(original_img: np.ndarray, video_path: str, mask: np.ndarray, output_video_path: str) -> None:
+# output_fps legt die Bildrate des Ausgabevideos fest (Standard: die des Hintergrundvideos)
+# frame_stride > 1 teilt die Bildrate zusätzlich (Vorschau), max_frames begrenzt die Länge des Ausgabevideos
+# reader wählt den Videoleser: 'opencv' skaliert nach dem Dekodieren, 'ffmpeg' dekodiert direkt in ROI-Größe
+# loop spielt das Hintergrundvideo in Schleife ab, bis duration (Sekunden) oder max_frames erreicht ist;
+# die Frames kurzer Loops bleiben dabei bis loop_cache_bytes im Speicher und werden nur einmal dekodiert
+# renditions: Höhen mehrerer Ausgabevideos (z.B. [1080, 720]); das Compositing läuft einmal in voller Größe,
+# danach wird jeder Frame pro Rendition parallel verkleinert und kodiert (Dateinamen siehe rendition_writer.py)
+def replace_greenscreen_with_video(original_img: np.ndarray, video_path: str, mask: np.ndarray, output_video_path: str,
+                                   frame_stride: int = 1, max_frames: Optional[int] = None, reader: str = 'opencv',
+                                   output_fps: Optional[float] = None, loop: bool = False, duration: Optional[float] = None,
+                                   loop_cache_bytes: int = DEFAULT_LOOP_CACHE_BYTES,
+                                   renditions: Optional[List[int]] = None) -> None:
+    if frame_stride < 1:
+        raise ValueError(f"Frame stride must be at least 1, got {frame_stride}.")
+    if loop and max_frames is None and duration is None:
+        raise ValueError("Looping the background video needs a duration or a maximum number of frames.")
+
     # Bounding Box des Greenscreen-Bereichs ermitteln (Position und Größe des Rechtecks, das den Greenscreen umgibt)
     x, y, w, h = cv2.boundingRect(mask)
     print(f"Greenscreen area - Width: {w} px, Height: {h} px")
     
-    # Video öffnen
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise ValueError(f"Failed to open video file '{video_path}'.")
-
-    # Video-Writer initialisieren, um das Ausgabevideo zu speichern
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video_path, fourcc, cap.get(cv2.CAP_PROP_FPS), (original_img.shape[1], original_img.shape[0]))
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # Hintergrundvideo auf die Größe des Greenscreen-Bereichs strecken
-        background_img_resized = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+    # Video öffnen; die Frames werden vom Leser bereits auf die Größe des Greenscreen-Bereichs gebracht
+    if loop:
+        cap = open_looping_reader(video_path, (w, h), reader, loop_cache_bytes)
+    else:
+        cap = open_video_reader(video_path, (w, h), reader)
+
+    # Video-Writer initialisieren, um das Ausgabevideo (bzw. die Renditions) zu speichern
+    # Bei übersprungenen Frames wird die Bildrate entsprechend reduziert, damit die Vorschau gleich lang bleibt
+    fps = (output_fps or cap.fps or DEFAULT_FPS) / frame_stride
+    out = open_output_writer(output_video_path, fps, (original_img.shape[1], original_img.shape[0]), renditions)
+    if duration is not None:
+        duration_frames = int(round(duration * fps))
+        max_frames = duration_frames if max_frames is None else min(max_frames, duration_frames)
+
+    # Die Quellframes werden über ihren Zeitstempel der Ausgabebildrate zugeordnet;
+    # nicht benötigte Frames werden nur mit grab() weitergeschaltet, ohne sie mit retrieve() umzuwandeln
+    for frame in resample_frames(cap, fps, max_frames):
+        # Der Frame hat bereits die Größe des Greenscreen-Bereichs
+        background_img_resized = frame
 
         # Ergebnisbild erstellen
         result = original_img.copy()
@@ -75,16 +108,55 @@ def replace_greenscreen_with_video(original_img: np.ndarray, video_path: str, ma
         # Ergebnisbild zum Ausgabevideo hinzufügen
         out.write(result)
     
+    if loop:
+        if cap.caching:
+            print(f"Background loop cached in memory: {len(cap.frames)} frames, {cap.cached_bytes / 1e6:.1f} MB")
+        else:
+            print(f"Background loop too large for the cache, decoded {cap.passes} times")
+
     # Ressourcen freigeben
     cap.release()
     out.release()
 
+# Funktion zum Auswerten der Kommandozeilenargumente
+# Ohne Argumente werden die bisherigen Standardpfade verwendet
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Greenscreen in einem Bild durch ein Hintergrundvideo ersetzen.')
+    parser.add_argument('original_image', nargs='?', default='l1.jpg', help='Bild mit Greenscreen')
+    parser.add_argument('video', nargs='?', default='maus.mp4', help='Hintergrundvideo')
+    parser.add_argument('output', nargs='?', default=None, help='Ausgabevideo (Standard: output_maus.mp4)')
+    parser.add_argument('--preview', action='store_true',
+                        help=f'Schnelle Entwurfsvorschau (Standard: Skalierung {PREVIEW_SCALE}, jeder {PREVIEW_FRAME_STRIDE}. Frame)')
+    parser.add_argument('--scale', type=float, default=None, help='Skalierungsfaktor für das Ausgabevideo')
+    parser.add_argument('--fps', type=float, default=None, help='Bildrate des Ausgabevideos (Standard: die des Hintergrundvideos)')
+    parser.add_argument('--frame-stride', type=int, default=None, help='Nur jeden n-ten Frame des Hintergrundvideos verwenden')
+    parser.add_argument('--max-frames', type=int, default=None, help='Maximale Anzahl der geschriebenen Frames')
+    parser.add_argument('--loop', action='store_true', help='Hintergrundvideo in Schleife abspielen (mit --duration oder --max-frames)')
+    parser.add_argument('--duration', type=float, default=None, help='Länge des Ausgabevideos in Sekunden')
+    parser.add_argument('--loop-cache-mb', type=float, default=DEFAULT_LOOP_CACHE_BYTES / 2**20,
+                        help='Speicherlimit für die Frames des Loops in MB; darüber wird pro Durchlauf neu dekodiert')
+    parser.add_argument('--no-mask-cache', action='store_true', help='Masken-Cache nicht verwenden')
+    parser.add_argument('--reader', choices=['opencv', 'ffmpeg', 'auto'], default='opencv',
+                        help='Videoleser: ffmpeg dekodiert das Hintergrundvideo direkt in ROI-Größe (auto: ffmpeg, falls vorhanden)')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='Anzahl der Compositor-Prozesse; Decoder und Encoder laufen dann in eigenen Prozessen und tauschen Frames über Shared Memory (0 = ein Prozess)')
+    parser.add_argument('--renditions', type=int, nargs='+', default=None,
+                        help='Höhen mehrerer Ausgabevideos, z.B. 2160 1080 720; einmal compositen, dann pro Höhe verkleinern und kodieren (Ausgabe: <output>_<Höhe>p.mp4)')
+    parser.add_argument('--slots', type=int, default=DEFAULT_SLOTS, help='Frame-Slots pro Shared-Memory-Ringpuffer (mit --processes)')
+    return parser.parse_args(argv)
+
 # Hauptfunktion, um das Skript auszuführen
-def main():
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+
     # Pfade zu den Eingabedateien und der Ausgabedatei
-    original_image_path: Union[str, None] = 'l1.jpg'  # Pfad zum Bild mit Greenscreen
-    video_path: Union[str, None] = 'maus.mp4'  # Pfad zum Hintergrundvideo
-    output_video_path: Union[str, None] = 'output_maus.mp4'  # Pfad zum Ausgabevideo
+    original_image_path: Union[str, None] = args.original_image  # Pfad zum Bild mit Greenscreen
+    video_path: Union[str, None] = args.video  # Pfad zum Hintergrundvideo
+    output_video_path: Union[str, None] = args.output or ('output_maus_preview.mp4' if args.preview else 'output_maus.mp4')  # Pfad zum Ausgabevideo
+
+    # Im Vorschaumodus gelten die Vorschau-Standardwerte, sofern sie nicht explizit überschrieben werden
+    scale = args.scale if args.scale is not None else (PREVIEW_SCALE if args.preview else 1.0)
+    frame_stride = args.frame_stride if args.frame_stride is not None else (PREVIEW_FRAME_STRIDE if args.preview else 1)
 
     try:
         # Überprüfen, ob die Dateien existieren
@@ -98,13 +170,23 @@ def main():
         if original_img is None:
             raise ValueError(f"Failed to load original image from '{original_image_path}'.")
 
+        # Für die Vorschau das Bild verkleinern, bevor die Maske berechnet wird
+        original_img = scale_for_preview(original_img, scale)
+
         # Maske für den Greenscreen erstellen
-        mask = create_greenscreen_mask(original_img)
+        mask = create_greenscreen_mask(original_img, None if args.no_mask_cache else MaskCache.default())
         
-        # Greenscreen durch das Hintergrundvideo ersetzen
-        replace_greenscreen_with_video(original_img, video_path, mask, output_video_path)
+        # Greenscreen durch das Hintergrundvideo ersetzen (mit --processes in getrennten Prozessen)
+        options = dict(frame_stride=frame_stride, max_frames=args.max_frames, reader=args.reader, output_fps=args.fps,
+                       loop=args.loop, duration=args.duration, loop_cache_bytes=int(args.loop_cache_mb * 2**20),
+                       renditions=args.renditions)
+        if args.processes > 0:
+            replace_greenscreen_with_video_shared(original_img, video_path, mask, output_video_path,
+                                                  compositors=args.processes, slots=args.slots, **options)
+        else:
+            replace_greenscreen_with_video(original_img, video_path, mask, output_video_path, **options)
 
-        print(f'Result saved to {output_video_path}')
+        print(f'Result saved to {output_video_path}' if not args.renditions else 'Renditions saved')
     except Exception as e:
         print(f"An error occurred: {e}")
 
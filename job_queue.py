@@ -0,0 +1,398 @@
+"""
+job_queue.py
+
+Warteschlange für Einfügeaufträge über ein Spool-Verzeichnis, abgearbeitet von einem Pool aus Worker-Prozessen.
+
+Jeder Auftrag ist eine JSON-Datei. Der Zustand eines Auftrags ist der Ordner, in dem seine Datei liegt:
+
+    spool/
+        incoming/   eingereicht, wartet
+        running/    von einem Worker übernommen
+        done/       fertig, mit Laufzeit und Ausgabepfad
+        failed/     fehlgeschlagen, mit Fehlermeldung
+
+Alle Zustandswechsel sind Umbenennungen (os.replace) und damit atomar; auch mehrere Runner auf demselben Spool
+übernehmen keinen Auftrag doppelt. Die Ausgabe wird zuerst in eine temporäre Datei neben dem Ziel geschrieben und
+erst nach Erfolg umbenannt, sodass nie eine halbe Ausgabedatei unter dem endgültigen Namen liegt.
+
+Jeder Runner hat eine Kennung (Rechner, Prozess, Zufallsteil) und eine Lease-Datei runners/<Kennung>.lease, deren
+Änderungszeit er bei jedem Durchlauf seiner Schleife erneuert. Beim Übernehmen wird der Auftrag in running/ unter
+<Kennung>__<Name> abgelegt, der Besitzer steht also schon im atomar umbenannten Dateinamen. Nach einem Absturz
+stellt ein Runner beim Start nur Aufträge zurück nach incoming/, deren Besitzer keine Lease mehr hat oder deren
+Lease länger als LEASE_TIMEOUT nicht erneuert wurde, und löscht deren temporäre Dateien. Laufende Aufträge anderer
+Runner bleiben unangetastet. Aufträge in done/ werden nicht wiederholt.
+
+Eine Auftragsdatei, die sich nicht lesen lässt, wird unverändert nach failed/ verschoben; die Fehlermeldung steht
+daneben in <Name>.error.
+
+Auftragsformat (relative Pfade beziehen sich auf den Ordner, der das Spool-Verzeichnis enthält):
+
+    {"type": "image", "foreground": "128.jpg", "background": "81.jpg", "output": "out/128g.jpg",
+     "params": {"scale": 1.0, "quality": 95}}
+    {"type": "video", "foreground": "l1.jpg", "background": "maus.mp4", "output": "out/maus.mp4",
+     "params": {"fps": 30, "frame_stride": 1, "max_frames": null, "reader": "opencv"}}
+    {"type": "multi-video", "foreground": "bild.jpg", "backgrounds": ["a.mp4", "b.mp4"], "output": "out/multi.mp4",
+     "params": {"fps": 30, "reader": "opencv"}}
+
+Benutzung:
+    python job_queue.py submit spool --type image --foreground 128.jpg --background 81.jpg --output out/128g.jpg
+    python job_queue.py run spool --workers 4          # Spool beobachten, bis zum Abbruch
+    python job_queue.py run spool --workers 4 --once   # nur vorhandene Aufträge abarbeiten
+    python job_queue.py status spool
+"""
+
+import argparse
+import json
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+# Zustände eines Auftrags; jeder Zustand ist ein Unterordner des Spool-Verzeichnisses
+STATES = ('incoming', 'running', 'done', 'failed')
+
+# Auftragsarten
+JOB_TYPES = ('image', 'video', 'multi-video')
+
+# Abfrageintervall des Spool-Verzeichnisses in Sekunden
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Sekunden ohne erneuerte Lease, nach denen ein Runner als abgestürzt gilt
+LEASE_TIMEOUT = 30.0
+
+# Trennzeichen zwischen Runner-Kennung und Auftragsname in running/
+OWNER_SEPARATOR = '__'
+
+
+# Funktion zum Anlegen der Zustandsordner
+def init_spool(spool_dir: str) -> None:
+    for state in STATES + ('runners',):
+        os.makedirs(os.path.join(spool_dir, state), exist_ok=True)
+
+
+# Funktion zum Erzeugen einer eindeutigen Runner-Kennung (ohne das Trennzeichen der Dateinamen in running/)
+def runner_id() -> str:
+    host = socket.gethostname().replace(OWNER_SEPARATOR, '_') or 'host'
+    return f"{host}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def lease_path(spool_dir: str, owner: str) -> str:
+    return os.path.join(spool_dir, 'runners', f'{owner}.lease')
+
+
+# Funktion zum Anlegen bzw. Erneuern der Lease eines Runners
+def renew_lease(spool_dir: str, owner: str) -> None:
+    path = lease_path(spool_dir, owner)
+    with open(path, 'a', encoding='utf-8'):
+        pass
+    os.utime(path)
+
+
+# Funktion zum Prüfen, ob der Besitzer eines Auftrags noch lebt (Lease vorhanden und frisch)
+def lease_alive(spool_dir: str, owner: str, timeout: float = LEASE_TIMEOUT) -> bool:
+    try:
+        return time.time() - os.path.getmtime(lease_path(spool_dir, owner)) <= timeout
+    except FileNotFoundError:
+        return False
+
+
+# Funktion zum Lesen und Schreiben einer Auftragsdatei; geschrieben wird atomar über eine temporäre Datei
+# Funktion zum Lesen eines Auftrags; gültiges JSON, das kein Auftrag ist (z.B. 42, null, []), gilt als ungültig
+def read_job(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as file:
+        job = json.load(file)
+    if not isinstance(job, dict):
+        raise ValueError(f"Job must be a JSON object, got {type(job).__name__}.")
+    if job.get('type') not in JOB_TYPES:
+        raise ValueError(f"Unknown job type '{job.get('type')}', expected one of {', '.join(JOB_TYPES)}.")
+    if not isinstance(job.get('output'), str):
+        raise ValueError("Job has no output path.")
+    return job
+
+
+def write_job(path: str, job: Dict[str, Any]) -> None:
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(job, file, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# Funktion zum Einreichen eines Auftrags
+def submit_job(spool_dir: str, job: Dict[str, Any]) -> str:
+    if job.get('type') not in JOB_TYPES:
+        raise ValueError(f"Unknown job type '{job.get('type')}', expected one of {', '.join(JOB_TYPES)}.")
+    init_spool(spool_dir)
+    # Zeitstempel im Namen: incoming/ wird in Einreichungsreihenfolge abgearbeitet
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.json"
+    path = os.path.join(spool_dir, 'incoming', name)
+    write_job(path, job)
+    return path
+
+
+# Funktion zum Ermitteln des temporären Ausgabepfads; die Dateiendung bleibt erhalten, damit OpenCV das Format erkennt
+def temp_output_path(output_path: str) -> str:
+    base, ext = os.path.splitext(output_path)
+    return f'{base}.part{ext}'
+
+
+# Funktion zum Auflösen relativer Pfade gegenüber dem Ordner, der das Spool-Verzeichnis enthält
+def resolve_paths(job: Dict[str, Any], base_dir: str) -> Dict[str, Any]:
+    resolve = lambda path: path if path is None or os.path.isabs(path) else os.path.join(base_dir, path)
+    job = dict(job)
+    for key in ('foreground', 'background', 'output'):
+        if key in job:
+            job[key] = resolve(job[key])
+    if 'backgrounds' in job:
+        job['backgrounds'] = [resolve(path) for path in job['backgrounds']]
+    return job
+
+
+# Funktion zum Ausführen eines Auftrags im Worker-Prozess
+# Die Module werden erst hier importiert, damit der Runner selbst kein OpenCV lädt
+def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    import cv2
+    from mask_cache import MaskCache
+
+    params = job.get('params') or {}
+    cache = None if params.get('no_mask_cache') else MaskCache.default()
+    output_path = job['output']
+    tmp_path = temp_output_path(output_path)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    start = time.perf_counter()
+
+    try:
+        if job['type'] == 'image':
+            import insert_image_in_greenscreen_using_trained_model as insert_image
+            original_img = insert_image.scale_for_preview(insert_image.load_image(job['foreground']), params.get('scale', 1.0))
+            mask = insert_image.create_greenscreen_mask(original_img, cache)
+            result = insert_image.composite_keyed(insert_image.key_foreground(original_img, mask),
+                                                  insert_image.load_image(job['background']))
+            fmt = os.path.splitext(output_path)[1].lstrip('.').lower() or 'jpg'
+            ok, encoded = cv2.imencode(f'.{fmt}', result, insert_image.encode_params(fmt, params.get('quality', 95)))
+            if not ok:
+                raise ValueError(f"Failed to encode '{output_path}'.")
+            encoded.tofile(tmp_path)
+        elif job['type'] == 'video':
+            import insert_video_to_greenscreen_using_trained_model as insert_video
+            original_img = cv2.imread(job['foreground'])
+            if original_img is None:
+                raise ValueError(f"Failed to load original image from '{job['foreground']}'.")
+            original_img = insert_video.scale_for_preview(original_img, params.get('scale', 1.0))
+            mask = insert_video.create_greenscreen_mask(original_img, cache)
+            insert_video.replace_greenscreen_with_video(original_img, job['background'], mask, tmp_path,
+                                                        frame_stride=params.get('frame_stride', 1),
+                                                        max_frames=params.get('max_frames'),
+                                                        reader=params.get('reader', 'opencv'),
+                                                        output_fps=params.get('fps'))
+        elif job['type'] == 'multi-video':
+            import multi_video_compositing
+            original_img = cv2.imread(job['foreground'])
+            if original_img is None:
+                raise ValueError(f"Failed to load original image from '{job['foreground']}'.")
+            masks = multi_video_compositing.create_greenscreen_masks(original_img, len(job['backgrounds']), cache)
+            multi_video_compositing.replace_greenscreens_with_videos(original_img, job['backgrounds'], masks, tmp_path,
+                                                                     output_fps=params.get('fps'),
+                                                                     reader=params.get('reader', 'opencv'))
+        else:
+            raise ValueError(f"Unknown job type '{job['type']}'.")
+
+        if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
+            raise ValueError(f"No output was written for '{output_path}'.")
+    except Exception:
+        # Keine halbe Ausgabe zurücklassen
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    return {'output': output_path, 'duration': time.perf_counter() - start}
+
+
+# Funktion zum Wiederaufnehmen nach einem Absturz: Aufträge abgestürzter Runner zurückstellen
+# Aufträge, deren Runner noch eine frische Lease hat, laufen noch und werden nicht angefasst
+def recover(spool_dir: str, timeout: float = LEASE_TIMEOUT) -> int:
+    base_dir = os.path.dirname(os.path.abspath(spool_dir))
+    recovered = 0
+    running_dir = os.path.join(spool_dir, 'running')
+    for running_name in sorted(os.listdir(running_dir)):
+        if not running_name.endswith('.json'):
+            continue
+        owner, _, name = running_name.rpartition(OWNER_SEPARATOR)
+        if owner and lease_alive(spool_dir, owner, timeout):
+            continue
+        path = os.path.join(running_dir, running_name)
+        try:
+            job = resolve_paths(read_job(path), base_dir)
+            tmp_path = temp_output_path(job['output'])
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except (OSError, ValueError, KeyError):
+            pass  # Beschädigte Aufträge werden beim erneuten Ausführen als fehlgeschlagen markiert
+        try:
+            os.replace(path, os.path.join(spool_dir, 'incoming', name))
+        except FileNotFoundError:
+            continue  # ein anderer Runner hat den Auftrag gleichzeitig zurückgestellt
+        recovered += 1
+    return recovered
+
+
+# Funktion zum Übernehmen des ältesten wartenden Auftrags
+# Die Umbenennung ist atomar; schlägt sie fehl, hat ein anderer Runner den Auftrag bereits übernommen
+def claim_next(spool_dir: str, owner: str) -> Optional[str]:
+    incoming_dir = os.path.join(spool_dir, 'incoming')
+    for name in sorted(os.listdir(incoming_dir)):
+        if not name.endswith('.json'):
+            continue
+        target = os.path.join(spool_dir, 'running', f'{owner}{OWNER_SEPARATOR}{name}')
+        try:
+            os.replace(os.path.join(incoming_dir, name), target)
+        except FileNotFoundError:
+            continue
+        return target
+    return None
+
+
+# Funktion zum Abschließen eines Auftrags: Ergebnis in die Auftragsdatei schreiben und in done/ oder failed/ ablegen
+def finish_job(spool_dir: str, running_path: str, job: Dict[str, Any], state: str, info: Dict[str, Any]) -> None:
+    job = dict(job, status=state, finished=time.strftime('%Y-%m-%d %H:%M:%S'), **info)
+    write_job(running_path, job)
+    os.replace(running_path, os.path.join(spool_dir, state, job_name(running_path)))
+
+
+# Funktion zum Ablegen einer unlesbaren Auftragsdatei: unverändert nach failed/, der Fehler in <Name>.error
+def fail_invalid_job(spool_dir: str, running_path: str, error: str) -> None:
+    target = os.path.join(spool_dir, 'failed', job_name(running_path))
+    with open(f'{target}.error', 'w', encoding='utf-8') as file:
+        file.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {error}\n")
+    os.replace(running_path, target)
+
+
+# Funktion zum Ermitteln des ursprünglichen Auftragsnamens aus dem Pfad in running/
+def job_name(running_path: str) -> str:
+    return os.path.basename(running_path).rpartition(OWNER_SEPARATOR)[2]
+
+
+# Funktion zum Abarbeiten des Spool-Verzeichnisses mit einem Pool aus Worker-Prozessen
+# once=True beendet den Runner, sobald keine Aufträge mehr warten oder laufen
+def run_spool(spool_dir: str, workers: int = 2, once: bool = False,
+              poll_interval: float = DEFAULT_POLL_INTERVAL) -> Dict[str, int]:
+    init_spool(spool_dir)
+    base_dir = os.path.dirname(os.path.abspath(spool_dir))
+    owner = runner_id()
+    renew_lease(spool_dir, owner)
+    stats = {'recovered': recover(spool_dir), 'done': 0, 'failed': 0}
+    if stats['recovered']:
+        print(f"{stats['recovered']} unterbrochene Aufträge werden erneut ausgeführt")
+
+    pending = {}  # Future -> (Pfad in running/, Auftrag)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                renew_lease(spool_dir, owner)
+
+                # Freie Worker mit wartenden Aufträgen füllen
+                while len(pending) < workers:
+                    path = claim_next(spool_dir, owner)
+                    if path is None:
+                        break
+                    try:
+                        job = read_job(path)
+                        future = pool.submit(run_job, resolve_paths(job, base_dir))
+                    except (OSError, ValueError) as e:
+                        fail_invalid_job(spool_dir, path, f'Invalid job file: {e}')
+                        stats['failed'] += 1
+                        continue
+                    pending[future] = (path, job)
+                    print(f"Gestartet: {job_name(path)} ({job.get('type')} -> {job.get('output')})")
+
+                if not pending:
+                    if once:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, job = pending.pop(future)
+                    try:
+                        info = future.result()
+                    except Exception as e:
+                        finish_job(spool_dir, path, job, 'failed', {'error': str(e)})
+                        stats['failed'] += 1
+                        print(f"Fehlgeschlagen: {job_name(path)}: {e}")
+                    else:
+                        finish_job(spool_dir, path, job, 'done', {'duration': round(info['duration'], 3)})
+                        stats['done'] += 1
+                        print(f"Fertig: {job_name(path)} in {info['duration']:.1f} s")
+        except KeyboardInterrupt:
+            # Laufende Aufträge bleiben in running/ und werden beim nächsten Start wieder aufgenommen
+            print('Abgebrochen; laufende Aufträge werden beim nächsten Start wiederholt.')
+            pool.shutdown(wait=False, cancel_futures=True)
+        finally:
+            # Ohne Lease gelten verbliebene Aufträge dieses Runners sofort als verwaist
+            if os.path.exists(lease_path(spool_dir, owner)):
+                os.remove(lease_path(spool_dir, owner))
+    return stats
+
+
+# Funktion zum Zählen der Aufträge pro Zustand
+def spool_status(spool_dir: str) -> Dict[str, int]:
+    return {state: len([name for name in os.listdir(os.path.join(spool_dir, state)) if name.endswith('.json')])
+            if os.path.isdir(os.path.join(spool_dir, state)) else 0 for state in STATES}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Einfügeaufträge über ein Spool-Verzeichnis abarbeiten.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Aufträge mit einem Worker-Pool abarbeiten')
+    run.add_argument('spool', help='Spool-Verzeichnis')
+    run.add_argument('--workers', type=int, default=2, help='Anzahl der Worker-Prozesse')
+    run.add_argument('--once', action='store_true', help='Beenden, sobald keine Aufträge mehr warten')
+    run.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help='Abfrageintervall in Sekunden')
+
+    submit = commands.add_parser('submit', help='Auftrag einreichen')
+    submit.add_argument('spool', help='Spool-Verzeichnis')
+    submit.add_argument('--type', choices=JOB_TYPES, default='image', help='Auftragsart')
+    submit.add_argument('--foreground', required=True, help='Bild mit Greenscreen')
+    submit.add_argument('--background', nargs='+', required=True, help='Hintergrundbild oder -video(s)')
+    submit.add_argument('--output', required=True, help='Ausgabedatei')
+    submit.add_argument('--param', action='append', default=[], metavar='NAME=WERT',
+                        help='Parameter des Auftrags, z.B. fps=30 (Wert als JSON, sonst Text)')
+
+    status = commands.add_parser('status', help='Aufträge pro Zustand zählen')
+    status.add_argument('spool', help='Spool-Verzeichnis')
+    return parser.parse_args(argv)
+
+
+# Funktion zum Auswerten eines Parameters NAME=WERT
+def parse_param(text: str) -> Any:
+    name, _, value = text.partition('=')
+    try:
+        return name, json.loads(value)
+    except json.JSONDecodeError:
+        return name, value
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if args.command == 'submit':
+        job = {'type': args.type, 'foreground': os.path.abspath(args.foreground), 'output': os.path.abspath(args.output),
+               'params': dict(parse_param(param) for param in args.param)}
+        backgrounds = [os.path.abspath(path) for path in args.background]
+        if args.type == 'multi-video':
+            job['backgrounds'] = backgrounds
+        else:
+            job['background'] = backgrounds[0]
+        print(f'Eingereicht: {submit_job(args.spool, job)}')
+    elif args.command == 'run':
+        stats = run_spool(args.spool, workers=args.workers, once=args.once, poll_interval=args.poll_interval)
+        print(f"{stats['done']} Aufträge fertig, {stats['failed']} fehlgeschlagen")
+    else:
+        for state, count in spool_status(args.spool).items():
+            print(f'{state:<10}{count:>6}')
+
+
+if __name__ == "__main__":
+    main()
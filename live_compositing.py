@@ -0,0 +1,285 @@
+"""
+live_compositing.py
+
+Echtzeit-Compositing für eine Live-Quelle (Webcam, Capture-Karte) mit Latenzbudget.
+
+Zwei Betriebsarten, beide mit den Masken- und Compositing-Funktionen aus
+insert_image_in_greenscreen_using_trained_model.py:
+
+- Keying (--background): Jeder Frame der Quelle enthält den Greenscreen; er wird pro Frame gekeyt und der
+  Greenscreen-Bereich durch das Hintergrundbild ersetzt.
+- Vorlage (--template): Ein festes Bild mit Greenscreen wird einmal gekeyt; jeder Frame der Quelle wird in den
+  Greenscreen-Bereich eingesetzt.
+
+Ablauf: Ein Lese-Thread liest die Quelle und legt die Frames mit Zeitstempel in einen kleinen Puffer. Ist der
+Puffer voll, wird der älteste Frame verworfen (drop-oldest), sodass die Verarbeitung immer mit dem neuesten Bild
+weitermacht und sich keine Verzögerung aufstaut. Frames, die beim Herausnehmen bereits älter als das Latenzbudget
+sind, werden ebenfalls verworfen. Überschreitet ein Frame das Budget, verwendet das Keying für den nächsten Frame
+die vorherige Maske, statt sie neu zu berechnen; spätestens jeder zweite Frame bekommt eine neue Maske.
+
+Gemessen wird die Latenz vom Eintreffen des Frames aus der Quelle bis nach der Ausgabe (Fenster oder Datei); die
+interne Latenz von Kamera und Treiber ist darin nicht enthalten.
+
+Zum Testen ohne Kamera kann eine Videodatei als Quelle dienen. Sie wird endlos wiederholt und im Takt ihrer
+Bildrate abgespielt wie eine Kamera.
+
+Benutzung:
+    python live_compositing.py --source 0 --background 81.jpg --display
+    python live_compositing.py --source musikvideo.mp4 --template l1.jpg --budget-ms 40 --duration 10
+"""
+
+import argparse
+import collections
+import json
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from insert_image_in_greenscreen_using_trained_model import composite_keyed, create_greenscreen_mask, key_foreground, load_image
+
+# Standard-Latenzbudget pro Frame in Millisekunden
+DEFAULT_BUDGET_MS = 40.0
+
+# Standardgröße des Frame-Puffers; 1 bedeutet: immer nur der neueste Frame
+DEFAULT_QUEUE_SIZE = 1
+
+
+class CameraSource:
+    def __init__(self, index: int):
+        self.cap = cv2.VideoCapture(index)
+        if not self.cap.isOpened():
+            raise ValueError(f"Failed to open camera {index}.")
+        # Möglichst keine Frames im Treiber puffern, sonst steigt die Latenz
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        return self.cap.read()
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+class FileLoopSource:
+    def __init__(self, path: str, fps: Optional[float] = None):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Failed to open video file '{path}'.")
+        self.fps = fps or self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._next_time = None
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        # Im Takt der Bildrate liefern, wie eine Kamera; am Ende wieder von vorn beginnen
+        now = time.perf_counter()
+        if self._next_time is None:
+            self._next_time = now
+        elif self._next_time > now:
+            time.sleep(self._next_time - now)
+        self._next_time = max(self._next_time + 1.0 / self.fps, time.perf_counter() - 1.0 / self.fps)
+
+        ret, frame = self.cap.read()
+        if not ret:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+# Funktion zum Öffnen der Quelle: eine Zahl ist der Index einer Kamera, sonst der Pfad einer Videodatei
+def open_source(source: str, fps: Optional[float] = None):
+    if source.isdigit():
+        return CameraSource(int(source))
+    return FileLoopSource(source, fps)
+
+
+# Compositor für das Keying: Maske pro Frame, bei Budgetüberschreitung wird die vorherige Maske wiederverwendet
+# Eine Maske wird höchstens für einen weiteren Frame wiederverwendet, damit sie nicht veraltet
+# Frames ohne grüne Pixel (z.B. wenn niemand vor dem Greenscreen steht) werden unverändert durchgereicht
+def make_key_compositor(background_img: np.ndarray) -> Callable[[np.ndarray, bool], Tuple[np.ndarray, bool]]:
+    state = {'mask': None, 'reused': False}
+
+    def composite(frame: np.ndarray, over_budget: bool) -> Tuple[np.ndarray, bool]:
+        reused = (over_budget and not state['reused'] and state['mask'] is not None
+                  and state['mask'].shape == frame.shape[:2])
+        if not reused:
+            state['mask'] = create_greenscreen_mask(frame)
+        state['reused'] = reused
+        if not cv2.countNonZero(state['mask']):
+            return frame, reused
+        return composite_keyed(key_foreground(frame, state['mask']), background_img), reused
+
+    return composite
+
+
+# Compositor für die Vorlage: die Vorlage wird nur einmal gekeyt
+def make_template_compositor(template_img: np.ndarray) -> Callable[[np.ndarray, bool], Tuple[np.ndarray, bool]]:
+    mask = create_greenscreen_mask(template_img)
+    if not cv2.countNonZero(mask):
+        raise ValueError("The template image contains no greenscreen area.")
+    keyed = key_foreground(template_img, mask)
+
+    def composite(frame: np.ndarray, over_budget: bool) -> Tuple[np.ndarray, bool]:
+        return composite_keyed(keyed, frame), False
+
+    return composite
+
+
+# Funktion zum Ausführen der Echtzeitschleife
+# sink erhält jedes Ergebnisbild und gibt False zurück, wenn beendet werden soll
+def run_live(source, composite: Callable[[np.ndarray, bool], Tuple[np.ndarray, bool]],
+             sink: Callable[[np.ndarray], bool], budget_ms: float = DEFAULT_BUDGET_MS,
+             queue_size: int = DEFAULT_QUEUE_SIZE, duration: Optional[float] = None,
+             max_frames: Optional[int] = None) -> Dict:
+    budget = budget_ms / 1000.0
+    buffer = collections.deque(maxlen=queue_size)  # volle deque verwirft beim Anhängen den ältesten Frame
+    condition = threading.Condition()
+    stop = threading.Event()
+    stats = {'captured': 0, 'dropped_queue': 0, 'dropped_stale': 0, 'processed': 0, 'over_budget': 0,
+             'mask_reused': 0}
+
+    # Der Aufnahme-Thread gibt die Quelle selbst frei, erst nachdem sein letzter read() zurückgekehrt ist
+    def capture() -> None:
+        try:
+            while not stop.is_set():
+                ret, frame = source.read()
+                timestamp = time.perf_counter()
+                if not ret:
+                    break
+                with condition:
+                    stats['captured'] += 1
+                    if len(buffer) == buffer.maxlen:
+                        stats['dropped_queue'] += 1
+                    buffer.append((frame, timestamp))
+                    condition.notify()
+        finally:
+            source.release()
+            stop.set()
+            with condition:
+                condition.notify()
+
+    reader = threading.Thread(target=capture, daemon=True)
+    reader.start()
+
+    latencies = []
+    over_budget = False
+    start = time.perf_counter()
+    try:
+        while duration is None or time.perf_counter() - start < duration:
+            if max_frames is not None and stats['processed'] >= max_frames:
+                break
+            with condition:
+                while not buffer and not stop.is_set():
+                    condition.wait(0.1)
+                if not buffer:
+                    break
+                frame, timestamp = buffer.popleft()
+
+            # Bereits veraltete Frames verwerfen; der nächste Frame aus der Quelle ist aktueller
+            if time.perf_counter() - timestamp > budget:
+                stats['dropped_stale'] += 1
+                continue
+
+            result, reused = composite(frame, over_budget)
+            keep_running = sink(result)
+            latency = time.perf_counter() - timestamp
+
+            latencies.append(latency)
+            stats['processed'] += 1
+            stats['mask_reused'] += reused
+            over_budget = latency > budget
+            stats['over_budget'] += over_budget
+            if not keep_running:
+                break
+    finally:
+        stop.set()
+        reader.join(timeout=2.0)
+        if reader.is_alive():
+            print("Capture thread is still blocked in read(); the source is released when it returns.")
+
+    elapsed = time.perf_counter() - start
+    stats['elapsed'] = elapsed
+    stats['fps'] = stats['processed'] / elapsed if elapsed else 0.0
+    stats['budget_ms'] = budget_ms
+    if latencies:
+        latencies_ms = np.array(latencies) * 1000
+        for name, value in (('p50', 50), ('p95', 95), ('p99', 99)):
+            stats[f'latency_{name}_ms'] = float(np.percentile(latencies_ms, value))
+        stats['latency_max_ms'] = float(latencies_ms.max())
+    return stats
+
+
+# Funktion zum Ausgeben der Messwerte
+def print_report(stats: Dict) -> None:
+    print(f"{stats['processed']} von {stats['captured']} Frames verarbeitet in {stats['elapsed']:.1f} s "
+          f"({stats['fps']:.1f} FPS)")
+    print(f"Verworfen: {stats['dropped_queue']} (Puffer voll), {stats['dropped_stale']} (älter als das Budget)")
+    print(f"Budget {stats['budget_ms']:.0f} ms überschritten: {stats['over_budget']} Frames, "
+          f"Maske wiederverwendet: {stats['mask_reused']} Frames")
+    if 'latency_p50_ms' in stats:
+        print(f"Latenz [ms]: p50 {stats['latency_p50_ms']:.1f}, p95 {stats['latency_p95_ms']:.1f}, "
+              f"p99 {stats['latency_p99_ms']:.1f}, max {stats['latency_max_ms']:.1f}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Echtzeit-Compositing einer Live-Quelle mit Latenzbudget.')
+    parser.add_argument('--source', default='0', help='Kameraindex (z.B. 0) oder Videodatei, die endlos wiederholt wird')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--background', help='Keying: Greenscreen im Live-Bild durch dieses Bild ersetzen')
+    mode.add_argument('--template', help='Vorlage: Live-Bild in den Greenscreen dieses Bildes einsetzen')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help='Latenzbudget pro Frame in Millisekunden')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help='Größe des Frame-Puffers (drop-oldest)')
+    parser.add_argument('--fps', type=float, default=None, help='Abspielrate einer Videodatei als Quelle (Standard: ihre Bildrate)')
+    parser.add_argument('--display', action='store_true', help='Ergebnis in einem Fenster anzeigen (Beenden mit q)')
+    parser.add_argument('--output', default=None, help='Ergebnis zusätzlich als Video speichern')
+    parser.add_argument('--duration', type=float, default=None, help='Laufzeit in Sekunden (Standard: bis zum Abbruch)')
+    parser.add_argument('--max-frames', type=int, default=None, help='Nach so vielen verarbeiteten Frames beenden')
+    parser.add_argument('--report', default=None, help='Messwerte zusätzlich als JSON speichern')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    try:
+        source = open_source(args.source, args.fps)
+        if args.template:
+            composite = make_template_compositor(load_image(args.template))
+        else:
+            composite = make_key_compositor(load_image(args.background))
+
+        writer = {'out': None}
+
+        def sink(result: np.ndarray) -> bool:
+            if args.output:
+                if writer['out'] is None:
+                    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                    writer['out'] = cv2.VideoWriter(args.output, fourcc, source.fps, (result.shape[1], result.shape[0]))
+                writer['out'].write(result)
+            if args.display:
+                cv2.imshow('greenscreen live', result)
+                return cv2.waitKey(1) & 0xFF != ord('q')
+            return True
+
+        try:
+            stats = run_live(source, composite, sink, budget_ms=args.budget_ms, queue_size=args.queue_size,
+                             duration=args.duration, max_frames=args.max_frames)
+        finally:
+            if writer['out'] is not None:
+                writer['out'].release()
+            if args.display:
+                cv2.destroyAllWindows()
+
+        print_report(stats)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as file:
+                json.dump(stats, file, indent=2)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+if __name__ == "__main__":
+    main()
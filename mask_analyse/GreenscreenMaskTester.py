@@ -14,18 +14,22 @@ Funktionen:
 - select_output_directory: Öffnet einen Dialog zur Auswahl des Ausgabeverzeichnisses.
 - process_images: Verarbeitet alle Bilder im Eingabeordner.
 
+- process_directory: Verarbeitet alle Bilder im Eingabeordner ohne GUI.
+
 Benutzung:
 1. Führen Sie das Skript aus.
 2. Wählen Sie den Eingabeordner und den Ausgabeverzeichnis.
 3. Klicken Sie auf "Process Images", um die Verarbeitung zu starten.
 4. Überprüfen Sie die generierten Bilder im Ausgabeverzeichnis, um die Erkennung der Greenscreen-Bereiche zu validieren.
+
+Ohne GUI: python GreenscreenMaskTester.py <Eingabeordner> <Ausgabeverzeichnis>
 """
 
 import os
+import argparse
+from typing import List, Optional
 import cv2
 import numpy as np
-import tkinter as tk
-from tkinter import filedialog, messagebox
 
 def create_greenscreen_mask(image: np.ndarray) -> np.ndarray:
     hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
@@ -104,34 +108,18 @@ def analyze_greenscreen(image_path: str, background_img: np.ndarray, output_dir:
     cv2.imwrite(result_path, image)
     print(f"Result image saved to {result_path}")
 
-def select_input_directory():
-    input_dir = filedialog.askdirectory(title="Select Input Directory")
-    input_dir_var.set(input_dir)
-
-def select_output_directory():
-    output_dir = filedialog.askdirectory(title="Select Output Directory")
-    output_dir_var.set(output_dir)
-
-def process_images():
-    input_dir = input_dir_var.get()
-    output_dir = output_dir_var.get()
-
-    if not input_dir or not output_dir:
-        messagebox.showerror("Error", "Please select all the required directories.")
-        return
-    
+def process_directory(input_dir: str, output_dir: str) -> int:
+    """Processes all images in input_dir; the first image is the background. Returns the number of analyzed images."""
     image_files = [f for f in os.listdir(input_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
     
     if len(image_files) < 2:
-        messagebox.showerror("Error", "The input directory must contain at least two images.")
-        return
+        raise ValueError("The input directory must contain at least two images.")
 
     background_path = os.path.join(input_dir, image_files[0])
     background_img = cv2.imread(background_path)
 
     if background_img is None:
-        messagebox.showerror("Error", f"Failed to load background image: {background_path}")
-        return
+        raise ValueError(f"Failed to load background image: {background_path}")
 
     image_paths = [os.path.join(input_dir, f) for f in image_files[1:]]
 
@@ -140,27 +128,70 @@ def process_images():
     
     for image_path in image_paths:
         analyze_greenscreen(image_path, background_img, output_dir)
+    return len(image_paths)
+
+def run_gui():
+    # tkinter wird erst hier importiert, damit die Analyse auch ohne GUI-Umgebung nutzbar ist
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
 
-    messagebox.showinfo("Success", "Processing completed.")
+    def select_input_directory():
+        input_dir = filedialog.askdirectory(title="Select Input Directory")
+        input_dir_var.set(input_dir)
 
-# GUI setup
-root = tk.Tk()
-root.title("Greenscreen Analyzer")
+    def select_output_directory():
+        output_dir = filedialog.askdirectory(title="Select Output Directory")
+        output_dir_var.set(output_dir)
 
-input_dir_var = tk.StringVar()
-output_dir_var = tk.StringVar()
+    def process_images():
+        input_dir = input_dir_var.get()
+        output_dir = output_dir_var.get()
 
-frame = tk.Frame(root)
-frame.pack(padx=10, pady=10)
+        if not input_dir or not output_dir:
+            messagebox.showerror("Error", "Please select all the required directories.")
+            return
 
-tk.Label(frame, text="Input Directory:").grid(row=0, column=0, sticky="e")
-tk.Entry(frame, textvariable=input_dir_var, width=50).grid(row=0, column=1)
-tk.Button(frame, text="Browse", command=select_input_directory).grid(row=0, column=2)
+        try:
+            process_directory(input_dir, output_dir)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
 
-tk.Label(frame, text="Output Directory:").grid(row=1, column=0, sticky="e")
-tk.Entry(frame, textvariable=output_dir_var, width=50).grid(row=1, column=1)
-tk.Button(frame, text="Browse", command=select_output_directory).grid(row=1, column=2)
+        messagebox.showinfo("Success", "Processing completed.")
 
-tk.Button(frame, text="Process Images", command=process_images).grid(row=2, columnspan=3, pady=10)
+    # GUI setup
+    root = tk.Tk()
+    root.title("Greenscreen Analyzer")
+
+    input_dir_var = tk.StringVar()
+    output_dir_var = tk.StringVar()
+
+    frame = tk.Frame(root)
+    frame.pack(padx=10, pady=10)
+
+    tk.Label(frame, text="Input Directory:").grid(row=0, column=0, sticky="e")
+    tk.Entry(frame, textvariable=input_dir_var, width=50).grid(row=0, column=1)
+    tk.Button(frame, text="Browse", command=select_input_directory).grid(row=0, column=2)
+
+    tk.Label(frame, text="Output Directory:").grid(row=1, column=0, sticky="e")
+    tk.Entry(frame, textvariable=output_dir_var, width=50).grid(row=1, column=1)
+    tk.Button(frame, text="Browse", command=select_output_directory).grid(row=1, column=2)
+
+    tk.Button(frame, text="Process Images", command=process_images).grid(row=2, columnspan=3, pady=10)
+
+    root.mainloop()
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Greenscreen-Erkennung in Bildern überprüfen (ohne Argumente: GUI).')
+    parser.add_argument('input_dir', nargs='?', help='Eingabeordner; das erste Bild dient als Hintergrund')
+    parser.add_argument('output_dir', nargs='?', help='Ausgabeverzeichnis')
+    args = parser.parse_args(argv)
+
+    if args.input_dir and args.output_dir:
+        count = process_directory(args.input_dir, args.output_dir)
+        print(f"Processing completed: {count} images analyzed.")
+    else:
+        run_gui()
 
-root.mainloop()
+if __name__ == "__main__":
+    main()
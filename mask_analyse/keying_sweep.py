@@ -0,0 +1,272 @@
+"""
+keying_sweep.py
+
+Bewertung der Keying-Parameter gegen Ground-Truth-Masken, mit Raster- oder Zufallssuche auf einem Prozesspool.
+
+Die HSV-Grenzen unterscheiden sich zwischen den Skripten ([35,100,100]-[85,255,255] in den Einfügeskripten,
+[40,100,100]-[80,255,255] in GreenscreenMaskTester.py). Dieses Skript vergleicht Parameterkombinationen
+auf einem Satz von Bildern mit von Hand erstellten Masken:
+
+- Parameter: untere/obere Grenze für Farbton, Sättigung und Helligkeit, Kernelgröße, Morphologie
+  (close_open, open_close, close, open, none) und Komponentenwahl (largest = nur die größte Komponente wie in den
+  Einfügeskripten, all = alle grünen Bereiche wie im MaskTester)
+- Bewertung pro Bild: IoU mit der Ground-Truth-Maske, Kantenfehler (mittlerer Abstand in Pixeln zwischen den
+  Rändern beider Masken, in beide Richtungen gemittelt) und Keying-Zeit
+- Ausgabe: die besten Kombinationen nach IoU, die Pareto-Front aus Genauigkeit und Zeit sowie die schnellste
+  Kombination, deren IoU höchstens --tolerance unter der besten liegt
+
+Die bisherigen Parameter beider Skripte werden immer mitbewertet. Die Zeiten werden gemessen, während mehrere
+Worker parallel laufen, und sind daher nur untereinander vergleichbar.
+
+Ordnerstruktur: Zu jedem Bild in images/ gehört eine Maske mit demselben Dateinamen (beliebige Endung) in
+masks/; weiße Pixel markieren den Greenscreen.
+
+Benutzung:
+    python keying_sweep.py images masks --lower-h 30 35 40 --upper-h 80 85 90 --kernel 3 5 7 --workers 4
+    python keying_sweep.py images masks --random 200 --lower-h 25 45 --upper-h 75 95 --output sweep.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Dateiendungen für Bilder und Masken
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Morphologische Operationen in der Reihenfolge ihrer Anwendung
+MORPHOLOGY = {
+    'close_open': (cv2.MORPH_CLOSE, cv2.MORPH_OPEN),
+    'open_close': (cv2.MORPH_OPEN, cv2.MORPH_CLOSE),
+    'close': (cv2.MORPH_CLOSE,),
+    'open': (cv2.MORPH_OPEN,),
+    'none': (),
+}
+
+# Bisher verwendete Parameter, die immer mitbewertet werden
+BASELINES = {
+    'insert-scripts': {'lower': [35, 100, 100], 'upper': [85, 255, 255], 'kernel': 5,
+                       'morphology': 'close_open', 'component': 'largest'},
+    'mask-tester': {'lower': [40, 100, 100], 'upper': [80, 255, 255], 'kernel': 5,
+                    'morphology': 'close_open', 'component': 'all'},
+}
+
+# Datensatz des Worker-Prozesses; wird einmal pro Prozess geladen statt pro Aufgabe übertragen
+_DATASET: List[Tuple[str, np.ndarray, np.ndarray]] = []
+
+
+# Funktion zum Erstellen einer Maske mit den angegebenen Parametern
+def key_mask(image: np.ndarray, params: Dict) -> np.ndarray:
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, np.array(params['lower']), np.array(params['upper']))
+    kernel = np.ones((params['kernel'], params['kernel']), np.uint8)
+    for operation in MORPHOLOGY[params['morphology']]:
+        mask = cv2.morphologyEx(mask, operation, kernel)
+    if params['component'] == 'largest':
+        num_labels, labels_im, stats, _ = cv2.connectedComponentsWithStats(mask)
+        if num_labels > 1:
+            largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+            mask = np.uint8(labels_im == largest) * 255
+    return mask
+
+
+# Funktion zum Berechnen der IoU zweier Binärmasken
+def iou(predicted: np.ndarray, truth: np.ndarray) -> float:
+    union = np.count_nonzero(predicted | truth)
+    if union == 0:
+        return 1.0
+    return np.count_nonzero(predicted & truth) / union
+
+
+# Funktion zum Berechnen des Kantenfehlers: mittlerer Abstand der Randpixel einer Maske zum Rand der anderen
+# Fehlt einer der Ränder, wird die Bilddiagonale als Fehler angesetzt
+def edge_error(predicted: np.ndarray, truth: np.ndarray) -> float:
+    kernel = np.ones((3, 3), np.uint8)
+    edges = []
+    for mask in (predicted, truth):
+        mask = mask.astype(np.uint8)
+        edges.append(mask - cv2.erode(mask, kernel))
+    if not edges[0].any() or not edges[1].any():
+        return float(np.hypot(*predicted.shape))
+    distances = []
+    for source, target in ((edges[0], edges[1]), (edges[1], edges[0])):
+        distance_to_target = cv2.distanceTransform(np.uint8(target == 0), cv2.DIST_L2, 3)
+        distances.append(float(distance_to_target[source > 0].mean()))
+    return float(np.mean(distances))
+
+
+# Funktion zum Laden der Bilder mit ihren Ground-Truth-Masken
+def load_dataset(image_dir: str, mask_dir: str) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+    masks = {os.path.splitext(name)[0]: os.path.join(mask_dir, name) for name in os.listdir(mask_dir)
+             if name.lower().endswith(IMAGE_EXTENSIONS)}
+    dataset = []
+    for name in sorted(os.listdir(image_dir)):
+        stem = os.path.splitext(name)[0]
+        if not name.lower().endswith(IMAGE_EXTENSIONS) or stem not in masks:
+            continue
+        image = cv2.imread(os.path.join(image_dir, name))
+        truth = cv2.imread(masks[stem], cv2.IMREAD_GRAYSCALE)
+        if image is None or truth is None:
+            print(f"Failed to load {name} or its mask, skipped")
+            continue
+        if truth.shape != image.shape[:2]:
+            truth = cv2.resize(truth, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_NEAREST)
+        dataset.append((name, image, truth > 127))
+    return dataset
+
+
+def _init_worker(image_dir: str, mask_dir: str) -> None:
+    # Jeder Worker nutzt einen Thread, damit sich die Prozesse nicht gegenseitig die Kerne wegnehmen
+    cv2.setNumThreads(1)
+    _DATASET.extend(load_dataset(image_dir, mask_dir))
+
+
+# Funktion zum Bewerten einer Parameterkombination auf dem ganzen Datensatz (läuft im Worker)
+def evaluate_params(params: Dict) -> Dict:
+    ious, edge_errors, timings = [], [], []
+    for _, image, truth in _DATASET:
+        start = time.perf_counter()
+        predicted = key_mask(image, params) > 0
+        timings.append(time.perf_counter() - start)
+        ious.append(iou(predicted, truth))
+        edge_errors.append(edge_error(predicted, truth))
+    return {'params': params, 'iou': float(np.mean(ious)), 'iou_min': float(np.min(ious)),
+            'edge_error': float(np.mean(edge_errors)), 'time_ms': float(np.median(timings) * 1000)}
+
+
+# Funktion zum Erzeugen aller Kombinationen (Rastersuche)
+def grid_params(space: Dict[str, List]) -> List[Dict]:
+    combinations = []
+    for lower_h, upper_h, lower_s, upper_s, lower_v, upper_v, kernel, morphology, component in itertools.product(
+            space['lower_h'], space['upper_h'], space['lower_s'], space['upper_s'], space['lower_v'], space['upper_v'],
+            space['kernel'], space['morphology'], space['component']):
+        if lower_h >= upper_h or lower_s >= upper_s or lower_v >= upper_v:
+            continue
+        combinations.append({'lower': [lower_h, lower_s, lower_v], 'upper': [upper_h, upper_s, upper_v],
+                             'kernel': kernel, 'morphology': morphology, 'component': component})
+    return combinations
+
+
+# Funktion zum Ziehen zufälliger Kombinationen; Zahlenwerte werden gleichverteilt zwischen Minimum und Maximum
+# der angegebenen Werte gezogen, Kernelgröße und Morphologie aus den angegebenen Werten
+def random_params(space: Dict[str, List], count: int, seed: int = 42) -> List[Dict]:
+    rng = random.Random(seed)
+    draw = lambda name: rng.randint(min(space[name]), max(space[name]))
+    combinations = []
+    seen = set()
+    for _ in range(count * 20):
+        if len(combinations) >= count:
+            break
+        lower = [draw('lower_h'), draw('lower_s'), draw('lower_v')]
+        upper = [draw('upper_h'), draw('upper_s'), draw('upper_v')]
+        if any(low >= high for low, high in zip(lower, upper)):
+            continue
+        params = {'lower': lower, 'upper': upper, 'kernel': rng.choice(space['kernel']),
+                  'morphology': rng.choice(space['morphology']), 'component': rng.choice(space['component'])}
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            combinations.append(params)
+    return combinations
+
+
+# Funktion zum Bewerten aller Kombinationen auf einem Prozesspool
+def run_sweep(image_dir: str, mask_dir: str, combinations: List[Dict], workers: int = 4) -> List[Dict]:
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(image_dir, mask_dir)) as pool:
+        return list(pool.map(evaluate_params, combinations, chunksize=max(1, len(combinations) // (workers * 8))))
+
+
+# Funktion zum Ermitteln der Pareto-Front: keine andere Kombination ist zugleich genauer und schneller
+def pareto_front(results: List[Dict]) -> List[Dict]:
+    front = []
+    for result in sorted(results, key=lambda r: (r['time_ms'], -r['iou'])):
+        if not front or result['iou'] > front[-1]['iou']:
+            front.append(result)
+    return front
+
+
+# Funktion zum Auswählen der schnellsten Kombination, deren IoU höchstens tolerance unter der besten liegt
+def choose_params(results: List[Dict], tolerance: float) -> Dict:
+    best_iou = max(result['iou'] for result in results)
+    candidates = [result for result in results if result['iou'] >= best_iou - tolerance]
+    return min(candidates, key=lambda result: (result['time_ms'], -result['iou']))
+
+
+def format_params(params: Dict) -> str:
+    return (f"{params['lower']}-{params['upper']} k{params['kernel']} {params['morphology']} {params['component']}")
+
+
+def print_table(title: str, results: List[Dict]) -> None:
+    print(title)
+    print(f"  {'IoU':>7}{'min IoU':>9}{'Kante [px]':>12}{'Zeit [ms]':>11}  Parameter")
+    for result in results:
+        label = f"{result['baseline']}: " if result.get('baseline') else ''
+        print(f"  {result['iou']:>7.4f}{result['iou_min']:>9.4f}{result['edge_error']:>12.2f}{result['time_ms']:>11.2f}  "
+              f"{label}{format_params(result['params'])}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Keying-Parameter gegen Ground-Truth-Masken bewerten.')
+    parser.add_argument('images', help='Ordner mit Bildern')
+    parser.add_argument('masks', help='Ordner mit Ground-Truth-Masken (gleicher Dateiname, weiß = Greenscreen)')
+    parser.add_argument('--lower-h', nargs='+', type=int, default=[30, 35, 40])
+    parser.add_argument('--upper-h', nargs='+', type=int, default=[80, 85, 90])
+    parser.add_argument('--lower-s', nargs='+', type=int, default=[60, 100])
+    parser.add_argument('--upper-s', nargs='+', type=int, default=[255])
+    parser.add_argument('--lower-v', nargs='+', type=int, default=[60, 100])
+    parser.add_argument('--upper-v', nargs='+', type=int, default=[255])
+    parser.add_argument('--kernel', nargs='+', type=int, default=[3, 5, 7])
+    parser.add_argument('--morphology', nargs='+', choices=MORPHOLOGY, default=['close_open', 'open_close'])
+    parser.add_argument('--component', nargs='+', choices=['largest', 'all'], default=['largest', 'all'])
+    parser.add_argument('--random', type=int, default=None, metavar='N',
+                        help='Zufallssuche mit N Kombinationen statt Rastersuche (Zahlenwerte zwischen Min. und Max.)')
+    parser.add_argument('--seed', type=int, default=42, help='Startwert der Zufallssuche')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Anzahl der Worker-Prozesse')
+    parser.add_argument('--top', type=int, default=10, help='Anzahl der ausgegebenen besten Kombinationen')
+    parser.add_argument('--tolerance', type=float, default=0.005, help='Erlaubter IoU-Verlust für die schnellste Wahl')
+    parser.add_argument('--output', default=None, help='Alle Ergebnisse als JSON speichern')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    dataset_size = len(load_dataset(args.images, args.masks))
+    if dataset_size == 0:
+        print(f"No images with matching masks found in '{args.images}' and '{args.masks}'.")
+        return
+
+    space = {name: getattr(args, name) for name in ('lower_h', 'upper_h', 'lower_s', 'upper_s', 'lower_v', 'upper_v',
+                                                    'kernel', 'morphology', 'component')}
+    combinations = random_params(space, args.random, args.seed) if args.random else grid_params(space)
+    combinations += [params for params in BASELINES.values() if params not in combinations]
+    print(f"{len(combinations)} Kombinationen auf {dataset_size} Bildern mit {args.workers} Workern")
+
+    start = time.perf_counter()
+    results = run_sweep(args.images, args.masks, combinations, args.workers)
+    print(f"Fertig in {time.perf_counter() - start:.1f} s\n")
+
+    for name, params in BASELINES.items():
+        for result in results:
+            if result['params'] == params:
+                result['baseline'] = name
+
+    print_table(f'Beste {args.top} nach IoU:', sorted(results, key=lambda r: -r['iou'])[:args.top])
+    print_table('\nBisherige Parameter:', [result for result in results if result.get('baseline')])
+    print_table('\nPareto-Front (genauer nur mit mehr Zeit):', pareto_front(results))
+    chosen = choose_params(results, args.tolerance)
+    print_table(f'\nEmpfehlung (schnellste innerhalb {args.tolerance} IoU der besten):', [chosen])
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'results': results, 'chosen': chosen}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+mask_cache.py
+
+Inhaltsadressierter Festplatten-Cache für Greenscreen-Masken, gemeinsam genutzt von allen Einfügewerkzeugen.
+
+Der Schlüssel ist der SHA-256-Hash der Bildpixel zusammen mit den Keying-Parametern (HSV-Grenzen, Kernelgröße,
+Anzahl der Bereiche). Gespeichert wird pro Greenscreen-Bereich nur das kompakte Rechteck: Bounding Box (ROI),
+die auf die ROI zugeschnittene Maske als gepackte Bits und die Pixelanzahl der Komponente. Die vollständige Maske
+wird beim Lesen verlustfrei wiederhergestellt; stimmt ihre Pixelanzahl nicht mit der gespeicherten überein, gilt der
+Eintrag als beschädigt und die Maske wird neu berechnet.
+
+Die Gesamtgröße ist begrenzt. Bei Überschreitung werden die am längsten nicht benutzten Einträge gelöscht (LRU);
+ein Treffer aktualisiert dazu den Zeitstempel der Datei.
+
+Der Standardordner ist ~/.cache/greenscreen/masks und kann mit der Umgebungsvariable GREENSCREEN_MASK_CACHE
+geändert werden.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# Standardgröße des Caches in Bytes
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Keying-Parameter aller Einfügewerkzeuge: Grenzen der Grünfarbe im HSV-Farbraum und Kernelgröße der
+# Rauschunterdrückung. Sie sind Teil des Cache-Schlüssels und daher nur hier definiert; eine abweichende Kopie in
+# einem Modul würde sonst falsche Masken aus dem Cache erhalten.
+LOWER_GREEN = [35, 100, 100]
+UPPER_GREEN = [85, 255, 255]
+KERNEL_SIZE = 5
+
+
+class MaskCache:
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def default(cls, max_bytes: int = DEFAULT_MAX_BYTES) -> 'MaskCache':
+        directory = os.environ.get('GREENSCREEN_MASK_CACHE') or os.path.join(
+            os.path.expanduser('~'), '.cache', 'greenscreen', 'masks')
+        return cls(directory, max_bytes)
+
+    @staticmethod
+    def key(image: np.ndarray, params: Dict[str, Any]) -> str:
+        # Hash über Pixel, Form und Parameter; gleiche Bilder aus verschiedenen Dateien teilen sich einen Eintrag
+        digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8'))
+        digest.update(repr((image.shape, str(image.dtype))).encode('utf-8'))
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def get(self, key: str) -> Optional[List[np.ndarray]]:
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                height, width = data['shape']
+                masks = []
+                for i, ((x, y, w, h), area) in enumerate(zip(data['rois'], data['areas'])):
+                    bits = np.unpackbits(data[f'mask_{i}'], count=w * h)
+                    if np.count_nonzero(bits) != area:
+                        raise ValueError(f"Mask {i} in '{path}' does not match its stored area.")
+                    mask = np.zeros((height, width), np.uint8)
+                    mask[y:y+h, x:x+w] = bits.reshape(h, w) * 255
+                    masks.append(mask)
+        except (OSError, KeyError, ValueError):
+            # Fehlende oder beschädigte Einträge gelten als Fehltreffer
+            return None
+        try:
+            os.utime(path)  # Zeitstempel für die LRU-Verdrängung aktualisieren
+        except OSError:
+            pass
+        return masks
+
+    def put(self, key: str, masks: List[np.ndarray]) -> None:
+        rois = []
+        arrays = {}
+        for i, mask in enumerate(masks):
+            # Bounding Box über belegte Zeilen und Spalten, ohne eine Liste aller Maskenpixel anzulegen
+            rows = np.flatnonzero(mask.any(axis=1))
+            cols = np.flatnonzero(mask.any(axis=0))
+            if len(rows):
+                x, y, x2, y2 = cols[0], rows[0], cols[-1] + 1, rows[-1] + 1
+            else:
+                x = y = x2 = y2 = 0
+            rois.append((int(x), int(y), int(x2 - x), int(y2 - y)))
+            arrays[f'mask_{i}'] = np.packbits(mask[y:y2, x:x2] > 0)
+        height, width = masks[0].shape[:2] if masks else (0, 0)
+
+        # Zuerst in eine temporäre Datei schreiben und dann umbenennen, damit parallele Leser nie halbe Dateien sehen
+        tmp_path = f'{self.path(key)}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, shape=np.array([height, width]), rois=np.array(rois, dtype=np.int64).reshape(-1, 4),
+                     areas=np.array([int(np.count_nonzero(mask)) for mask in masks]), **arrays)
+        os.replace(tmp_path, self.path(key))
+        self.evict()
+
+    def get_or_compute(self, image: np.ndarray, params: Dict[str, Any],
+                       compute: Callable[[], List[np.ndarray]]) -> List[np.ndarray]:
+        key = self.key(image, params)
+        masks = self.get(key)
+        if masks is None:
+            masks = compute()
+            self.put(key, masks)
+        return masks
+
+    def evict(self) -> None:
+        # Am längsten nicht benutzte Einträge löschen, bis die Gesamtgröße wieder unter max_bytes liegt
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npz'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
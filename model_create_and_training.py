@@ -1,14 +1,35 @@
 # Importieren des Moduls zur Interaktion mit dem Betriebssystem
 import os  
 
+# Importieren der Module zum Auswerten der Kommandozeilenargumente und zur Zeitmessung
+import argparse
+import json
+import math
+import sys
+import time
+
+# Spitzenwert des Arbeitsspeichers für das Profiling (nur unter Linux und macOS verfügbar)
+try:
+    import resource
+except ImportError:
+    resource = None
+
 # Importieren der Bibliothek für wissenschaftliches Rechnen in Python
 import numpy as np  
 
 # Importieren von Funktionen und Klassen aus TensorFlow und Keras zur Bildverarbeitung und zum Erstellen von Modellen
+import tensorflow as tf
 from tensorflow.keras.preprocessing.image import load_img, img_to_array, ImageDataGenerator
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense
-from typing import Dict, Tuple
+from tensorflow.keras.models import Model, Sequential, load_model
+from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Input
+from tensorflow.keras.layers import RandomFlip, RandomRotation, RandomTranslation, RandomZoom
+from typing import Dict, List, Optional, Tuple
+
+# Importieren des Merkmals-Caches für das inkrementelle Training
+from feature_cache import FeatureCache, file_hash, trunk_fingerprint
+
+# Importieren der Funktionen zum Speichern und Lesen der Modell-Metadaten (z.B. Eingabeauflösung)
+from model_metadata import resolve_image_size, save_metadata
 
 # Datenanreicherung: Erzeugt Variationen der Trainingsbilder zur Verbesserung der Generalisierung des Modells
 # rescale: Skalierung der Bildpixelwerte auf den Bereich [0, 1]
@@ -44,7 +65,7 @@ folders = {
 
 # Funktion zum Laden der Daten und Labels aus den angegebenen Ordnern
 # Die Funktion nimmt ein Dictionary von Ordnerpfaden und gibt ein Tuple von NumPy-Arrays (Bilder und Labels) zurück
-def load_data(folders: Dict[str, str]) -> Tuple[np.ndarray, np.ndarray]:
+def load_data(folders: Dict[str, str], batch_size: int = 32, image_size: Tuple[int, int] = image_size) -> Tuple[np.ndarray, np.ndarray]:
     images = []  # Liste zum Speichern der Bilder
     labels = []  # Liste zum Speichern der zugehörigen Labels
     # Durchlaufen der Ordner und deren Dateien
@@ -58,7 +79,100 @@ def load_data(folders: Dict[str, str]) -> Tuple[np.ndarray, np.ndarray]:
     images = np.array(images)  # Konvertieren der Liste der Bilder in ein NumPy-Array
     labels = np.array(labels)  # Konvertieren der Liste der Labels in ein NumPy-Array
     # Rückgabe der Bilder und Labels als von ImageDataGenerator erzeugter Datenstrom
-    return datagen.flow(images, labels, batch_size=32)
+    return datagen.flow(images, labels, batch_size=batch_size)
+
+# Vektorisierte Datenanreicherung als Keras-Vorverarbeitungsschichten
+# Die Schichten transformieren ganze Batches im TensorFlow-Graphen und nutzen dabei alle konfigurierten Threads,
+# statt wie ImageDataGenerator jedes Bild einzeln in NumPy/SciPy auf einem Thread zu bearbeiten.
+# Die Parameter entsprechen datagen: Rotation bis 20 Grad, Verschiebung und Zoom bis 20%, horizontales Spiegeln.
+# Eine Scherung entfällt: shear_range=0.2 bedeutet bei ImageDataGenerator 0,2 Grad und ist praktisch wirkungslos.
+def create_augmentation() -> Sequential:
+    return Sequential([
+        RandomFlip('horizontal'),
+        RandomRotation(20 / 360, fill_mode='nearest'),
+        RandomTranslation(0.2, 0.2, fill_mode='nearest'),
+        RandomZoom(0.2, 0.2, fill_mode='nearest'),
+    ], name='augmentation')
+
+# Funktion zum Festlegen der Threadanzahl von TensorFlow (0 = Standardwert des Systems)
+# intra_op: Threads innerhalb einer Operation (z.B. einer Faltung), inter_op: parallel ausgeführte Operationen
+# Muss vor der ersten TensorFlow-Operation aufgerufen werden
+def configure_threads(intra_op_threads: int = 0, inter_op_threads: int = 0) -> None:
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+# Funktion zum Auflisten aller Bilddateien und ihrer Labels in derselben Reihenfolge wie load_data
+def list_image_files(folders: Dict[str, str]) -> Tuple[List[str], List[int]]:
+    paths = []
+    labels = []
+    for label, folder in enumerate(folders.values()):
+        for file in sorted(os.listdir(folder)):
+            paths.append(os.path.join(folder, file))
+            labels.append(label)
+    return paths, labels
+
+# Funktion zum Aufteilen der Dateien in Trainings- und Validierungsdaten
+# Die Aufteilung erfolgt pro Klasse (stratifiziert) und ist durch den Seed reproduzierbar
+def split_files(paths: List[str], labels: List[int], validation_split: float = 0.2,
+                seed: int = 42) -> Tuple[List[str], List[int], List[str], List[int]]:
+    rng = np.random.default_rng(seed)
+    train_paths, train_labels, val_paths, val_labels = [], [], [], []
+    for label in sorted(set(labels)):
+        indices = [i for i, value in enumerate(labels) if value == label]
+        rng.shuffle(indices)
+        num_val = int(round(len(indices) * validation_split))
+        for position, index in enumerate(indices):
+            if position < num_val:
+                val_paths.append(paths[index])
+                val_labels.append(label)
+            else:
+                train_paths.append(paths[index])
+                train_labels.append(label)
+    return train_paths, train_labels, val_paths, val_labels
+
+# Funktion zum Laden der Daten als tf.data-Pipeline mit vektorisierter Datenanreicherung
+# num_parallel_calls: parallele Aufrufe beim Dekodieren und Augmentieren (None = automatisch)
+# data_threads: Größe des eigenen Threadpools der Pipeline (0 = gemeinsamer TensorFlow-Threadpool)
+def load_dataset(folders: Dict[str, str], image_size: Tuple[int, int] = image_size, batch_size: int = 32,
+                 augment: bool = True, num_parallel_calls: Optional[int] = None, data_threads: int = 0) -> tf.data.Dataset:
+    paths, labels = list_image_files(folders)
+    return dataset_from_files(paths, labels, image_size=image_size, batch_size=batch_size, augment=augment,
+                              num_parallel_calls=num_parallel_calls, data_threads=data_threads)
+
+# Funktion zum Erstellen der tf.data-Pipeline aus einer Liste von Bilddateien und Labels
+# Die Bilder werden parallel dekodiert, einmalig als uint8 im Speicher zwischengespeichert und pro Batch augmentiert.
+# Ohne shuffle bleibt die Reihenfolge der Dateien erhalten (z.B. für Validierungsdaten).
+def dataset_from_files(paths: List[str], labels: List[int], image_size: Tuple[int, int] = image_size, batch_size: int = 32,
+                       augment: bool = True, shuffle: bool = True, num_parallel_calls: Optional[int] = None,
+                       data_threads: int = 0) -> tf.data.Dataset:
+    parallel_calls = num_parallel_calls or tf.data.AUTOTUNE
+    augmentation = create_augmentation() if augment else None
+
+    # Dekodieren und Skalieren eines Bildes, wie load_img mit Nearest-Neighbor-Interpolation
+    def decode(path: tf.Tensor, label: tf.Tensor) -> Tuple[tf.Tensor, tf.Tensor]:
+        img = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        img = tf.image.resize(img, image_size, method='nearest')
+        return tf.cast(img, tf.uint8), label
+
+    # Normalisieren und Augmentieren eines ganzen Batches
+    def prepare(images: tf.Tensor, batch_labels: tf.Tensor) -> Tuple[tf.Tensor, tf.Tensor]:
+        images = tf.cast(images, tf.float32) / 255.0
+        if augmentation is not None:
+            images = augmentation(images, training=True)
+        return images, batch_labels
+
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    dataset = dataset.map(decode, num_parallel_calls=parallel_calls).cache()
+    if shuffle:
+        dataset = dataset.shuffle(len(paths), reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(prepare, num_parallel_calls=parallel_calls)
+    dataset = dataset.prefetch(tf.data.AUTOTUNE)
+
+    if data_threads > 0:
+        options = tf.data.Options()
+        options.threading.private_threadpool_size = data_threads
+        dataset = dataset.with_options(options)
+    return dataset
 
 # Funktion zum Erstellen eines Keras-Modells
 # Die Funktion nimmt die Eingabeform als Tuple von drei Werten (Höhe, Breite, Kanäle) und gibt ein Keras Sequential-Modell zurück
@@ -82,22 +196,262 @@ def create_model(input_shape: Tuple[int, int, int]) -> Sequential:
 def compile_model(model: Sequential) -> None:
     model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
 
+# Funktion zum Aufteilen eines trainierten Modells in Faltungsteil (Trunk) und Klassifikationskopf
+# Der Trunk umfasst alle Schichten bis einschließlich Flatten, der Kopf die folgenden Dense-Schichten
+def split_model(model: Sequential) -> Tuple[Model, List]:
+    flatten_index = next(i for i, layer in enumerate(model.layers) if isinstance(layer, Flatten))
+    trunk = Model(inputs=model.inputs, outputs=model.layers[flatten_index].output)
+    return trunk, model.layers[flatten_index + 1:]
+
+# Funktion zum Berechnen der Trunk-Merkmale aller Bilder
+# Bilder, deren Dateihash bereits im Cache liegt, werden nicht erneut durch den Trunk geschickt
+def compute_features(trunk: Model, paths: List[str], cache: FeatureCache, batch_size: int = 32,
+                     image_size: Tuple[int, int] = image_size) -> List[str]:
+    keys = [file_hash(path) for path in paths]
+    missing = list({key: path for path, key in zip(paths, keys) if key not in cache}.items())
+
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        images = np.array([img_to_array(load_img(path, target_size=image_size)) for _, path in batch]) / 255.0
+        features = trunk.predict(images, verbose=0)
+        for (key, _), feature in zip(batch, features):
+            cache.put(key, feature)
+
+    print(f"Merkmale: {len(missing)} Bilder neu berechnet, {len(paths) - len(missing)} aus dem Cache geladen")
+    return keys
+
+# Funktion zum Erstellen einer tf.data-Pipeline, die die Merkmale in jeder Epoche gemischt aus dem Cache liest
+def cached_feature_dataset(cache: FeatureCache, keys: List[str], labels: List[int], feature_dim: int,
+                           batch_size: int = 32) -> tf.data.Dataset:
+    def generator():
+        for index in np.random.permutation(len(keys)):
+            yield cache.get(keys[index]).astype(np.float32), labels[index]
+
+    dataset = tf.data.Dataset.from_generator(generator, output_signature=(
+        tf.TensorSpec(shape=(feature_dim,), dtype=tf.float32),
+        tf.TensorSpec(shape=(), dtype=tf.int32),
+    ))
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+# Funktion zum inkrementellen Training: nur der Klassifikationskopf wird auf den zwischengespeicherten Merkmalen trainiert
+# Der Faltungsteil bleibt eingefroren, seine Gewichte werden nicht verändert. Neue Bilder kosten daher nur einen
+# Durchlauf durch den Trunk, alle bekannten Bilder werden direkt aus dem Cache gelesen.
+def train_incremental(folders: Dict[str, str], model_path: str = 'images.keras', cache_dir: str = 'feature_cache',
+                      epochs: int = 10, batch_size: int = 32) -> Sequential:
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file '{model_path}' not found. Train the full model first.")
+
+    model = load_model(model_path)
+    model_image_size = resolve_image_size(model_path, model)
+    trunk, head_layers = split_model(model)
+    cache = FeatureCache(cache_dir, trunk_fingerprint(trunk.get_weights(), model_image_size))
+
+    paths, labels = list_image_files(folders)
+    keys = compute_features(trunk, paths, cache, batch_size=batch_size, image_size=model_image_size)
+    feature_dim = int(np.prod(trunk.output.shape[1:]))
+
+    # Kopf als eigenständiges Modell auf den Merkmalen aufbauen und mit den bisherigen Gewichten starten
+    head = Sequential([Input(shape=(feature_dim,))] + [layer.__class__.from_config(layer.get_config()) for layer in head_layers])
+    for new_layer, old_layer in zip(head.layers, head_layers):
+        new_layer.set_weights(old_layer.get_weights())
+    compile_model(head)
+    head.fit(cached_feature_dataset(cache, keys, labels, feature_dim, batch_size=batch_size), epochs=epochs)
+
+    # Trainierte Kopfgewichte zurück in das vollständige Modell übernehmen
+    for new_layer, old_layer in zip(head.layers, head_layers):
+        old_layer.set_weights(new_layer.get_weights())
+    return model
+
+# Funktion zum Messen einer Epoche: Gesamtzeit und Wartezeit auf die Eingabedaten
+# Jeder Schritt wird einzeln ausgeführt. Die Zeit bis zum nächsten Batch ist Wartezeit auf die Eingabe-Pipeline,
+# die Zeit in train_on_batch ist die Rechenzeit des Modells (train_on_batch kehrt erst nach dem Schritt zurück).
+def measure_epoch(model: Sequential, data, steps: int) -> Dict:
+    iterator = iter(data)
+    input_waits = []
+    compute_times = []
+    images_seen = 0
+    logs = {}
+    start = time.perf_counter()
+    for _ in range(steps):
+        wait_start = time.perf_counter()
+        try:
+            images, labels = next(iterator)
+        except StopIteration:
+            break
+        compute_start = time.perf_counter()
+        logs = model.train_on_batch(images, labels, return_dict=True)
+        input_waits.append(compute_start - wait_start)
+        compute_times.append(time.perf_counter() - compute_start)
+        images_seen += len(labels)
+    return {'epoch_time': time.perf_counter() - start, 'input_wait': sum(input_waits),
+            'compute_time': sum(compute_times), 'images': images_seen, 'step_input_waits': input_waits,
+            'step_compute_times': compute_times, 'logs': {name: float(value) for name, value in logs.items()}}
+
+# Funktion zum Ermitteln des bisherigen Spitzenwerts des Arbeitsspeichers in MB (None, falls nicht verfügbar)
+def peak_memory_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gibt Kilobyte an, macOS Byte
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+# Funktion zum Einordnen einer Epoche: überwiegt die Wartezeit auf die Eingabe, ist das Training eingabegebunden
+def profile_verdict(input_share: float) -> str:
+    if input_share >= 0.5:
+        return 'input-bound'
+    return 'compute-bound'
+
+# Funktion zum Trainieren mit Profiling: pro Schritt Wartezeit auf die Eingabe und Rechenzeit, pro Epoche
+# Bilder pro Sekunde und Spitzenspeicher; die Zusammenfassung wird als JSON gespeichert
+# load_time ist die Zeit zum Erstellen der Pipeline (bei ImageDataGenerator inklusive Laden aller Bilder mit load_img)
+def profile_training(model: Sequential, data, steps: int, epochs: int, report_path: str,
+                     settings: Optional[Dict] = None, load_time: float = 0.0) -> Dict:
+    milliseconds = lambda values, q: float(np.percentile(values, q) * 1000) if values else 0.0
+    epoch_reports = []
+    for epoch in range(1, epochs + 1):
+        stats = measure_epoch(model, data, steps)
+        share = stats['input_wait'] / stats['epoch_time'] if stats['epoch_time'] else 0.0
+        epoch_reports.append({
+            'epoch': epoch,
+            'steps': len(stats['step_compute_times']),
+            'images': stats['images'],
+            'epoch_time': stats['epoch_time'],
+            'input_wait': stats['input_wait'],
+            'compute_time': stats['compute_time'],
+            'input_share': share,
+            'images_per_second': stats['images'] / stats['epoch_time'] if stats['epoch_time'] else 0.0,
+            'step_input_wait_ms': {q: milliseconds(stats['step_input_waits'], value) for q, value in (('p50', 50), ('p95', 95), ('max', 100))},
+            'step_compute_ms': {q: milliseconds(stats['step_compute_times'], value) for q, value in (('p50', 50), ('p95', 95), ('max', 100))},
+            'peak_memory_mb': peak_memory_mb(),
+            'verdict': profile_verdict(share),
+            **stats['logs'],
+        })
+        report = epoch_reports[-1]
+        print(f"Epoche {epoch}: {report['epoch_time']:.2f} s, {report['images_per_second']:.1f} Bilder/s, "
+              f"Eingabe {report['input_wait']:.2f} s ({share:.0%}), Rechnen {report['compute_time']:.2f} s, "
+              f"Spitzenspeicher {report['peak_memory_mb'] or 0:.0f} MB -> {report['verdict']}")
+
+    # Die erste Epoche enthält das Tracing (und bei tf.data das Füllen des Caches); das Gesamturteil nutzt die übrigen
+    steady = epoch_reports[1:] or epoch_reports
+    input_share = sum(r['input_wait'] for r in steady) / max(sum(r['epoch_time'] for r in steady), 1e-9)
+    summary = {
+        'settings': settings or {},
+        'load_time': load_time,
+        'epochs': epoch_reports,
+        'input_share': input_share,
+        'images_per_second': sum(r['images'] for r in steady) / max(sum(r['epoch_time'] for r in steady), 1e-9),
+        'verdict': profile_verdict(input_share),
+    }
+    with open(report_path, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, indent=2)
+
+    if summary['verdict'] == 'input-bound':
+        hint = 'mehr --parallel-calls/--data-threads, --augmentation graph oder größere Batches prüfen'
+    else:
+        hint = 'die Eingabe-Pipeline ist schnell genug; mehr --intra-op-threads oder kleinere Eingabeauflösung prüfen'
+    print(f"Ergebnis: {summary['verdict']} (Eingabe {input_share:.0%} der Zeit, {summary['images_per_second']:.1f} Bilder/s, "
+          f"Laden vor dem Training {load_time:.1f} s) - {hint}")
+    print(f"Bericht gespeichert unter {report_path}")
+    return summary
+
+# Funktion zum Vergleich der Datenanreicherung vorher (ImageDataGenerator) und nachher (tf.data + Keras-Schichten)
+# Die erste Epoche enthält das Füllen des Caches und das Tracing der Graphen und wird daher separat ausgewiesen.
+def compare_augmentation(folders: Dict[str, str], epochs: int = 2, batch_size: int = 32,
+                         num_parallel_calls: Optional[int] = None, data_threads: int = 0) -> Dict[str, List[Dict[str, float]]]:
+    num_images = len(list_image_files(folders)[0])
+    steps = math.ceil(num_images / batch_size)
+    pipelines = {
+        'ImageDataGenerator': lambda: load_data(folders, batch_size=batch_size),
+        'tf.data + Keras-Schichten': lambda: load_dataset(folders, batch_size=batch_size,
+                                                          num_parallel_calls=num_parallel_calls, data_threads=data_threads),
+    }
+
+    results = {}
+    for name, make_data in pipelines.items():
+        data = make_data()
+        model = create_model((image_size[0], image_size[1], 3))
+        compile_model(model)
+        results[name] = [measure_epoch(model, data, steps) for _ in range(epochs)]
+
+    print(f"{'Pipeline':<28}{'Epoche':>8}{'Epochenzeit [s]':>18}{'Eingabe-Wartezeit [s]':>24}{'Anteil':>9}")
+    for name, epoch_stats in results.items():
+        for epoch, stats in enumerate(epoch_stats, start=1):
+            share = stats['input_wait'] / stats['epoch_time'] if stats['epoch_time'] else 0.0
+            print(f"{name:<28}{epoch:>8}{stats['epoch_time']:>18.2f}{stats['input_wait']:>24.2f}{share:>9.0%}")
+    return results
+
+# Funktion zum Auswerten der Kommandozeilenargumente
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='CNN zur Greenscreen-Klassifizierung erstellen und trainieren.')
+    parser.add_argument('--epochs', type=int, default=10, help='Anzahl der Trainingsepochen')
+    parser.add_argument('--image-size', type=int, default=image_size[0], help='Eingabeauflösung in Pixeln (quadratisch)')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batchgröße')
+    parser.add_argument('--augmentation', choices=['graph', 'legacy'], default='graph',
+                        help='graph: vektorisierte tf.data-Pipeline, legacy: ImageDataGenerator')
+    parser.add_argument('--intra-op-threads', type=int, default=0, help='Threads innerhalb einer TensorFlow-Operation (0 = automatisch)')
+    parser.add_argument('--inter-op-threads', type=int, default=0, help='Parallel ausgeführte TensorFlow-Operationen (0 = automatisch)')
+    parser.add_argument('--parallel-calls', type=int, default=None, help='Parallele Aufrufe beim Dekodieren und Augmentieren (Standard: automatisch)')
+    parser.add_argument('--data-threads', type=int, default=0, help='Eigener Threadpool der Eingabe-Pipeline (0 = gemeinsam)')
+    parser.add_argument('--compare-augmentation', type=int, default=0, metavar='EPOCHEN',
+                        help='Epochenzeit und Eingabe-Wartezeit von ImageDataGenerator und tf.data vergleichen, statt zu trainieren')
+    parser.add_argument('--profile', default=None, metavar='BERICHT.json',
+                        help='Training mit Profiling: Eingabe-Wartezeit und Rechenzeit pro Schritt, Bilder/s und Spitzenspeicher pro Epoche')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Nur den Klassifikationskopf von images.keras auf zwischengespeicherten Trunk-Merkmalen nachtrainieren')
+    parser.add_argument('--feature-cache', default=os.path.join(base_dir, 'feature_cache'),
+                        help='Ordner des Merkmals-Caches für --incremental')
+    return parser.parse_args(argv)
+
 # Hauptfunktion des Skripts
-def main():
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+
+    # Festlegen der Threadanzahl, bevor TensorFlow seine Threadpools anlegt
+    configure_threads(args.intra_op_threads, args.inter_op_threads)
+
+    if args.compare_augmentation:
+        compare_augmentation(folders, epochs=args.compare_augmentation, batch_size=args.batch_size,
+                             num_parallel_calls=args.parallel_calls, data_threads=args.data_threads)
+        return
+
+    # Inkrementelles Training des Klassifikationskopfes; ohne --incremental wird wie bisher vollständig neu trainiert
+    if args.incremental:
+        model = train_incremental(folders, model_path='images.keras', cache_dir=args.feature_cache,
+                                  epochs=args.epochs, batch_size=args.batch_size)
+        model.save('images.keras')
+        save_metadata('images.keras', image_size=list(resolve_image_size('images.keras', model)))
+        return
+
+    # Eingabeauflösung für das vollständige Training
+    train_image_size = (args.image_size, args.image_size)
+
     # Laden der Trainingsdaten aus den angegebenen Ordnern
-    train_data_gen = load_data(folders)
+    load_start = time.perf_counter()
+    if args.augmentation == 'legacy':
+        train_data_gen = load_data(folders, batch_size=args.batch_size, image_size=train_image_size)
+    else:
+        train_data_gen = load_dataset(folders, image_size=train_image_size, batch_size=args.batch_size,
+                                      num_parallel_calls=args.parallel_calls, data_threads=args.data_threads)
+    load_time = time.perf_counter() - load_start
     
     # Erstellen des Modells mit der angegebenen Eingabeform (Höhe, Breite, 3 Farbkanäle)
-    model = create_model((image_size[0], image_size[1], 3))
+    model = create_model((train_image_size[0], train_image_size[1], 3))
     
     # Kompilieren des Modells
     compile_model(model)
     
-    # Trainieren des Modells mit den Trainingsdaten für 10 Epochen
-    model.fit(train_data_gen, epochs=10)
+    # Trainieren des Modells mit den Trainingsdaten; mit --profile Schritt für Schritt mit Zeitmessung
+    if args.profile:
+        steps = math.ceil(len(list_image_files(folders)[0]) / args.batch_size)
+        settings = {name: getattr(args, name) for name in ('epochs', 'image_size', 'batch_size', 'augmentation',
+                                                             'intra_op_threads', 'inter_op_threads', 'parallel_calls', 'data_threads')}
+        profile_training(model, train_data_gen, steps, args.epochs, args.profile, settings=settings, load_time=load_time)
+    else:
+        model.fit(train_data_gen, epochs=args.epochs)
     
-    # Speichern des trainierten Modells in einer Datei
+    # Speichern des trainierten Modells in einer Datei, zusammen mit der Eingabeauflösung für den Vorhersagepfad
     model.save('images.keras')
+    save_metadata('images.keras', image_size=list(train_image_size))
 
 # Überprüfen, ob dieses Skript direkt ausgeführt wird (nicht importiert)
 if __name__ == "__main__":
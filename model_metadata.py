@@ -0,0 +1,57 @@
+"""
+model_metadata.py
+
+Metadaten eines trainierten Modells (z.B. die Eingabeauflösung), gespeichert als JSON-Datei neben dem Modell.
+
+Zu images.keras gehört die Datei images.keras.json. Training und Auflösungs-Sweep schreiben sie,
+der Vorhersagepfad liest daraus die Bildgröße, mit der das Modell trainiert wurde.
+Modelle im Verzeichnisformat von fast_model_io.py tragen ihre Metadaten als metadata.json im Verzeichnis.
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+# Bildgröße, die verwendet wird, wenn weder Metadaten noch Modell eine Auflösung liefern
+DEFAULT_IMAGE_SIZE = (512, 512)
+
+
+# Funktion zum Ermitteln des Pfads der Metadaten-Datei zu einem Modell
+def metadata_path(model_path: str) -> str:
+    if os.path.isdir(model_path):
+        return os.path.join(model_path, 'metadata.json')
+    return f'{model_path}.json'
+
+
+# Funktion zum Laden der Metadaten; fehlt die Datei, wird ein leeres Dictionary zurückgegeben
+def load_metadata(model_path: str) -> Dict[str, Any]:
+    path = metadata_path(model_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+# Funktion zum Speichern der Metadaten; vorhandene Einträge werden mit den neuen Werten ergänzt
+def save_metadata(model_path: str, **metadata: Any) -> Dict[str, Any]:
+    merged = load_metadata(model_path)
+    merged.update(metadata)
+    path = metadata_path(model_path)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(merged, file, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return merged
+
+
+# Funktion zum Ermitteln der Eingabeauflösung eines Modells
+# Reihenfolge: Metadaten-Datei, Eingabeform des geladenen Modells, Standardwert
+def resolve_image_size(model_path: str, model: Optional[Any] = None) -> Tuple[int, int]:
+    image_size = load_metadata(model_path).get('image_size')
+    if image_size:
+        return int(image_size[0]), int(image_size[1])
+    if model is not None:
+        height, width = model.input_shape[1:3]
+        if height and width:
+            return int(height), int(width)
+    return DEFAULT_IMAGE_SIZE
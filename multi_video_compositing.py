@@ -0,0 +1,118 @@
+"""
+multi_video_compositing.py
+
+Ersetzen mehrerer Greenscreen-Bereiche in einem Bild durch je ein Hintergrundvideo.
+
+Die Funktionen werden von der GUI in 2_videos_on_greenscreen.py und vom Kommandozeilenwerkzeug greenscreen.py
+verwendet und benötigen nur OpenCV und NumPy.
+
+Benutzung:
+    python multi_video_compositing.py bild.jpg video1.mp4 video2.mp4 --output output_video.mp4
+"""
+
+import argparse  # Modul zum Auswerten der Kommandozeilenargumente
+import numpy as np  # Bibliothek für numerische Berechnungen, insbesondere für Arrays
+import cv2  # Bibliothek für die Bild- und Videobearbeitung
+from typing import List, Optional  # Hilft bei der Angabe von Datentypen in Funktionssignaturen
+from mask_cache import KERNEL_SIZE, LOWER_GREEN, UPPER_GREEN, MaskCache  # Gemeinsamer Masken-Cache und Keying-Parameter
+from video_readers import DEFAULT_FPS, open_video_reader, resample_frames  # Hintergrundvideos in ROI-Größe und Zielbildrate lesen
+
+# Funktion zur Erstellung einer Maske für den Greenscreen-Bereich im Bild
+def create_greenscreen_masks(image: np.ndarray, num_greenscreens: int = 2, cache: Optional[MaskCache] = None) -> List[np.ndarray]:
+    if cache is not None:  # Bereits bekannte Bilder aus dem Masken-Cache lesen
+        params = {'function': 'largest_components', 'num': num_greenscreens,
+                  'lower': LOWER_GREEN, 'upper': UPPER_GREEN, 'kernel': KERNEL_SIZE}
+        return cache.get_or_compute(image, params, lambda: create_greenscreen_masks(image, num_greenscreens))
+
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)  # Konvertiere das Bild von BGR zu HSV Farbraum
+    lower_green = np.array(LOWER_GREEN)  # Definiere die untere Grenze für den Grünfarbton
+    upper_green = np.array(UPPER_GREEN)  # Definiere die obere Grenze für den Grünfarbton
+    mask = cv2.inRange(hsv, lower_green, upper_green)  # Erstelle eine Maske, die nur den grünen Bereich enthält
+    
+    kernel = np.ones((KERNEL_SIZE, KERNEL_SIZE), np.uint8)  # Erstelle einen Kernel zur Rauschunterdrückung
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)  # Schließe kleine Löcher in der Maske
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)  # Entferne kleine weiße Punkte aus der Maske
+    
+    num_labels, labels_im = cv2.connectedComponents(mask)  # Finde alle verbundenen Komponenten in der Maske
+    
+    # Finde die größten verbundenen Komponenten
+    component_sizes = [(label, np.sum(labels_im == label)) for label in range(1, num_labels)]
+    largest_components = sorted(component_sizes, key=lambda x: x[1], reverse=True)[:num_greenscreens]
+
+    masks = []
+    for label, _ in largest_components:
+        component_mask = np.uint8(labels_im == label) * 255  # Erstelle eine Maske für die größte Komponente
+        masks.append(component_mask)
+    
+    return masks  # Rückgabe der Masken für die größten Greenscreen-Bereiche
+
+# Funktion zum Ersetzen des Greenscreens durch ein Hintergrundvideo
+# output_fps legt die Bildrate des Ausgabevideos fest (Standard: die des ersten Videos); jedes Video wird über die
+# Zeitstempel seiner Frames auf diese Bildrate umgerechnet, nicht benötigte Frames werden nur mit grab() übersprungen
+def replace_greenscreens_with_videos(original_img: np.ndarray, video_paths: List[str], masks: List[np.ndarray], output_video_path: str,
+                                     output_fps: Optional[float] = None, reader: str = 'opencv') -> None:
+    if len(video_paths) != len(masks):  # Überprüfe, ob die Anzahl der Videos mit der Anzahl der Greenscreen-Bereiche übereinstimmt
+        raise ValueError("Die Anzahl der Videos muss mit der Anzahl der Greenscreen-Bereiche übereinstimmen.")
+
+    # Öffne die Video-Dateien; jeder Leser liefert die Frames bereits in der Größe seines Greenscreen-Bereichs
+    rois = [cv2.boundingRect(mask) for mask in masks]  # Bestimme die Begrenzungsboxen der Masken
+    caps = []
+    try:
+        for video_path, (_, _, w, h) in zip(video_paths, rois):
+            caps.append(open_video_reader(video_path, (w, h), reader))
+    except ValueError:
+        for cap in caps:
+            cap.release()
+        raise ValueError("Es ist fehlgeschlagen, eine oder mehrere Videodateien zu öffnen.")
+
+    # Initialisiere den Video-Writer
+    fps = output_fps or caps[0].fps or DEFAULT_FPS
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_video_path, fourcc, fps, (original_img.shape[1], original_img.shape[0]))
+
+    # zip endet, sobald das kürzeste Video zu Ende ist
+    for frames in zip(*(resample_frames(cap, fps) for cap in caps)):
+        result = original_img.copy()  # Erstelle eine Kopie des Originalbildes
+        for mask, frame, (x, y, w, h) in zip(masks, frames, rois):
+            background_img_resized = frame  # Der Frame hat bereits die Größe des Greenscreen-Bereichs
+            mask_cropped = mask[y:y+h, x:x+w]  # Schneide die Maske zu
+            mask_inv = cv2.bitwise_not(mask_cropped)  # Invertiere die Maske
+
+            for c in range(3):  # Übertrage die Kanäle des Bildes
+                result[y:y+h, x:x+w, c] = (
+                    background_img_resized[:, :, c] * (mask_cropped / 255.0) + 
+                    result[y:y+h, x:x+w, c] * (mask_inv / 255.0)
+                )
+
+        out.write(result)  # Schreibe das Ergebnis in das Ausgabevideo
+    
+    for cap in caps:  # Schließe die Video-Dateien
+        cap.release()
+    out.release()  # Schließe die Ausgabe
+
+# Funktion zum Auswerten der Kommandozeilenargumente
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Mehrere Greenscreen-Bereiche eines Bildes durch Videos ersetzen.')
+    parser.add_argument('image', help='Bild mit Greenscreen-Bereichen')
+    parser.add_argument('videos', nargs='+', help='Ein Hintergrundvideo pro Greenscreen-Bereich (größter Bereich zuerst)')
+    parser.add_argument('--output', default='output_video.mp4', help='Pfad für das Ausgabevideo')
+    parser.add_argument('--fps', type=float, default=None, help='Bildrate des Ausgabevideos (Standard: die des ersten Videos)')
+    parser.add_argument('--reader', choices=['opencv', 'ffmpeg', 'auto'], default='opencv',
+                        help='Videoleser: ffmpeg dekodiert die Hintergrundvideos direkt in ROI-Größe (auto: ffmpeg, falls vorhanden)')
+    parser.add_argument('--no-mask-cache', action='store_true', help='Masken-Cache nicht verwenden')
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    original_img = cv2.imread(args.image)  # Lade das Originalbild
+    if original_img is None:
+        raise ValueError(f"Fehler beim Laden des Originalbildes aus '{args.image}'.")
+
+    cache = None if args.no_mask_cache else MaskCache.default()
+    masks = create_greenscreen_masks(original_img, num_greenscreens=len(args.videos), cache=cache)  # Erstelle Masken für die Greenscreen-Bereiche
+    replace_greenscreens_with_videos(original_img, args.videos, masks, args.output,
+                                     output_fps=args.fps, reader=args.reader)  # Ersetze die Bereiche durch die Videos
+    print(f'Result saved to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+phash_index.py
+
+Persistenter Index von Perceptual Hashes (pHash) zum Erkennen von Beinahe-Duplikaten im Trainingsdatensatz.
+
+Der pHash eines Bildes besteht aus 64 Bit: das Bild wird in Graustufen auf 32x32 Pixel verkleinert, mit einer
+diskreten Kosinustransformation (DCT) umgewandelt, und für die 8x8 niedrigsten Frequenzen wird gespeichert, ob der
+Koeffizient über dem Median liegt. Ähnliche Bilder (erneut exportiert, skaliert, leicht komprimiert, benachbarte
+Videoframes) haben Hashes mit kleinem Hamming-Abstand.
+
+Schnelle Suche: Der Hash wird in (max_distance + 1) Bänder aufgeteilt. Unterscheiden sich zwei Hashes in höchstens
+max_distance Bits, stimmt nach dem Schubfachprinzip mindestens ein Band exakt überein. Es werden daher nur Einträge
+verglichen, die in einem Band übereinstimmen, statt den ganzen Index zu durchsuchen.
+
+Jeder Eintrag speichert Pfad und Klasse, sodass Duplikate zwischen fzn und fzgs als Label-Konflikte erkannt werden.
+Die Pfade werden absolut und normalisiert gespeichert (index_key), damit ein von image_converter_for_model.py
+angelegter Index dieselben Bilder wiedererkennt, wenn die Ordner hier relativ angegeben werden.
+
+Benutzung:
+    python phash_index.py fzn fzgs --max-distance 4            # vorhandene Ordner prüfen
+    python phash_index.py fzn fzgs --max-distance 4 --drop     # Duplikate löschen
+"""
+
+import argparse
+import json
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Dateiendungen, die als Bilder indiziert werden
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+
+# Standardabstand, bis zu dem zwei Bilder als Beinahe-Duplikate gelten (von 64 Bit)
+DEFAULT_MAX_DISTANCE = 4
+
+HASH_SIZE = 8
+DCT_SIZE = 32
+
+
+# DCT-II-Matrix für die zweidimensionale Kosinustransformation per Matrixmultiplikation
+def _dct_matrix(size: int) -> np.ndarray:
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+    matrix[0] *= 1 / np.sqrt(2)
+    return matrix * np.sqrt(2 / size)
+
+
+_DCT = _dct_matrix(DCT_SIZE)
+
+
+# Funktion zum Berechnen des 64-Bit-pHash eines Bildes
+def perceptual_hash(image: Image.Image) -> int:
+    pixels = np.asarray(image.convert('L').resize((DCT_SIZE, DCT_SIZE), Image.LANCZOS), dtype=np.float64)
+    low_frequencies = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # Der Gleichanteil (erster Koeffizient) bestimmt nur die Helligkeit und geht nicht in den Median ein
+    bits = low_frequencies > np.median(low_frequencies[1:])
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+# Funktion zum Erzeugen des Indexschlüssels eines Pfads: absolut und normalisiert
+def index_key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+# Funktion zum Prüfen, ob ein Indexeintrag dieselbe Datei wie path bezeichnet
+def same_file(entry_path: str, path: str) -> bool:
+    if index_key(entry_path) == index_key(path):
+        return True
+    try:
+        return os.path.samefile(entry_path, path)
+    except OSError:
+        return False  # Eintrag verweist auf eine nicht mehr vorhandene Datei
+
+
+# Funktion zum Berechnen des Hamming-Abstands zweier Hashes
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class PHashIndex:
+    def __init__(self, path: Optional[str] = None, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self.entries: Dict[str, Tuple[int, str]] = {}  # Pfad -> (Hash, Klasse)
+        # Bandaufteilung: max_distance + 1 Bänder, damit bei einem Treffer mindestens ein Band exakt übereinstimmt
+        num_bands = min(max_distance + 1, 64)
+        self._band_bits = [64 // num_bands + (1 if i < 64 % num_bands else 0) for i in range(num_bands)]
+        self._bands: List[Dict[int, set]] = [defaultdict(set) for _ in range(num_bands)]
+        if path and os.path.exists(path):
+            self.load()
+
+    def _band_values(self, value: int) -> List[int]:
+        values = []
+        shift = 0
+        for bits in self._band_bits:
+            values.append((value >> shift) & ((1 << bits) - 1))
+            shift += bits
+        return values
+
+    def add(self, value: int, path: str, label: str) -> None:
+        # Ein erneut gespeicherter Pfad ersetzt den alten Eintrag
+        path = index_key(path)
+        self.remove(path)
+        self.entries[path] = (value, label)
+        for band, band_value in zip(self._bands, self._band_values(value)):
+            band[band_value].add(path)
+
+    def remove(self, path: str) -> None:
+        path = index_key(path)
+        if path not in self.entries:
+            return
+        value, _ = self.entries.pop(path)
+        for band, band_value in zip(self._bands, self._band_values(value)):
+            band[band_value].discard(path)
+
+    def query(self, value: int, max_distance: Optional[int] = None) -> List[Tuple[str, str, int]]:
+        # Liefert (Pfad, Klasse, Abstand) aller Einträge bis max_distance, sortiert nach Abstand
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        candidates = set()
+        for band, band_value in zip(self._bands, self._band_values(value)):
+            candidates |= band.get(band_value, set())
+        matches = []
+        for path in candidates:
+            other, label = self.entries[path]
+            distance = hamming_distance(value, other)
+            if distance <= max_distance:
+                matches.append((path, label, distance))
+        return sorted(matches, key=lambda match: match[2])
+
+    def load(self) -> None:
+        with open(self.path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        for entry in data['entries']:
+            self.add(int(entry['hash'], 16), entry['path'], entry['label'])
+
+    def save(self) -> None:
+        data = {'entries': [{'hash': f'{value:016x}', 'path': path, 'label': label}
+                            for path, (value, label) in sorted(self.entries.items())]}
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+# Funktion zum Prüfen vorhandener Klassenordner auf Beinahe-Duplikate
+# Die Ordner werden nacheinander indiziert; ein Bild gilt als Duplikat, wenn bereits ein ähnliches indiziert wurde
+def scan_folders(folders: List[str], index: PHashIndex, drop: bool = False) -> Dict[str, int]:
+    stats = {'images': 0, 'duplicates': 0, 'conflicts': 0, 'removed': 0, 'removed_bytes': 0}
+    for folder in folders:
+        label = os.path.basename(os.path.normpath(folder))
+        for filename in sorted(os.listdir(folder)):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(folder, filename)
+            stats['images'] += 1
+            with Image.open(path) as image:
+                value = perceptual_hash(image)
+            # Der eigene Eintrag (auch aus einem früheren Lauf) ist kein Duplikat und darf nie zum Löschen führen
+            matches = [match for match in index.query(value) if not same_file(match[0], path)]
+            if not matches:
+                index.add(value, path, label)
+                continue
+
+            stats['duplicates'] += 1
+            match_path, match_label, distance = matches[0]
+            conflict = match_label != label
+            stats['conflicts'] += conflict
+            kind = 'LABEL-KONFLIKT' if conflict else 'Duplikat'
+            print(f'{kind}: {path} ~ {match_path} (Abstand {distance})')
+            if drop:
+                stats['removed_bytes'] += os.path.getsize(path)
+                os.remove(path)
+                index.remove(path)
+                stats['removed'] += 1
+            else:
+                index.add(value, path, label)
+    return stats
+
+
+# Funktion zum Ausgeben der Zusammenfassung
+def print_report(stats: Dict[str, int]) -> None:
+    print(f"{stats['images']} Bilder geprüft, {stats['duplicates']} Beinahe-Duplikate "
+          f"({stats['conflicts']} davon zwischen verschiedenen Klassen)")
+    if stats['removed']:
+        print(f"{stats['removed']} Bilder entfernt ({stats['removed_bytes'] / 1e6:.1f} MB)")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Klassenordner auf Beinahe-Duplikate prüfen (pHash).')
+    parser.add_argument('folders', nargs='+', help='Klassenordner, z.B. fzn fzgs')
+    parser.add_argument('--index', default=None, help='Indexdatei (Standard: nur im Speicher)')
+    parser.add_argument('--max-distance', type=int, default=DEFAULT_MAX_DISTANCE, help='Maximaler Hamming-Abstand (von 64 Bit)')
+    parser.add_argument('--drop', action='store_true', help='Beinahe-Duplikate löschen statt nur zu melden')
+    args = parser.parse_args(argv)
+
+    index = PHashIndex(args.index, max_distance=args.max_distance)
+    stats = scan_folders(args.folders, index, drop=args.drop)
+    print_report(stats)
+    if args.index:
+        index.save()
+
+
+if __name__ == "__main__":
+    main()
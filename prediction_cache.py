@@ -0,0 +1,122 @@
+"""
+prediction_cache.py
+
+Persistenter Cache für Vorhersagen des Klassifikators in einer SQLite-Datenbank.
+
+Der Schlüssel ist der SHA-256-Hash des Bildinhalts zusammen mit dem Fingerabdruck des Modells; gespeichert werden
+die Klassenwahrscheinlichkeiten. Bei einer erneuten Vorhersage werden nur Bilder durch das Modell geschickt, die
+noch nicht im Cache stehen. Sind alle Bilder bekannt, wird das Modell gar nicht erst geladen.
+
+Der Fingerabdruck wird aus den Modelldateien berechnet (ohne TensorFlow) und enthält die Eingabeauflösung aus den
+Metadaten. Nach einem Neutraining ändert er sich, sodass alte Vorhersagen nicht mehr verwendet werden; die
+Einträge des alten Fingerabdrucks desselben Modellpfads werden dabei gelöscht. Damit große Modelle nicht bei jedem
+Aufruf neu gehasht werden, merkt sich die Datenbank den Fingerabdruck zusammen mit Größe und Änderungszeit der
+Modelldateien.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from feature_cache import file_hash
+from model_metadata import load_metadata
+
+# Standardpfad der Datenbank
+DEFAULT_CACHE_PATH = 'prediction_cache.sqlite'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS predictions (
+    image_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    probabilities BLOB NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (image_hash, model)
+);
+CREATE TABLE IF NOT EXISTS models (
+    path TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+'''
+
+
+# Funktion zum Auflisten der Dateien eines Modells (eine .keras-Datei oder ein Verzeichnis im Schnellformat)
+def model_files(model_path: str) -> List[str]:
+    if not os.path.isdir(model_path):
+        return [model_path]
+    files = []
+    for root, _, names in os.walk(model_path):
+        files.extend(os.path.join(root, name) for name in names)
+    return sorted(files)
+
+
+# Funktion zum Berechnen einer günstigen Signatur aus Größe und Änderungszeit der Modelldateien
+def model_signature(model_path: str) -> str:
+    stats = [os.stat(path) for path in model_files(model_path)]
+    return f"{len(stats)}:{sum(stat.st_size for stat in stats)}:{max(stat.st_mtime_ns for stat in stats)}"
+
+
+# Funktion zum Berechnen des Fingerabdrucks aus dem Inhalt der Modelldateien und der Eingabeauflösung
+def model_fingerprint(model_path: str) -> str:
+    digest = hashlib.sha256(repr(load_metadata(model_path).get('image_size')).encode('utf-8'))
+    for path in model_files(model_path):
+        digest.update(os.path.relpath(path, model_path).encode('utf-8'))
+        digest.update(file_hash(path).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        # WAL erlaubt parallele Leser, während ein anderer Prozess schreibt
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def fingerprint(self, model_path: str) -> str:
+        # Fingerabdruck aus der Datenbank, solange sich Größe und Änderungszeit der Modelldateien nicht geändert haben
+        key = os.path.abspath(model_path)
+        signature = model_signature(model_path)
+        row = self.connection.execute('SELECT signature, fingerprint FROM models WHERE path = ?', (key,)).fetchone()
+        if row is not None and row[0] == signature:
+            return row[1]
+
+        fingerprint = model_fingerprint(model_path)
+        with self.connection:
+            if row is not None and row[1] != fingerprint:
+                # Das Modell wurde neu trainiert: Vorhersagen des alten Stands werden ungültig, außer ein anderer
+                # registrierter Pfad (z.B. eine Kopie des Modells) hat noch denselben Stand
+                self.connection.execute(
+                    'DELETE FROM predictions WHERE model = ? AND NOT EXISTS '
+                    '(SELECT 1 FROM models WHERE fingerprint = ? AND path != ?)', (row[1], row[1], key))
+            self.connection.execute('INSERT OR REPLACE INTO models (path, signature, fingerprint) VALUES (?, ?, ?)',
+                                    (key, signature, fingerprint))
+        return fingerprint
+
+    def get_many(self, image_hashes: Iterable[str], fingerprint: str) -> Dict[str, np.ndarray]:
+        results = {}
+        hashes = list(dict.fromkeys(image_hashes))
+        # SQLite begrenzt die Anzahl der Parameter pro Anfrage
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT image_hash, probabilities FROM predictions WHERE model = ? AND image_hash IN ({','.join('?' * len(chunk))})",
+                [fingerprint] + chunk)
+            for image_hash, blob in rows:
+                results[image_hash] = np.frombuffer(blob, dtype=np.float32)
+        return results
+
+    def put_many(self, entries: Iterable[Tuple[str, np.ndarray]], fingerprint: str) -> None:
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO predictions (image_hash, model, probabilities, created) VALUES (?, ?, ?, ?)',
+                [(image_hash, fingerprint, np.asarray(probabilities, np.float32).tobytes(), now)
+                 for image_hash, probabilities in entries])
+
+    def close(self) -> None:
+        self.connection.close()
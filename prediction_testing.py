@@ -1,32 +1,107 @@
+import argparse
+import os
+from typing import List, Optional
 import numpy as np
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.image import load_img, img_to_array
+from fast_model_io import load_any_model, select_model_path
+from feature_cache import file_hash
+from model_metadata import resolve_image_size
+from prediction_cache import DEFAULT_CACHE_PATH, PredictionCache
 
-# Modell laden
-model = load_model('images.keras')
-
-# Liste der Bildpfade
+# Liste der Bildpfade (Standard, wenn keine Pfade übergeben werden)
 image_paths = ['D:\\images\\test3.jpg', 'D:\\images\\test2.jpg', 'D:\\images\\test1.jpg', 'D:\\images\\test.jpg']  # usw.
 
-# Bildgröße definieren (muss mit dem trainierten Modell übereinstimmen)
-image_size = (512, 512)
-
 # Klassenbezeichnungen für bessere Lesbarkeit
 klassen_namen = ['nicht greenscreen fähig', 'greenscreen fähig']
 
-# Vorhersagen für jedes Bild machen
-for img_path in image_paths:
-    img = load_img(img_path, target_size=image_size)
-    img_array = img_to_array(img)
-    img_array = np.expand_dims(img_array, axis=0)  # Bild zu einem Batch hinzufügen
-    img_array /= 255.  # Normalisierung, wie im ImageDataGenerator
+# Funktion zum Laden und Normalisieren eines Stapels von Bildern
+def load_batch(paths: List[str], image_size) -> np.ndarray:
+    from tensorflow.keras.preprocessing.image import load_img, img_to_array
+    batch = [img_to_array(load_img(path, target_size=image_size)) for path in paths]
+    return np.stack(batch) / 255.  # Normalisierung, wie im ImageDataGenerator
+
+# Funktion zum Berechnen der Klassenwahrscheinlichkeiten für Bilder, die noch nicht im Cache stehen
+def infer_probabilities(paths: List[str], model_path: str, batch_size: int = 32) -> List[np.ndarray]:
+    # Modell laden (das schnell ladbare Verzeichnisformat, falls es aktuell ist, sonst images.keras)
+    model_path = select_model_path(model_path)
+    model = load_any_model(model_path)
+
+    # Bildgröße aus den Metadaten des Modells lesen (muss mit dem trainierten Modell übereinstimmen)
+    image_size = resolve_image_size(model_path, model)
+
+    probabilities = []
+    for start in range(0, len(paths), batch_size):
+        batch = load_batch(paths[start:start + batch_size], image_size)
+        probabilities.extend(model.predict(batch, verbose=0))
+    return probabilities
+
+# Funktion zum Berechnen der Klassenwahrscheinlichkeiten mit Cache
+# Es werden nur Bilder durch das Modell geschickt, deren Vorhersage für dieses Modell noch nicht gespeichert ist
+def cached_probabilities(image_paths: List[str], model_path: str, cache_path: Optional[str],
+                         batch_size: int = 32) -> List[np.ndarray]:
+    if cache_path is None:
+        return infer_probabilities(image_paths, model_path, batch_size)
+    cache = PredictionCache(cache_path)
+    try:
+        # Fingerabdruck der .keras-Datei, damit Schnellformat und .keras dieselben Einträge nutzen
+        fingerprint = cache.fingerprint(model_path if os.path.exists(model_path) else select_model_path(model_path))
+        hashes = [file_hash(img_path) for img_path in image_paths]
+        cached = cache.get_many(hashes, fingerprint)
+        misses = list(dict.fromkeys(h for h in hashes if h not in cached))
+        if misses:
+            miss_paths = {h: img_path for img_path, h in zip(image_paths, hashes)}
+            inferred = infer_probabilities([miss_paths[h] for h in misses], model_path, batch_size)
+            cache.put_many(zip(misses, inferred), fingerprint)
+            cached.update(zip(misses, inferred))
+        print(f"{len(image_paths) - len(misses)} von {len(image_paths)} Vorhersagen aus dem Cache")
+        return [cached[h] for h in hashes]
+    finally:
+        cache.close()
+
+# Vorhersagen für jedes Bild machen und die vorhergesagten Klassen zurückgeben
+# Mit Vorstufe (kalibrierte Schwellen aus color_prefilter.py) entscheiden Farbstatistiken eindeutige Bilder sofort,
+# nur die übrigen gehen an das Modell
+def predict_images(image_paths: List[str], model_path: str = 'images.keras', cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+                   batch_size: int = 32, prefilter_path: Optional[str] = None) -> List[int]:
+    decisions = [None] * len(image_paths)
+    if prefilter_path is not None:
+        # OpenCV wird nur für die Vorstufe gebraucht
+        from color_prefilter import color_statistics, decide, load_thresholds
+        thresholds = load_thresholds(prefilter_path)
+        decisions = [decide(color_statistics(img_path), thresholds) for img_path in image_paths]
+        skipped = sum(decision is not None for decision in decisions)
+        print(f"{skipped} von {len(image_paths)} Bildern durch die Farbvorstufe ohne CNN entschieden")
+
+    model_paths = [img_path for img_path, decision in zip(image_paths, decisions) if decision is None]
+    model_probabilities = iter(cached_probabilities(model_paths, model_path, cache_path, batch_size) if model_paths else [])
+    probabilities = [next(model_probabilities) if decision is None else np.eye(len(klassen_namen))[decision]
+                     for decision in decisions]
+
+    predicted_classes = []
+    for img_path, prediction in zip(image_paths, probabilities):
+        predicted_class = int(np.argmax(prediction))  # Klasse mit der höchsten Wahrscheinlichkeit
+
+        # Vorhergesagte Klasse ausgeben
+        if predicted_class == 0:
+            print(f"Das Modell sagt Klasse {predicted_class} für das Bild {img_path} voraus. Es ist {klassen_namen[0]}!")
+        else:
+            print(f"Das Modell sagt Klasse {predicted_class} für das Bild {img_path} voraus. Es ist {klassen_namen[1]}!")
+        predicted_classes.append(predicted_class)
+    return predicted_classes
 
-    predictions = model.predict(img_array)
-    predicted_class = np.argmax(predictions, axis=1)  # Klasse mit der höchsten Wahrscheinlichkeit
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Bilder mit dem trainierten Modell klassifizieren.')
+    parser.add_argument('images', nargs='*', default=image_paths, help='Zu klassifizierende Bilder')
+    parser.add_argument('--model', default='images.keras', help='Pfad zum Modell')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='SQLite-Datenbank für zwischengespeicherte Vorhersagen')
+    parser.add_argument('--no-cache', action='store_true', help='Alle Bilder neu vorhersagen, ohne Cache')
+    parser.add_argument('--batch-size', type=int, default=32, help='Anzahl der Bilder pro Vorhersageschritt')
+    parser.add_argument('--prefilter', default=None,
+                        help='Kalibrierte Schwellen der Farbvorstufe (color_prefilter.json); eindeutige Bilder überspringen das CNN')
+    return parser.parse_args(argv)
 
-    # Vorhergesagte Klasse ausgeben
-    if predicted_class[0] == 0:
-        print(f"Das Modell sagt Klasse {predicted_class[0]} für das Bild {img_path} voraus. Es ist {klassen_namen[0]}!")
-    else:
-        print(f"Das Modell sagt Klasse {predicted_class[0]} für das Bild {img_path} voraus. Es ist {klassen_namen[1]}!")
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    predict_images(args.images, args.model, None if args.no_cache else args.cache, args.batch_size, args.prefilter)
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+rendition_writer.py
+
+Mehrere Ausgabevideos (Renditions) in verschiedenen Auflösungen aus einem einzigen Compositing-Durchlauf.
+
+Das Compositing läuft einmal in der vollen Auflösung des Originalbildes; jede Rendition verkleinert denselben
+fertigen Frame (cv2.resize, INTER_AREA) und kodiert ihn in ihre eigene Datei. Eine Rendition wird über ihre Höhe
+in Pixeln angegeben (z.B. 2160, 1080, 720); die Breite folgt dem Seitenverhältnis und wird auf eine gerade Zahl
+gerundet. Der Dateiname entsteht aus dem Ausgabepfad, z.B. out.mp4 -> out_1080p.mp4. Renditions können nicht
+größer als das Originalbild sein, da Hochskalieren keine Details hinzufügt.
+
+RenditionWriter verteilt jeden Frame an einen Thread pro Rendition. cv2.resize und VideoWriter.write geben den
+GIL frei, sodass Verkleinern und Kodieren der Renditions parallel auf mehreren Kernen laufen. Der Mehrprozess-Pfad
+in shared_memory_render.py startet stattdessen einen Encoder-Prozess pro Rendition.
+
+Die Bitrate lässt sich mit cv2.VideoWriter (mp4v) nicht vorgeben; die Renditions unterscheiden sich daher nur
+in der Auflösung.
+"""
+
+import os
+import queue
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Anzahl der Frames, die pro Rendition auf das Kodieren warten dürfen
+DEFAULT_QUEUE_SIZE = 4
+
+
+# Funktion zum Berechnen der Größe (Breite, Höhe) einer Rendition mit gleichem Seitenverhältnis
+def rendition_size(frame_size: Tuple[int, int], height: int) -> Tuple[int, int]:
+    width, frame_height = frame_size
+    if height >= frame_height:
+        return frame_size
+    return max(2, int(round(width * height / frame_height / 2)) * 2), height
+
+
+# Funktion zum Planen der Renditions: Liste aus (Ausgabepfad, Größe), von der größten zur kleinsten
+def plan_renditions(output_path: str, heights: Sequence[int], frame_size: Tuple[int, int]) -> List[Tuple[str, Tuple[int, int]]]:
+    if not heights:
+        raise ValueError("At least one rendition height is required.")
+    too_large = [height for height in heights if height > frame_size[1]]
+    if too_large:
+        raise ValueError(f"Rendition heights {too_large} exceed the composite height of {frame_size[1]} px.")
+    if any(height <= 0 for height in heights):
+        raise ValueError(f"Rendition heights must be positive, got {list(heights)}.")
+    base, ext = os.path.splitext(output_path)
+    return [(f"{base}_{height}p{ext or '.mp4'}", rendition_size(frame_size, height))
+            for height in sorted(set(heights), reverse=True)]
+
+
+# Funktion zum Verkleinern eines fertigen Frames auf die Größe einer Rendition
+def scale_frame(frame: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    if (frame.shape[1], frame.shape[0]) == size:
+        return frame
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+class RenditionWriter:
+    # Schreibt jeden Frame in alle Renditions; Verkleinern und Kodieren laufen in einem Thread pro Rendition
+    def __init__(self, renditions: List[Tuple[str, Tuple[int, int]]], fps: float,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.renditions = renditions
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in renditions]
+        self.errors: List[BaseException] = []
+        self.threads = [threading.Thread(target=self._encode, args=(path, size, fps, frames), daemon=True)
+                        for (path, size), frames in zip(renditions, self.queues)]
+        for thread in self.threads:
+            thread.start()
+
+    def _encode(self, path: str, size: Tuple[int, int], fps: float, frames: queue.Queue) -> None:
+        out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+        try:
+            while True:
+                frame = frames.get()
+                if frame is None:
+                    break
+                if not self.errors:
+                    out.write(scale_frame(frame, size))
+        except BaseException as error:
+            self.errors.append(error)
+            # Restliche Frames abnehmen, damit write() nicht blockiert
+            while frames.get() is not None:
+                pass
+        finally:
+            out.release()
+
+    # Die Frames werden von den Threads nur gelesen; der Aufrufer darf einen übergebenen Frame danach nicht ändern
+    def write(self, frame: np.ndarray) -> None:
+        for frames in self.queues:
+            frames.put(frame)
+
+    def release(self) -> None:
+        for frames in self.queues:
+            frames.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+
+# Funktion zum Öffnen der Ausgabe: ein einzelner VideoWriter ohne Renditions, sonst ein RenditionWriter
+def open_output_writer(output_path: str, fps: float, frame_size: Tuple[int, int],
+                       rendition_heights: Optional[Sequence[int]] = None):
+    if not rendition_heights:
+        return cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
+    renditions = plan_renditions(output_path, rendition_heights, frame_size)
+    for path, size in renditions:
+        print(f"Rendition {size[0]}x{size[1]} -> {path}")
+    return RenditionWriter(renditions, fps)
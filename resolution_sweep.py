@@ -0,0 +1,129 @@
+"""
+resolution_sweep.py
+
+Dieses Skript trainiert den Greenscreen-Klassifikator bei mehreren Eingabeauflösungen und vergleicht
+Genauigkeit und Rechenaufwand auf einem zurückgehaltenen Validierungsanteil.
+
+Für jede Auflösung werden Genauigkeit, Parameteranzahl, Größe der Gewichte und CPU-Latenz für ein einzelnes
+Bild ausgegeben. Gewählt wird die kleinste Auflösung, deren Genauigkeit höchstens --tolerance unter der besten
+liegt (oder die mit --select fest vorgegebene). Das gewählte Modell wird gespeichert und die Auflösung in seine
+Metadaten geschrieben, sodass prediction_testing.py sie automatisch verwendet.
+
+Benutzung:
+    python resolution_sweep.py --sizes 128 224 512 --epochs 10
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from model_create_and_training import (compile_model, configure_threads, create_model, dataset_from_files, folders,
+                                       list_image_files, split_files)
+from model_metadata import save_metadata
+
+
+# Funktion zum Messen der CPU-Latenz für ein einzelnes Bild (Median über mehrere Durchläufe)
+def measure_latency(model, image_size, runs: int = 20) -> float:
+    sample = np.random.rand(1, image_size[0], image_size[1], 3).astype(np.float32)
+    model(sample, training=False)  # Aufwärmen, damit das Tracing nicht mitgemessen wird
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model(sample, training=False)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+# Funktion zum Trainieren und Bewerten des Modells bei einer Auflösung
+def evaluate_resolution(size: int, split, epochs: int, batch_size: int, model_path: str) -> Dict[str, float]:
+    train_paths, train_labels, val_paths, val_labels = split
+    image_size = (size, size)
+    train_data = dataset_from_files(train_paths, train_labels, image_size=image_size, batch_size=batch_size)
+    val_data = dataset_from_files(val_paths, val_labels, image_size=image_size, batch_size=batch_size,
+                                  augment=False, shuffle=False)
+
+    model = create_model((size, size, 3))
+    compile_model(model)
+    model.fit(train_data, epochs=epochs, verbose=2)
+    _, accuracy = model.evaluate(val_data, verbose=0)
+    model.save(model_path)
+
+    params = model.count_params()
+    return {
+        'size': size,
+        'accuracy': float(accuracy),
+        'params': int(params),
+        'size_mb': params * 4 / 1e6,  # float32-Gewichte ohne Optimierer-Zustand
+        'latency_ms': measure_latency(model, image_size) * 1000,
+    }
+
+
+# Funktion zum Auswählen der Auflösung: die kleinste innerhalb der Toleranz zur besten Genauigkeit
+def choose_resolution(results: List[Dict[str, float]], tolerance: float) -> Dict[str, float]:
+    best_accuracy = max(result['accuracy'] for result in results)
+    candidates = [result for result in results if result['accuracy'] >= best_accuracy - tolerance]
+    return min(candidates, key=lambda result: result['size'])
+
+
+# Funktion zum Ausgeben der Ergebnistabelle
+def print_table(results: List[Dict[str, float]], chosen_size: int) -> None:
+    print(f"{'Auflösung':>10}{'Genauigkeit':>13}{'Parameter':>14}{'Größe [MB]':>12}{'Latenz [ms]':>13}")
+    for result in results:
+        marker = '  <- gewählt' if result['size'] == chosen_size else ''
+        print(f"{result['size']:>7} px{result['accuracy']:>13.3f}{result['params']:>14,}"
+              f"{result['size_mb']:>12.1f}{result['latency_ms']:>13.1f}{marker}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Klassifikator bei mehreren Eingabeauflösungen trainieren und vergleichen.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[128, 224, 512], help='Zu testende Auflösungen in Pixeln')
+    parser.add_argument('--epochs', type=int, default=10, help='Trainingsepochen pro Auflösung')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batchgröße')
+    parser.add_argument('--validation-split', type=float, default=0.2, help='Anteil der zurückgehaltenen Validierungsdaten')
+    parser.add_argument('--seed', type=int, default=42, help='Seed für die Aufteilung der Daten')
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help='Erlaubter Genauigkeitsverlust gegenüber der besten Auflösung')
+    parser.add_argument('--select', type=int, default=None, help='Auflösung fest vorgeben statt automatisch zu wählen')
+    parser.add_argument('--output', default='images.keras', help='Pfad für das gewählte Modell')
+    parser.add_argument('--intra-op-threads', type=int, default=0, help='Threads innerhalb einer TensorFlow-Operation (0 = automatisch)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    configure_threads(args.intra_op_threads, 0)
+
+    paths, labels = list_image_files(folders)
+    split = split_files(paths, labels, validation_split=args.validation_split, seed=args.seed)
+    print(f"Training: {len(split[0])} Bilder, Validierung: {len(split[2])} Bilder")
+
+    # Kandidaten zunächst in einem temporären Ordner neben dem Ziel speichern, damit nur das gewählte Modell übrig bleibt
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        results = []
+        for size in args.sizes:
+            print(f"--- Auflösung {size}x{size} ---")
+            results.append(evaluate_resolution(size, split, args.epochs, args.batch_size,
+                                               os.path.join(tmp_dir, f'model_{size}.keras')))
+
+        if args.select is not None:
+            chosen = next((result for result in results if result['size'] == args.select), None)
+            if chosen is None:
+                raise ValueError(f"Resolution {args.select} was not part of the sweep {args.sizes}.")
+        else:
+            chosen = choose_resolution(results, args.tolerance)
+
+        print_table(results, chosen['size'])
+        shutil.move(os.path.join(tmp_dir, f"model_{chosen['size']}.keras"), args.output)
+
+    save_metadata(args.output, image_size=[chosen['size'], chosen['size']], resolution_sweep=results)
+    print(f"Modell mit {chosen['size']}x{chosen['size']} px gespeichert unter {args.output}")
+
+
+if __name__ == "__main__":
+    main()
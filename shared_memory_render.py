@@ -0,0 +1,252 @@
+"""
+shared_memory_render.py
+
+Mehrprozess-Renderpfad für das Ersetzen eines Greenscreens durch ein Hintergrundvideo.
+
+Dekodieren, Compositing und Kodieren laufen in eigenen Prozessen und damit auf eigenen Kernen, ohne dass sich die
+Python-Anteile der Frame-Verarbeitung den GIL teilen. Die Frames werden nicht gepickelt: Alle Prozesse arbeiten auf
+zwei Ringpuffern im Shared Memory (multiprocessing.shared_memory) mit vorab angelegten Frame-Slots:
+
+- Decode-Ring: Hintergrundframes in ROI-Größe, vom Decoder beschrieben, von den Compositoren gelesen
+- Ausgabe-Ring: fertige Frames in voller Größe, von den Compositoren beschrieben, vom Encoder gelesen
+
+Durch die Queues gehen nur Slot-Indizes (freie Slots zurück, gefüllte Slots mit ihrer Framenummer weiter). Ein
+4K-Frame wird so ohne Kopie von einem Kern an den nächsten übergeben. Bei mehreren Compositoren bringt der Encoder
+die Frames über die Framenummer wieder in die richtige Reihenfolge. Ein Compositor holt sich seinen Ausgabe-Slot,
+bevor er einen Hintergrundframe annimmt; dadurch kann der Encoder nie alle Ausgabe-Slots mit vorgezogenen Frames
+belegen, während der fehlende Frame auf einen Slot wartet.
+
+Mit Renditions (siehe rendition_writer.py) läuft pro Rendition ein Encoder-Prozess, der denselben fertigen Frame
+aus dem Ausgabe-Ring liest, verkleinert und kodiert. Ein Ausgabe-Slot wird erst wieder frei, wenn alle Encoder ihn
+geschrieben haben (Referenzzähler pro Slot im Shared Memory).
+
+Das Ergebnis ist bitgleich mit replace_greenscreen_with_video() aus
+insert_video_to_greenscreen_using_trained_model.py.
+
+Benutzung:
+    python insert_video_to_greenscreen_using_trained_model.py l1.jpg maus.mp4 out.mp4 --processes 2
+    python insert_video_to_greenscreen_using_trained_model.py l1.jpg maus.mp4 out.mp4 --processes 2 --renditions 1080 720
+"""
+
+import time
+from multiprocessing import get_context, shared_memory
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from rendition_writer import plan_renditions, scale_frame
+from video_readers import (DEFAULT_FPS, DEFAULT_LOOP_CACHE_BYTES, OpenCVReader, open_looping_reader,
+                           open_video_reader, resample_frames)
+
+# Standardanzahl der Slots pro Ringpuffer
+DEFAULT_SLOTS = 8
+
+
+class FrameRing:
+    # Ringpuffer aus slots gleich großen uint8-Frames in einem Shared-Memory-Block
+    def __init__(self, slots: int, shape: Tuple[int, ...], name: Optional[str] = None):
+        self.slots = slots
+        self.shape = tuple(shape)
+        size = slots * int(np.prod(self.shape))
+        self.owner = name is None
+        # Die Render-Prozesse teilen sich den Resource-Tracker des Erzeugers; freigegeben wird nur von diesem
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.frames = np.ndarray((slots,) + self.shape, np.uint8, buffer=self.memory.buf)
+
+    # Beschreibung, mit der ein anderer Prozess denselben Ring öffnet
+    def spec(self) -> Tuple[str, int, Tuple[int, ...]]:
+        return self.memory.name, self.slots, self.shape
+
+    @classmethod
+    def attach(cls, spec: Tuple[str, int, Tuple[int, ...]]) -> 'FrameRing':
+        name, slots, shape = spec
+        return cls(slots, shape, name)
+
+    def close(self) -> None:
+        # Die Array-Sicht muss vor dem Schließen freigegeben werden
+        self.frames = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+# Decoder-Prozess: Hintergrundframes in ROI-Größe in freie Slots des Decode-Rings schreiben
+def decode_worker(video_path: str, roi_size: Tuple[int, int], reader: str, fps: float, max_frames: Optional[int],
+                  loop: bool, loop_cache_bytes: int, ring_spec, free_slots, filled_slots, compositors: int) -> None:
+    ring = FrameRing.attach(ring_spec)
+    if loop:
+        cap = open_looping_reader(video_path, roi_size, reader, loop_cache_bytes)
+    else:
+        cap = open_video_reader(video_path, roi_size, reader)
+    try:
+        for index, frame in enumerate(resample_frames(cap, fps, max_frames)):
+            slot = free_slots.get()
+            ring.frames[slot] = frame
+            filled_slots.put((index, slot))
+        if loop:
+            if cap.caching:
+                print(f"Background loop cached in memory: {len(cap.frames)} frames, {cap.cached_bytes / 1e6:.1f} MB")
+            else:
+                print(f"Background loop too large for the cache, decoded {cap.passes} times")
+    finally:
+        # Ein Endesignal pro Compositor
+        for _ in range(compositors):
+            filled_slots.put(None)
+        cap.release()
+        ring.close()
+
+
+# Compositor-Prozess: Hintergrundframe in den Greenscreen-Bereich einfügen, direkt in einen Slot des Ausgabe-Rings
+# Jeder fertige Frame geht an alle Encoder; der Referenzzähler des Slots zählt die noch ausstehenden Encoder
+def composite_worker(original_img: np.ndarray, mask: np.ndarray, decode_spec, output_spec,
+                     decode_free, decode_filled, output_free, output_filled: List, refcounts) -> None:
+    decode_ring = FrameRing.attach(decode_spec)
+    output_ring = FrameRing.attach(output_spec)
+    x, y, w, h = cv2.boundingRect(mask)
+    mask_cropped = mask[y:y+h, x:x+w]
+    mask_inv = cv2.bitwise_not(mask_cropped)
+    try:
+        while True:
+            # Erst den Ausgabe-Slot, dann den Hintergrundframe holen (siehe Modulbeschreibung)
+            output_slot = output_free.get()
+            item = decode_filled.get()
+            if item is None:
+                output_free.put(output_slot)
+                for encoder_queue in output_filled:
+                    encoder_queue.put(None)
+                break
+            index, decode_slot = item
+            background = decode_ring.frames[decode_slot]
+            result = output_ring.frames[output_slot]
+            result[:] = original_img
+
+            # Gleiche Rechnung wie im Einprozess-Pfad, damit das Ergebnis bitgleich ist
+            for c in range(0, 3):
+                result[y:y+h, x:x+w, c] = (
+                    background[:, :, c] * (mask_cropped / 255.0) +
+                    original_img[y:y+h, x:x+w, c] * (mask_inv / 255.0)
+                )
+
+            decode_free.put(decode_slot)
+            refcounts[output_slot] = len(output_filled)
+            for encoder_queue in output_filled:
+                encoder_queue.put((index, output_slot))
+    finally:
+        decode_ring.close()
+        output_ring.close()
+
+
+# Encoder-Prozess: fertige Frames in der Reihenfolge der Framenummern auf frame_size verkleinern und in das
+# Ausgabevideo schreiben; der letzte Encoder eines Slots gibt ihn frei
+def encode_worker(output_video_path: str, fps: float, frame_size: Tuple[int, int], output_spec,
+                  output_free, output_filled, compositors: int, refcounts) -> None:
+    ring = FrameRing.attach(output_spec)
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_video_path, fourcc, fps, frame_size)
+    pending = {}  # Framenummer -> Slot für Frames, die vor ihren Vorgängern fertig wurden
+    next_index = 0
+    finished = 0
+    try:
+        while finished < compositors:
+            item = output_filled.get()
+            if item is None:
+                finished += 1
+                continue
+            index, slot = item
+            pending[index] = slot
+            while next_index in pending:
+                slot = pending.pop(next_index)
+                out.write(scale_frame(ring.frames[slot], frame_size))
+                with refcounts.get_lock():
+                    refcounts[slot] -= 1
+                    released = refcounts[slot] == 0
+                if released:
+                    output_free.put(slot)
+                next_index += 1
+    finally:
+        out.release()
+        ring.close()
+
+
+# Funktion zum Ersetzen des Greenscreens durch ein Hintergrundvideo mit getrennten Prozessen für Dekodieren,
+# Compositing (compositors Prozesse) und Kodieren; Parameter wie replace_greenscreen_with_video()
+# renditions: Höhen der Ausgabevideos; dann ein Encoder-Prozess pro Rendition (Dateinamen siehe rendition_writer.py)
+def replace_greenscreen_with_video_shared(original_img: np.ndarray, video_path: str, mask: np.ndarray,
+                                          output_video_path: str, frame_stride: int = 1,
+                                          max_frames: Optional[int] = None, reader: str = 'opencv',
+                                          output_fps: Optional[float] = None, loop: bool = False,
+                                          duration: Optional[float] = None,
+                                          loop_cache_bytes: int = DEFAULT_LOOP_CACHE_BYTES,
+                                          compositors: int = 1, slots: int = DEFAULT_SLOTS,
+                                          renditions: Optional[Sequence[int]] = None) -> None:
+    if frame_stride < 1:
+        raise ValueError(f"Frame stride must be at least 1, got {frame_stride}.")
+    if loop and max_frames is None and duration is None:
+        raise ValueError("Looping the background video needs a duration or a maximum number of frames.")
+    if compositors < 1 or slots < compositors + 1:
+        raise ValueError(f"Need at least one compositor and more slots than compositors, got {compositors} and {slots}.")
+
+    x, y, w, h = cv2.boundingRect(mask)
+    print(f"Greenscreen area - Width: {w} px, Height: {h} px")
+
+    # Ohne Renditions ein einziger Encoder in voller Größe
+    frame_size = (original_img.shape[1], original_img.shape[0])
+    if renditions:
+        outputs = plan_renditions(output_video_path, renditions, frame_size)
+        for path, size in outputs:
+            print(f"Rendition {size[0]}x{size[1]} -> {path}")
+    else:
+        outputs = [(output_video_path, frame_size)]
+
+    # Bildrate aus den Metadaten; der Decoder öffnet das Video danach selbst
+    probe = OpenCVReader(video_path)
+    fps = (output_fps or probe.fps or DEFAULT_FPS) / frame_stride
+    probe.release()
+    if duration is not None:
+        duration_frames = int(round(duration * fps))
+        max_frames = duration_frames if max_frames is None else min(max_frames, duration_frames)
+
+    context = get_context()
+    decode_ring = FrameRing(slots, (h, w, 3))
+    output_ring = FrameRing(slots, original_img.shape)
+    decode_free, decode_filled = context.Queue(), context.Queue()
+    output_free = context.Queue()
+    output_filled = [context.Queue() for _ in outputs]  # eine Queue pro Encoder
+    refcounts = context.Array('i', slots)
+    for slot in range(slots):
+        decode_free.put(slot)
+        output_free.put(slot)
+
+    processes = [context.Process(target=decode_worker, name='decoder',
+                                 args=(video_path, (w, h), reader, fps, max_frames, loop, loop_cache_bytes,
+                                       decode_ring.spec(), decode_free, decode_filled, compositors))]
+    processes += [context.Process(target=composite_worker, name=f'compositor-{index}',
+                                  args=(original_img, mask, decode_ring.spec(), output_ring.spec(),
+                                        decode_free, decode_filled, output_free, output_filled, refcounts))
+                  for index in range(compositors)]
+    processes += [context.Process(target=encode_worker, name=f'encoder-{size[1]}p',
+                                  args=(path, fps, size, output_ring.spec(), output_free, encoder_queue,
+                                        compositors, refcounts))
+                  for (path, size), encoder_queue in zip(outputs, output_filled)]
+    try:
+        for process in processes:
+            process.start()
+
+        # Bricht ein Prozess ab, warten die anderen endlos auf Slots; sie werden dann beendet
+        failed = None
+        while any(process.is_alive() for process in processes):
+            failed = next((process for process in processes if process.exitcode not in (None, 0)), None)
+            if failed is not None:
+                break
+            time.sleep(0.05)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        failed = failed or next((process for process in processes if process.exitcode != 0), None)
+        if failed is not None:
+            raise RuntimeError(f"Render process '{failed.name}' failed with exit code {failed.exitcode}.")
+    finally:
+        decode_ring.close()
+        output_ring.close()
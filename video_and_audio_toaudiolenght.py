@@ -1,3 +1,6 @@
+import argparse
+from typing import List, Optional
+
 from moviepy.editor import VideoFileClip, AudioFileClip
 
 def merge_video_audio(video_path: str, audio_path: str, output_path: str) -> None:
@@ -18,10 +21,16 @@ def merge_video_audio(video_path: str, audio_path: str, output_path: str) -> Non
     final_clip = video_clip.set_audio(audio_clip)
     final_clip.write_videofile(output_path, codec='libx264', audio_codec='aac')
 
+def main(argv: Optional[List[str]] = None) -> None:
+    """Parse the command line and merge the given files (defaults match the example files)."""
+    parser = argparse.ArgumentParser(description='Video und Audio zusammenführen, Audio auf die Videolänge gekürzt.')
+    parser.add_argument('video', nargs='?', default='output_wald.mp4', help='Videodatei')
+    parser.add_argument('audio', nargs='?', default='spirit.MP3', help='Audiodatei')
+    parser.add_argument('output', nargs='?', default='musikvideo.mp4', help='Ausgabedatei')
+    args = parser.parse_args(argv)
+
+    merge_video_audio(args.video, args.audio, args.output)
+
 # Beispiel für die Verwendung der Funktion
 if __name__ == "__main__":
-    video_path = 'output_wald.mp4'
-    audio_path = 'spirit.MP3'
-    output_path = 'musikvideo.mp4'
-
-    merge_video_audio(video_path, audio_path, output_path)
+    main()
@@ -0,0 +1,286 @@
+"""
+video_readers.py
+
+Leser für Hintergrundvideos, die Frames direkt in der Größe des Greenscreen-Bereichs (ROI) liefern.
+
+- OpenCVReader: cv2.VideoCapture dekodiert in voller Auflösung, danach wird mit cv2.resize (INTER_AREA)
+  verkleinert. Das ist das bisherige Verhalten.
+- FFmpegReader: ein lokaler ffmpeg-Prozess dekodiert und skaliert mit dem scale-Filter (flags=area) und liefert
+  rohe BGR-Frames in ROI-Größe über eine Pipe. Das Verkleinern läuft im Decoder-Prozess parallel zum
+  Compositing, und durch die Pipe gehen nur noch die kleinen Frames. Bei Codecs mit reduzierter
+  Dekodierauflösung (z.B. MJPEG) wird zusätzlich -lowres genutzt, sodass gar nicht erst voll dekodiert wird.
+  Endet ffmpeg mit einem Fehler (z.B. defekte Datei), löst grab() statt des Dateiendes einen ValueError mit der
+  Meldung von ffmpeg aus, damit kein abgeschnittenes Video als Erfolg gilt.
+
+Beide Leser haben dieselbe Schnittstelle wie cv2.VideoCapture (grab, retrieve, read, release) sowie fps und
+frame_size. grab() schaltet einen Frame weiter, ohne ihn in ein NumPy-Array umzuwandeln.
+
+resample_frames() wandelt die Bildrate um: Für jeden Ausgabeframe wird über seinen Zeitstempel der passende
+Quellframe bestimmt. Nicht benötigte Quellframes werden nur mit grab() übersprungen, ohne retrieve() und ohne
+Skalierung; bei einer höheren Ausgaberate wird der letzte Frame wiederholt.
+
+LoopingReader spielt ein Video endlos in Schleife ab. Passen alle Frames in ROI-Größe in das Speicherlimit, werden
+sie beim ersten Durchlauf behalten und danach nur noch aus dem Speicher geliefert; ein kurzer Loop hinter einem
+langen Ausgabevideo wird so nur einmal dekodiert. Über dem Limit wird das Video für jeden Durchlauf neu geöffnet.
+
+Der Pfad zu ffmpeg kann mit der Umgebungsvariable GREENSCREEN_FFMPEG gesetzt werden.
+"""
+
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Bildrate, falls das Video keine angibt
+DEFAULT_FPS = 30.0
+
+# Standard-Speicherlimit für die Frames eines Loops in Bytes
+DEFAULT_LOOP_CACHE_BYTES = 512 * 1024 * 1024
+
+# Codecs, deren Decoder mit -lowres direkt in halber, viertel oder achtel Auflösung dekodieren kann
+LOWRES_CODECS = ('MJPG', 'mjpg', 'jpeg', 'H263', 'h263')
+
+
+# Funktion zum Finden der ffmpeg-Programmdatei
+def find_ffmpeg() -> Optional[str]:
+    return os.environ.get('GREENSCREEN_FFMPEG') or shutil.which('ffmpeg')
+
+
+class OpenCVReader:
+    def __init__(self, path: str, size: Optional[Tuple[int, int]] = None):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Failed to open video file '{path}'.")
+        self.size = size  # Zielgröße (Breite, Höhe) oder None für die Originalgröße
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def grab(self) -> bool:
+        return self.cap.grab()
+
+    def retrieve(self) -> Tuple[bool, Optional[np.ndarray]]:
+        ret, frame = self.cap.retrieve()
+        if ret and self.size is not None and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return ret, frame
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+class FFmpegReader:
+    def __init__(self, path: str, size: Optional[Tuple[int, int]] = None, ffmpeg: Optional[str] = None,
+                 threads: int = 0):
+        ffmpeg = ffmpeg or find_ffmpeg()
+        if ffmpeg is None:
+            raise ValueError("ffmpeg not found; install it or set GREENSCREEN_FFMPEG.")
+
+        # Metadaten über OpenCV lesen (öffnet nur den Container, dekodiert nichts)
+        probe = cv2.VideoCapture(path)
+        if not probe.isOpened():
+            raise ValueError(f"Failed to open video file '{path}'.")
+        self.fps = probe.get(cv2.CAP_PROP_FPS)
+        self.frame_size = (int(probe.get(cv2.CAP_PROP_FRAME_WIDTH)), int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.frame_count = int(probe.get(cv2.CAP_PROP_FRAME_COUNT))
+        fourcc = int(probe.get(cv2.CAP_PROP_FOURCC)).to_bytes(4, 'little').decode('latin-1')
+        probe.release()
+
+        self.size = size or self.frame_size
+        width, height = self.size
+        command = [ffmpeg, '-v', 'error', '-nostdin', '-threads', str(threads)]
+        lowres = self._lowres_level(fourcc)
+        if lowres:
+            command += ['-lowres', str(lowres)]
+        command += ['-i', path, '-an', '-sn', '-vf', f'scale={width}:{height}:flags=area',
+                    '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-']
+        self.frame_bytes = width * height * 3
+        # Fehlermeldungen in eine Datei statt in eine Pipe, die sonst volllaufen und ffmpeg blockieren könnte
+        self.errors = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=self.errors, bufsize=self.frame_bytes)
+        self.path = path
+        self._frame: Optional[np.ndarray] = None
+        self._checked = False
+
+    def _lowres_level(self, fourcc: str) -> int:
+        # Größte Reduktionsstufe (1 = halb, 2 = viertel, 3 = achtel), bei der der Frame noch mindestens ROI-groß ist
+        if fourcc not in LOWRES_CODECS:
+            return 0
+        level = 0
+        while level < 3 and self.frame_size[0] >> (level + 1) >= self.size[0] and self.frame_size[1] >> (level + 1) >= self.size[1]:
+            level += 1
+        return level
+
+    def grab(self) -> bool:
+        # Nächsten Frame direkt in einen neuen Puffer lesen; erst retrieve() gibt ihn als Array heraus
+        frame = np.empty((self.size[1], self.size[0], 3), np.uint8)
+        view = memoryview(frame).cast('B')
+        filled = 0
+        while filled < self.frame_bytes:
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                self._frame = None
+                # Ende der Pipe: Dateiende oder Abbruch von ffmpeg
+                self.process.wait()
+                self._check_exit()
+                return False
+            filled += count
+        self._frame = frame
+        return True
+
+    def retrieve(self) -> Tuple[bool, Optional[np.ndarray]]:
+        return self._frame is not None, self._frame
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    # Funktion zum Prüfen des Exit-Codes von ffmpeg; ein Fehler wird nur einmal gemeldet
+    def _check_exit(self) -> None:
+        if self._checked or self.process.returncode == 0:
+            return
+        self._checked = True
+        self.errors.seek(0)
+        message = self.errors.read().decode('utf-8', 'replace').strip()
+        raise ValueError(f"ffmpeg failed to decode '{self.path}' (exit code {self.process.returncode}): {message}")
+
+    def release(self) -> None:
+        # Nach einem vorzeitigen Ende des Lesens wird ffmpeg beendet; das ist kein Fehler
+        killed = self.process.poll() is None
+        if killed:
+            self.process.kill()
+        self.process.stdout.close()
+        self.process.wait()
+        try:
+            if not killed:
+                self._check_exit()
+        finally:
+            self.errors.close()
+
+
+class LoopingReader:
+    def __init__(self, open_reader: Callable[[], object], max_bytes: int = DEFAULT_LOOP_CACHE_BYTES):
+        self.open_reader = open_reader
+        self.max_bytes = max_bytes
+        self.reader = open_reader()
+        self.fps = self.reader.fps
+        self.frame_size = self.reader.frame_size
+        self.frame_count = self.reader.frame_count
+        self.passes = 1  # Anzahl der Dekodierdurchläufe
+
+        # Nur cachen, wenn die geschätzte Größe aller Frames unter dem Limit liegt
+        width, height = self.reader.size or self.frame_size
+        self.caching = 0 < self.frame_count * width * height * 3 <= max_bytes
+        self.frames: List[np.ndarray] = []
+        self.cached_bytes = 0
+        self.complete = False  # True, sobald der erste Durchlauf vollständig im Speicher liegt
+        self.position = -1
+
+    def grab(self) -> bool:
+        if self.complete:
+            self.position = (self.position + 1) % len(self.frames)
+            return True
+        if self.reader.grab():
+            self.position += 1
+            if self.caching:
+                self._cache_current()
+            return True
+        if self.position < 0:
+            return False  # Video ohne Frames
+
+        # Ende eines Durchlaufs: aus dem Speicher weiterspielen oder neu öffnen
+        self.reader.release()
+        if self.caching:
+            self.complete = True
+            self.position = 0
+            return True
+        self.reader = self.open_reader()
+        self.passes += 1
+        self.position = 0
+        return self.reader.grab()
+
+    def _cache_current(self) -> None:
+        ret, frame = self.reader.retrieve()
+        # Ohne lesbaren Frame hätte der Cache eine Lücke und die Positionen würden verrutschen;
+        # wie bei zu niedrig angegebener Frame-Anzahl: Cache aufgeben und pro Durchlauf neu dekodieren
+        if not ret or self.cached_bytes + frame.nbytes > self.max_bytes:
+            self.caching = False
+            self.frames = []
+            self.cached_bytes = 0
+            return
+        self.frames.append(frame)
+        self.cached_bytes += frame.nbytes
+
+    def retrieve(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if self.caching and 0 <= self.position < len(self.frames):
+            return True, self.frames[self.position]
+        return self.reader.retrieve()
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self) -> None:
+        if not self.complete:
+            self.reader.release()
+        self.frames = []
+
+
+# Funktion zum Öffnen eines Hintergrundvideos mit dem gewünschten Leser
+# backend: 'opencv', 'ffmpeg' oder 'auto' (ffmpeg, falls vorhanden)
+def open_video_reader(path: str, size: Optional[Tuple[int, int]] = None, backend: str = 'opencv'):
+    if backend == 'auto':
+        backend = 'ffmpeg' if find_ffmpeg() else 'opencv'
+    if backend == 'ffmpeg':
+        return FFmpegReader(path, size)
+    if backend == 'opencv':
+        return OpenCVReader(path, size)
+    raise ValueError(f"Unknown video reader backend '{backend}'.")
+
+
+# Funktion zum Bestimmen des Quellframes für einen Ausgabeframe über den Zeitstempel
+# Angezeigt wird der Quellframe, in dessen Anzeigedauer der Zeitstempel des Ausgabeframes fällt
+def source_frame_index(output_index: int, source_fps: float, output_fps: float) -> int:
+    return int(math.floor(output_index * source_fps / output_fps + 1e-6))
+
+
+# Funktion zum Lesen eines Videos mit einer anderen Bildrate
+# Liefert die Frames für die Ausgabeframes 0, 1, 2, ...; nur die tatsächlich benötigten Frames werden abgerufen
+def resample_frames(reader, output_fps: float, max_frames: Optional[int] = None) -> Iterator[np.ndarray]:
+    if output_fps <= 0:
+        raise ValueError(f"Output frame rate must be positive, got {output_fps}.")
+    source_fps = reader.fps or DEFAULT_FPS
+    position = -1  # Index des zuletzt mit grab() gelesenen Quellframes
+    frame = None
+    output_index = 0
+    while max_frames is None or output_index < max_frames:
+        target = source_frame_index(output_index, source_fps, output_fps)
+        if target > position:
+            # Übersprungene Frames nur weiterschalten; erst der benötigte Frame wird umgewandelt
+            while position < target:
+                if not reader.grab():
+                    return
+                position += 1
+            ret, frame = reader.retrieve()
+            if not ret:
+                return
+        yield frame
+        output_index += 1
+
+
+# Funktion zum Öffnen eines Hintergrundvideos, das in Schleife abgespielt wird
+def open_looping_reader(path: str, size: Optional[Tuple[int, int]] = None, backend: str = 'opencv',
+                        max_bytes: int = DEFAULT_LOOP_CACHE_BYTES) -> LoopingReader:
+    return LoopingReader(lambda: open_video_reader(path, size, backend), max_bytes)